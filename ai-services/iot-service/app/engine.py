@@ -0,0 +1,112 @@
+"""
+Single scheduler for every simulated stream.
+
+One worker thread wakes on a fixed grid of deadlines (``tick_seconds``
+apart) and advances all running sessions of a SessionRegistry with one
+vectorised ``advance`` call, instead of one sleeping thread per stream.
+Late wake-ups are measured as tick lag; deadlines missed entirely are
+skipped (and their time credited to the next tick) rather than replayed.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+TICK_SECONDS = float(os.getenv("IOT_TICK_SECONDS", "1.0"))
+# Smoothing of the jitter estimate (RFC 3550 uses 1/16)
+JITTER_GAIN = 1 / 16
+
+
+class TickEngine:
+    """Advances ``registry`` every ``tick_seconds`` on one daemon thread."""
+
+    def __init__(self, registry, tick_seconds=None, seed=None, clock=time.time):
+        self.registry = registry
+        self.tick_seconds = tick_seconds or TICK_SECONDS
+        self.rng = np.random.default_rng(seed)
+        self.clock = clock
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        self.ticks = 0
+        self.skipped = 0
+        self.advanced = 0
+        self.last_active = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.jitter = 0.0
+        self.last_tick_seconds = 0.0
+        self.max_tick_seconds = 0.0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the scheduler thread; safe to call more than once."""
+        with self._lock:
+            if not self.running:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="iot-tick", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def tick(self, now=None, seconds=None):
+        """Advance every running stream once; returns how many were advanced."""
+        started = time.perf_counter()
+        count = self.registry.advance(
+            self.clock() if now is None else now, self.tick_seconds if seconds is None else seconds, self.rng
+        )
+        duration = time.perf_counter() - started
+
+        self.ticks += 1
+        self.advanced += count
+        self.last_active = count
+        self.last_tick_seconds = duration
+        self.max_tick_seconds = max(self.max_tick_seconds, duration)
+        return count
+
+    def _run(self):
+        deadline = time.monotonic()
+        while not self._stop.is_set():
+            lag = time.monotonic() - deadline
+            missed = int(lag // self.tick_seconds)
+            if missed:
+                # Too far behind: drop the missed deadlines, keep their time
+                self.skipped += missed
+                deadline += missed * self.tick_seconds
+                lag -= missed * self.tick_seconds
+            self._record_lag(lag)
+
+            self.tick(seconds=self.tick_seconds * (1 + missed))
+
+            deadline += self.tick_seconds
+            self._stop.wait(max(0.0, deadline - time.monotonic()))
+
+    def _record_lag(self, lag):
+        self.jitter += JITTER_GAIN * (abs(lag - self.last_lag) - self.jitter)
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "tick_seconds": self.tick_seconds,
+            "ticks": self.ticks,
+            "skipped_ticks": self.skipped,
+            "active_streams": self.last_active,
+            "readings": self.advanced,
+            "tick_lag_ms": round(self.last_lag * 1000, 3),
+            "max_tick_lag_ms": round(self.max_lag * 1000, 3),
+            "tick_jitter_ms": round(self.jitter * 1000, 3),
+            "tick_duration_ms": round(self.last_tick_seconds * 1000, 3),
+            "max_tick_duration_ms": round(self.max_tick_seconds * 1000, 3)
+        }
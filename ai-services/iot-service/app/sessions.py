@@ -0,0 +1,309 @@
+"""
+Compact per-session state for the IoT simulator.
+
+Each session (one simulated machine / device) is a row of a NumPy
+structured array. ``SessionRegistry`` maps session ids to rows and hands
+the rows of closed sessions out again through a free list, so lookups are
+O(1) and a session costs ``SESSION_DTYPE.itemsize`` bytes plus its index
+entry, however many sessions exist.
+"""
+import os
+import random
+import threading
+
+import numpy as np
+
+# =========================================================
+# 🔧 MACHINE PROFILES (HR range, speed range, MET values)
+# =========================================================
+MACHINE_PROFILES = {
+    "treadmill": {"hr_min": 110, "hr_max": 165, "speed_min": 4.0, "speed_max": 12.0, "met": 7.0},
+    "cycling":   {"hr_min": 100, "hr_max": 155, "speed_min": 20.0, "speed_max": 80.0, "met": 6.0},
+    "rowing":    {"hr_min": 110, "hr_max": 170, "speed_min": 20.0, "speed_max": 40.0, "met": 8.0},
+    "elliptical":{"hr_min": 95,  "hr_max": 150, "speed_min": 3.0, "speed_max": 10.0, "met": 5.5},
+    "dumbbells": {"hr_min": 80,  "hr_max": 140, "speed_min": 0.0, "speed_max": 0.0,  "met": 4.5},
+}
+MACHINES = list(MACHINE_PROFILES)
+# Machines whose reps accumulate over time; the others report a fresh count
+CUMULATIVE_REPS = ("treadmill", "rowing")
+# Reps per second added by a cumulative machine, drawn uniformly per reading
+REP_RATE_MIN, REP_RATE_MAX = 1, 4
+
+VIRTUAL_WEIGHT_KG = 70.0  # calorie formula body weight assumption
+
+MAX_SESSIONS = int(os.getenv("IOT_MAX_SESSIONS", "100000"))
+INITIAL_CAPACITY = 1024
+MAX_SESSION_ID_LENGTH = 64
+MAX_STREAM_SECONDS = np.iinfo(np.int32).max  # the ``duration`` field is int32
+
+SESSION_DTYPE = np.dtype([
+    ("machine", np.int8),           # index into MACHINES, -1 before one is set
+    ("active", np.bool_),           # a stream is running
+    ("stop", np.bool_),             # stop requested, honoured on the next tick
+    ("feedback", np.int8),          # index into FEEDBACK_TEXT, -1 = "Idle"
+    ("heart_rate", np.int16),
+    ("reps", np.int32),
+    ("elapsed", np.int32),
+    ("duration", np.int32),
+    ("speed", np.float32),
+    ("fatigue", np.float32),
+    ("rep_fraction", np.float32),   # part of a rep carried to the next reading
+    ("total_calories", np.float64),
+    ("started_at", np.float64),     # NaN when no stream has run
+])
+
+IDLE_ROW = np.zeros((), SESSION_DTYPE)
+IDLE_ROW["machine"] = -1
+IDLE_ROW["feedback"] = -1
+IDLE_ROW["started_at"] = np.nan
+
+
+class SessionLimitReached(RuntimeError):
+    """Raised when opening a session would exceed ``max_sessions``."""
+
+
+# =========================================================
+# 🤖 AI LOGIC FOR FEEDBACK + FATIGUE SCORE
+# =========================================================
+# Zone thresholds: a reading is in zone i when it exceeds i thresholds
+HR_THRESHOLDS = np.array([120, 160, 180])
+PACE_THRESHOLDS = np.array([0, 8, 12])
+REP_THRESHOLDS = np.array([0, 10, 20])
+
+HR_FEEDBACK = ["❤️ Light or warm-up.", "💪 Good workout zone.", "🔥 High HR — slow down.", "⚠️ Danger: HR very high!"]
+PACE_FEEDBACK = [None, "🚶 Moderate pace.", "🏃 Good pace.", "⚠️ Very fast speed."]
+REP_FEEDBACK = [None, "✨ Warm-up reps.", "💪 Good reps.", "🔥 High reps — fatigue likely."]
+
+# Every combination of zones, indexed by feedback_codes()
+FEEDBACK_TEXT = [
+    " | ".join(part for part in (hr, pace, reps) if part)
+    for hr in HR_FEEDBACK for pace in PACE_FEEDBACK for reps in REP_FEEDBACK
+]
+
+
+def feedback_codes(heart_rate, speed, reps):
+    """FEEDBACK_TEXT indices for scalar or array readings."""
+    hr_zone = np.searchsorted(HR_THRESHOLDS, heart_rate, side="left")
+    pace_zone = np.searchsorted(PACE_THRESHOLDS, speed, side="left")
+    rep_zone = np.searchsorted(REP_THRESHOLDS, reps, side="left")
+    return (hr_zone * len(PACE_FEEDBACK) + pace_zone) * len(REP_FEEDBACK) + rep_zone
+
+
+def fatigue_score(heart_rate, speed):
+    return np.round(np.minimum(1.0, (np.asarray(heart_rate) / 180) * 0.6 + (np.asarray(speed) / 12) * 0.4), 2)
+
+
+# =========================================================
+# 🔥 CALORIE CALC (PER SECOND)
+# =========================================================
+def calories_per_second(met_value):
+    # Calories/min = MET × 3.5 × weight(kg) / 200
+    cal_per_min = met_value * 3.5 * VIRTUAL_WEIGHT_KG / 200.0
+    return cal_per_min / 60.0
+
+
+# Profile columns indexed by a row's machine, for advancing streams in bulk
+HR_MIN = np.array([MACHINE_PROFILES[m]["hr_min"] for m in MACHINES])
+HR_MAX = np.array([MACHINE_PROFILES[m]["hr_max"] for m in MACHINES])
+SPEED_MIN = np.array([MACHINE_PROFILES[m]["speed_min"] for m in MACHINES])
+SPEED_MAX = np.array([MACHINE_PROFILES[m]["speed_max"] for m in MACHINES])
+CALORIES_PER_SECOND = np.array([calories_per_second(MACHINE_PROFILES[m]["met"]) for m in MACHINES])
+CUMULATIVE = np.array([m in CUMULATIVE_REPS for m in MACHINES])
+
+
+class SessionRegistry:
+    """
+    Sessions keyed by session/device id, one ``SESSION_DTYPE`` row each.
+
+    The array doubles when full (amortised O(1) opens) up to
+    ``max_sessions``; closed rows are reset and reused before it grows.
+    All methods are thread-safe.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY, max_sessions=None):
+        self.max_sessions = max_sessions or MAX_SESSIONS
+        self.rows = np.full(max(1, capacity), IDLE_ROW)
+        self.lock = threading.Lock()
+        self._index = {}
+        self._free = []
+        self._used = 0
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, session_id):
+        return session_id in self._index
+
+    # ---------------- lifecycle ----------------
+    def open(self, session_id):
+        """Row of ``session_id``, creating the session if needed."""
+        with self.lock:
+            return self._open(session_id)
+
+    def _open(self, session_id):
+        row = self._index.get(session_id)
+        if row is not None:
+            return row
+        if len(self._index) >= self.max_sessions:
+            raise SessionLimitReached(f"session limit of {self.max_sessions} reached")
+
+        if self._free:
+            row = self._free.pop()
+        else:
+            if self._used == len(self.rows):
+                self._grow()
+            row = self._used
+            self._used += 1
+        self._index[session_id] = row
+        return row
+
+    def _grow(self):
+        grown = np.full(min(2 * len(self.rows), max(self.max_sessions, len(self.rows) + 1)), IDLE_ROW)
+        grown[:len(self.rows)] = self.rows
+        self.rows = grown
+
+    def close(self, session_id):
+        """Forget ``session_id`` (stopping its stream); False if it did not exist."""
+        with self.lock:
+            row = self._index.pop(session_id, None)
+            if row is None:
+                return False
+            self.rows[row] = IDLE_ROW
+            self._free.append(row)
+            return True
+
+    def row(self, session_id):
+        """Row of an existing session; raises KeyError."""
+        return self._index[session_id]
+
+    # ---------------- state --------------------
+    def status(self, session_id):
+        with self.lock:
+            r = self.rows[self.row(session_id)]
+            machine = int(r["machine"])
+            feedback = int(r["feedback"])
+            return {
+                "machine": MACHINES[machine] if machine >= 0 else None,
+                "heart_rate": int(r["heart_rate"]),
+                "speed": round(float(r["speed"]), 1),
+                "reps": int(r["reps"]),
+                "fatigue": round(float(r["fatigue"]), 2),
+                "ai_feedback": FEEDBACK_TEXT[feedback] if feedback >= 0 else "Idle",
+                "total_calories": round(float(r["total_calories"]), 3),
+                "session_active": bool(r["active"]),
+                "session_elapsed": int(r["elapsed"])
+            }
+
+    def set_machine(self, session_id, machine_name):
+        with self.lock:
+            row = self._open(session_id)
+            rows = self.rows
+            rows["machine"][row] = MACHINES.index(machine_name)
+            rows["total_calories"][row] = 0.0
+            rows["active"][row] = False
+            rows["elapsed"][row] = 0
+            rows["reps"][row] = 0
+            rows["rep_fraction"][row] = 0.0
+
+    def reset(self, session_id):
+        with self.lock:
+            self.rows[self.row(session_id)] = IDLE_ROW
+
+    def record(self, row, heart_rate, speed, reps):
+        """Store one reading for ``row`` and re-run the feedback logic; caller holds ``lock``."""
+        rows = self.rows
+        rows["heart_rate"][row] = heart_rate
+        rows["speed"][row] = speed
+        rows["reps"][row] = reps
+        rows["fatigue"][row] = fatigue_score(heart_rate, speed)
+        rows["feedback"][row] = feedback_codes(heart_rate, speed, reps)
+
+    def demo(self, session_id, machine_name="treadmill"):
+        """One-shot random reading (not streaming)."""
+        profile = MACHINE_PROFILES[machine_name]
+        with self.lock:
+            self.record(
+                self._open(session_id),
+                random.randint(profile["hr_min"], profile["hr_max"]),
+                round(random.uniform(profile["speed_min"], profile["speed_max"]), 1),
+                random.randint(0, 20)
+            )
+
+    # ---------------- streaming ----------------
+    def begin_stream(self, session_id, machine_name, duration_seconds, now):
+        """Mark a stream as running; False if one already is."""
+        with self.lock:
+            row = self._open(session_id)
+            rows = self.rows
+            if rows["active"][row]:
+                return False
+            # Flip ``active`` last so a rejected field leaves the row idle
+            rows["stop"][row] = False
+            rows["machine"][row] = MACHINES.index(machine_name)
+            rows["started_at"][row] = now
+            rows["duration"][row] = duration_seconds
+            rows["elapsed"][row] = 0
+            rows["total_calories"][row] = 0.0
+            rows["reps"][row] = 0
+            rows["rep_fraction"][row] = 0.0
+            rows["active"][row] = True
+            return True
+
+    def stop_stream(self, session_id):
+        with self.lock:
+            self.rows["stop"][self.row(session_id)] = True
+
+    def advance(self, now, seconds, rng):
+        """
+        One reading for every running stream, generated for all of them at
+        once: streams past their duration or asked to stop are ended, the
+        others get a random heart rate, speed and rep count for their
+        machine, fresh feedback and ``seconds`` worth of calories and
+        cumulative reps (fractions carry over), so rates do not depend on
+        the tick interval. Returns the number of streams advanced.
+        """
+        with self.lock:
+            rows = self.rows[:self._used]
+            running = np.flatnonzero(rows["active"])
+            if not len(running):
+                return 0
+
+            elapsed = (now - rows["started_at"][running]).astype(np.int32)
+            over = (elapsed >= rows["duration"][running]) | rows["stop"][running]
+            rows["active"][running[over]] = False
+            running, elapsed = running[~over], elapsed[~over]
+            count = len(running)
+            if not count:
+                return 0
+
+            machine = rows["machine"][running]
+            heart_rate = rng.integers(HR_MIN[machine], HR_MAX[machine], endpoint=True)
+            speed = np.round(rng.uniform(SPEED_MIN[machine], SPEED_MAX[machine]), 1)
+            cumulative = CUMULATIVE[machine]
+            rep_total = (
+                rows["reps"][running] + rows["rep_fraction"][running]
+                + rng.uniform(REP_RATE_MIN, REP_RATE_MAX, count) * seconds
+            )
+            whole = np.floor(rep_total)
+            reps = np.where(cumulative, whole, rng.integers(0, 30, count, endpoint=True))
+            rows["rep_fraction"][running] = np.where(cumulative, rep_total - whole, 0.0)
+
+            rows["heart_rate"][running] = heart_rate
+            rows["speed"][running] = speed
+            rows["reps"][running] = reps
+            rows["fatigue"][running] = fatigue_score(heart_rate, speed)
+            rows["feedback"][running] = feedback_codes(heart_rate, speed, reps)
+            rows["elapsed"][running] = elapsed
+            rows["total_calories"][running] += CALORIES_PER_SECOND[machine] * seconds
+            return count
+
+    def stats(self):
+        with self.lock:
+            return {
+                "sessions": len(self._index),
+                "active_streams": int(self.rows["active"][:self._used].sum()),
+                "capacity": len(self.rows),
+                "max_sessions": self.max_sessions,
+                "bytes_per_session": SESSION_DTYPE.itemsize,
+                "state_bytes": self.rows.nbytes
+            }
@@ -0,0 +1,187 @@
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.engine import TickEngine
+from app.main import app, engine, sessions
+from app.sessions import (
+    CALORIES_PER_SECOND,
+    FEEDBACK_TEXT,
+    MACHINES,
+    SESSION_DTYPE,
+    SessionRegistry,
+    feedback_codes,
+)
+
+
+client = TestClient(app)
+
+
+def test_health():
+    assert client.get("/health").json()["status"] == "ok"
+
+
+def test_feedback_codes_match_zone_rules():
+    assert FEEDBACK_TEXT[feedback_codes(100, 0.0, 0)] == "❤️ Light or warm-up."
+    assert FEEDBACK_TEXT[feedback_codes(121, 8.0, 11)] == "💪 Good workout zone. | 🚶 Moderate pace. | 💪 Good reps."
+    assert FEEDBACK_TEXT[feedback_codes(181, 12.5, 21)] == (
+        "⚠️ Danger: HR very high! | ⚠️ Very fast speed. | 🔥 High reps — fatigue likely."
+    )
+    assert feedback_codes([100, 181], [0.0, 12.5], [0, 21]).tolist() == [
+        feedback_codes(100, 0.0, 0), feedback_codes(181, 12.5, 21)
+    ]
+
+
+def test_registry_reuses_rows_and_grows():
+    registry = SessionRegistry(capacity=2)
+    rows = [registry.open(f"s{i}") for i in range(5)]
+
+    assert rows == [0, 1, 2, 3, 4]
+    assert len(registry.rows) >= 5
+    assert registry.open("s3") == 3
+
+    registry.set_machine("s1", "rowing")
+    assert registry.close("s1")
+    assert not registry.close("s1")
+    # The closed row comes back idle
+    assert registry.open("new") == 1
+    assert registry.status("new")["machine"] is None
+    assert registry.stats()["bytes_per_session"] == SESSION_DTYPE.itemsize
+
+
+def test_registry_holds_many_sessions():
+    registry = SessionRegistry()
+    for i in range(50_000):
+        registry.open(f"device-{i}")
+
+    assert len(registry) == 50_000
+    assert registry.row("device-49999") == 49_999
+    assert registry.rows.nbytes <= 2 * 50_000 * SESSION_DTYPE.itemsize
+
+
+def test_sessions_are_independent():
+    client.get("/iot/sessions/a/set-machine/rowing")
+    client.get("/iot/sessions/b/demo")
+
+    a = client.get("/iot/sessions/a/status").json()
+    b = client.get("/iot/sessions/b/status").json()
+    assert a["machine"] == "rowing"
+    assert a["heart_rate"] == 0
+    assert b["heart_rate"] > 0
+    assert b["ai_feedback"] != "Idle"
+
+    assert client.delete("/iot/sessions/a").status_code == 200
+    assert client.get("/iot/sessions/a/status").status_code == 404
+    client.delete("/iot/sessions/b")
+
+
+def test_streams_run_per_session():
+    first = client.get("/iot/sessions/m1/stream/start/treadmill?duration=5").json()
+    second = client.get("/iot/sessions/m2/stream/start/cycling?duration=5").json()
+    assert first["status"] == second["status"] == "started"
+    assert client.get("/iot/sessions/m1/stream/start/treadmill").json()["status"] == "already_running"
+
+    engine.tick()
+    m1 = client.get("/iot/sessions/m1/status").json()
+    assert m1["session_active"] is True
+    assert m1["reps"] > 0
+    assert client.get("/iot/sessions/m2/status").json()["machine"] == "cycling"
+
+    client.get("/iot/sessions/m1/stream/stop")
+    client.delete("/iot/sessions/m1")
+    client.delete("/iot/sessions/m2")
+
+
+def test_default_session_keeps_original_endpoints():
+    assert client.get("/iot/set-machine/treadmill").json() == {"status": "ok", "machine": "treadmill"}
+    assert client.get("/iot/status").json()["machine"] == "treadmill"
+    assert client.get("/iot/set-machine/spaceship").json()["status"] == "error"
+
+    client.get("/iot/reset")
+    status = client.get("/iot/status").json()
+    assert status["machine"] is None
+    assert status["ai_feedback"] == "Idle"
+    assert "default" in sessions
+
+
+def test_long_session_ids_are_rejected():
+    assert client.get("/iot/sessions/" + "x" * 65 + "/demo").status_code == 400
+
+
+def test_out_of_range_durations_are_rejected():
+    for duration in (0, -5, 3000000000):
+        response = client.get(f"/iot/sessions/bad-duration/stream/start/treadmill?duration={duration}")
+        assert response.status_code == 400
+    assert "bad-duration" not in sessions
+    assert client.get("/iot/sessions/bad-duration/stream/start/treadmill?duration=5").json()["status"] == "started"
+    client.get("/iot/sessions/bad-duration/stream/stop")
+
+
+def test_advance_updates_every_running_stream():
+    registry = SessionRegistry()
+    for i, machine in enumerate(MACHINES):
+        registry.begin_stream(f"s{i}", machine, 60, now=100.0)
+    registry.begin_stream("late", "treadmill", 5, now=100.0)
+    registry.begin_stream("stopped", "rowing", 60, now=100.0)
+    registry.stop_stream("stopped")
+
+    assert registry.advance(106.0, 0.5, np.random.default_rng(0)) == len(MACHINES)
+
+    for i, machine in enumerate(MACHINES):
+        status = registry.status(f"s{i}")
+        assert status["session_active"] is True
+        assert status["session_elapsed"] == 6
+        assert status["ai_feedback"] != "Idle"
+        assert np.isclose(status["total_calories"], round(CALORIES_PER_SECOND[i] * 0.5, 3))
+    assert registry.status("s4")["speed"] == 0.0
+    assert registry.status("late")["session_active"] is False
+    assert registry.status("stopped")["session_active"] is False
+
+
+def test_rep_rate_does_not_depend_on_the_tick_interval():
+    counts = {}
+    for tick_seconds in (0.1, 1.0):
+        registry = SessionRegistry()
+        registry.begin_stream("m", "treadmill", 60, now=0.0)
+        ticker = TickEngine(registry, tick_seconds=tick_seconds, seed=2)
+        ticks = round(10 / tick_seconds)
+        for i in range(1, ticks + 1):
+            ticker.tick(now=i * tick_seconds)
+        counts[tick_seconds] = registry.status("m")["reps"]
+
+    # Ten seconds at 1-4 reps per second, whatever the tick
+    for reps in counts.values():
+        assert 10 <= reps <= 40
+
+
+def test_one_tick_advances_ten_thousand_streams():
+    registry = SessionRegistry()
+    for i in range(10_000):
+        registry.begin_stream(f"machine-{i}", MACHINES[i % len(MACHINES)], 600, now=0.0)
+    ticker = TickEngine(registry, seed=1)
+
+    for second in range(3):
+        assert ticker.tick(now=float(second)) == 10_000
+
+    assert registry.status("machine-0")["reps"] >= 3
+    # A whole tick for 10k machines fits well inside a 1s tick on one core
+    assert ticker.stats()["max_tick_duration_ms"] < 500
+
+
+def test_engine_thread_reports_lag_and_jitter():
+    registry = SessionRegistry()
+    registry.begin_stream("fast", "cycling", 60, now=time.time())
+    ticker = TickEngine(registry, tick_seconds=0.01).start()
+    try:
+        time.sleep(0.2)
+    finally:
+        ticker.stop(timeout=1)
+
+    stats = ticker.stats()
+    assert stats["running"] is False
+    assert stats["ticks"] >= 5
+    assert stats["readings"] >= 5
+    assert stats["tick_lag_ms"] >= 0
+    assert stats["tick_jitter_ms"] >= 0
+    assert client.get("/iot/engine").json()["tick_seconds"] == 1.0
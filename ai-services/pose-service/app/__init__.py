@@ -0,0 +1,4 @@
+import time
+
+# Start of the app package import; app.main reports the total (see app/startup.py)
+IMPORT_STARTED = time.perf_counter()
@@ -0,0 +1,115 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+
+from .pool import DEFAULT_POOL_SIZE
+
+MAX_IN_FLIGHT = int(os.getenv("POSE_MAX_IN_FLIGHT", "0")) or DEFAULT_POOL_SIZE
+MAX_QUEUE = int(os.getenv("POSE_MAX_QUEUE", "32"))
+
+
+class Overloaded(Exception):
+    """Raised when the admission queue is full; carries a Retry-After hint in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Pose service overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class InferenceGate:
+    """
+    Bounded executor in front of every CPU-bound pose call.
+
+    At most ``max_in_flight`` jobs run on the worker threads and at most
+    ``max_queue`` more wait for a thread; anything beyond that is rejected
+    immediately with ``Overloaded`` instead of piling up on the event loop.
+    The counters are only touched from the event loop, so no lock is needed.
+    Background threads use ``call`` to share the same worker threads.
+    """
+
+    def __init__(self, max_in_flight=None, max_queue=None):
+        self.max_in_flight = max_in_flight or MAX_IN_FLIGHT
+        self.max_queue = MAX_QUEUE if max_queue is None else max_queue
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._admitted = 0
+        self._rejected = 0
+        self._avg_seconds = 0.0
+
+    @property
+    def queued(self):
+        return max(0, self._admitted - self.max_in_flight)
+
+    def retry_after(self):
+        """Rough seconds until a slot frees up, from the moving average job time."""
+        waves = self.queued / self.max_in_flight + 1
+        return max(1, math.ceil(self._avg_seconds * waves))
+
+    def check(self):
+        """Raise Overloaded now if a new job would be rejected, without reserving a slot."""
+        if self._admitted >= self.max_in_flight + self.max_queue:
+            self._rejected += 1
+            raise Overloaded(self.retry_after())
+
+    @asynccontextmanager
+    async def admit(self, timed=True):
+        """
+        Reserve a slot for async work (e.g. a process-pool batch) or reject.
+        Jobs far longer than a typical request (a whole video) pass
+        ``timed=False`` so they do not inflate everyone's Retry-After.
+        """
+        self.check()
+        self._admitted += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._admitted -= 1
+            if timed:
+                elapsed = time.perf_counter() - started
+                self._avg_seconds = elapsed if not self._avg_seconds else 0.8 * self._avg_seconds + 0.2 * elapsed
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking function on the inference threads without stalling the loop."""
+        async with self.admit():
+            return await self.execute(fn, *args, **kwargs)
+
+    async def execute(self, fn, *args, **kwargs):
+        """Like run(), for callers already holding an admit() slot (e.g. a streamed batch)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), partial(fn, *args, **kwargs))
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Run ``fn`` on the inference threads from a non-async thread (e.g. a
+        background job) and wait for it. Such calls are never rejected; they
+        queue for a thread behind the requests already there.
+        """
+        return self._get_executor().submit(fn, *args, **kwargs).result()
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="pose-infer")
+            return self._executor
+
+    def stats(self):
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "admitted": self._admitted,
+            "queued": self.queued,
+            "rejected": self._rejected,
+            "avg_job_seconds": round(self._avg_seconds, 4)
+        }
+
+    def shutdown(self):
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,405 @@
+import numpy as np
+import math
+
+from .cache import NO_POSE, content_key
+from .geometry import JOINTS, joint_angles, landmarks_to_array
+from .knn import KNN_INDEX
+from .preprocess import decode_for_pose
+from .reps import RepTracker
+from .rules import RULES, bilateral_asymmetry, exercise_angle, rep_angles
+from .startup import lazy_import
+from .timing import NULL_TIMER
+
+# MediaPipe is imported on first use, not with the app (see app/startup.py)
+mp_pose = lazy_import("mediapipe.python.solutions.pose")
+
+
+# --------------------- UTILITIES ------------------
+def calculate_angle(a, b, c):
+    """Return the angle (in degrees) between three points a-b-c."""
+    radians = math.atan2(c[1]-b[1], c[0]-b[0]) - math.atan2(a[1]-b[1], a[0]-b[0])
+    angle = abs(radians * 180.0 / math.pi)
+    return 360 - angle if angle > 180.0 else angle
+
+
+def evaluate_angle(exercise, angle):
+    """Return feedback and score based on exercise type and angle thresholds."""
+    return RULES.evaluate(exercise, angle)
+
+
+def extract_landmarks(lm, exercise):
+    """Select landmarks depending on exercise type."""
+    joint = RULES.joints.get(exercise)
+    if joint is None:
+        return None, None, None
+    points = landmarks_to_array(lm)
+    a, b, c = (points[i, :2].tolist() for i in JOINTS[joint])
+    return a, b, c
+
+def classify_exercise(landmarks, angles=None):
+    """
+    Classify the exercise with the nearest-neighbour index when one is
+    loaded (POSE_CLASSIFIER=knn, see app/knn.py), falling back to the rule
+    table's classifier predicates (app/data/exercise_rules.json) when it is
+    not or the pose is too far from every reference.
+
+    ``landmarks`` may be a MediaPipe landmark list or a ``(33, 4)`` array;
+    pass precomputed ``joint_angles`` to skip recomputing them.
+    """
+    points = landmarks_to_array(landmarks)
+    if KNN_INDEX is not None:
+        exercises, confidences = KNN_INDEX.classify_stack(points)
+        if exercises[0] is not None:
+            return exercises[0], float(confidences[0])
+
+    if angles is None:
+        angles = joint_angles(points)
+    return RULES.classify(points, angles)
+
+
+def classify_stack(points, angles):
+    """``classify_exercise`` for a ``(N, 33, 4)`` stack: ``(exercises list, confidences array)``."""
+    exercises, confidences = RULES.classify_stack(points, angles)
+    if KNN_INDEX is None:
+        return exercises, confidences
+
+    matched, knn_confidences = KNN_INDEX.classify_stack(points)
+    hit = np.array([exercise is not None for exercise in matched], dtype=bool)
+    exercises = [knn if knn is not None else rule for knn, rule in zip(matched, exercises)]
+    return exercises, np.where(hit, knn_confidences, confidences)
+
+
+# --------------------- PIPELINE -------------------
+def measure_landmarks(lm, exercise_type=None):
+    """
+    Convert landmarks once and compute every joint angle in one pass.
+
+    Returns ``(exercise, confidence, angle, angles)`` where ``angle`` is the
+    scored joint for the exercise (None if it has none) and ``angles`` the
+    full ``joint_angles`` row for bilateral checks.
+    """
+    points = landmarks_to_array(lm)
+    angles = joint_angles(points)
+
+    if exercise_type is None:
+        exercise, confidence = classify_exercise(points, angles)
+    else:
+        exercise, confidence = exercise_type, None
+
+    angle = exercise_angle(angles, exercise)
+    return exercise, confidence, None if angle is None else float(angle), angles
+
+
+def _empty_result(file_name, exercise, feedback, pose_detected=False, auto=True, decode_scale=None):
+    result = {
+        "file_name": file_name,
+        "exercise": exercise,
+        "pose_detected": pose_detected,
+        "angle": None,
+        "feedback": feedback,
+        "performance_score": 0.0,
+        "decode_scale": decode_scale
+    }
+    if auto:
+        result["rep_count"] = 0
+    return result
+
+
+def decode_upload(data, pool, cache=None, timer=NULL_TIMER):
+    """
+    First half of ``detect_landmarks``: cache lookup and decode, no
+    inference, so it can run on a decode thread ahead of the model.
+
+    Returns ``(key, points, image, scale)``: ``points`` is set on a cache
+    hit, otherwise ``image`` is the decoded RGB image (None for undecodable
+    bytes). ``scale`` is the decode scale, read back from the cache on a hit.
+    """
+    key = None
+    if cache is not None:
+        # Landmarks differ between model tiers, so the tier is part of the key
+        key = content_key(data, getattr(pool, "model_complexity", None))
+        cached = cache.get(key)
+        timer.lap("cache")
+        if cached is not None:
+            points, scale = cached
+            return key, points, None, scale
+
+    img_rgb, scale = decode_for_pose(data, timer=timer)
+    return key, None, img_rgb, scale
+
+
+def infer_landmarks(decoded, pool, cache=None, timer=NULL_TIMER):
+    """Second half of ``detect_landmarks``: run Pose on ``decode_upload`` output."""
+    key, points, img_rgb, scale = decoded
+    if points is not None:
+        return points, scale
+    if img_rgb is None:
+        return None, None
+
+    with pool.checkout() as pose:
+        timer.lap("pool_wait")
+        res = pose.process(img_rgb)
+        timer.lap("pose_process")
+
+    points = landmarks_to_array(res.pose_landmarks.landmark) if res.pose_landmarks else NO_POSE
+    if cache is not None:
+        cache.put(key, points, scale)
+        timer.lap("cache")
+    return points, scale
+
+
+def detect_landmarks(data, pool, cache=None, timer=NULL_TIMER):
+    """
+    Decode an upload and run Pose on it, consulting ``cache`` first.
+
+    Returns ``(points, scale)``: points is None for undecodable bytes,
+    ``NO_POSE`` (an empty array) when no person was found, otherwise the
+    ``(33, 4)`` landmark array; scale is the decode scale chosen by
+    ``decode_for_pose`` (None when the bytes could not be decoded).
+    """
+    return infer_landmarks(decode_upload(data, pool, cache, timer), pool, cache, timer)
+
+
+def analyze_image(data, file_name, pool, exercise_type=None, invalid_feedback="Invalid image", cache=None,
+                  timer=NULL_TIMER):
+    """
+    Decode one uploaded image, run Pose on it and score the result.
+
+    With ``exercise_type=None`` the exercise is auto-detected and the result
+    has the /workouts/* shape; otherwise the given exercise is scored and the
+    result matches ``PoseResult`` (/analyze-batch). ``pool`` is anything with
+    a ``checkout()`` context manager yielding a Pose-like object. With a
+    ``cache``, repeated uploads skip decode and inference entirely and only
+    the cheap scoring below is redone. ``timer`` collects per-stage times
+    (see app/timing.py). Every result reports the pool's ``model_complexity``.
+    """
+    timer.restart()
+    points, scale = detect_landmarks(data, pool, cache, timer)
+    return _scored_result(points, scale, file_name, pool, exercise_type, invalid_feedback, timer)
+
+
+def analyze_decoded(decoded, file_name, pool, exercise_type=None, invalid_feedback="Invalid image", cache=None,
+                    timer=NULL_TIMER):
+    """``analyze_image`` for an upload already through ``decode_upload`` (see app/pipeline.py)."""
+    points, scale = infer_landmarks(decoded, pool, cache, timer)
+    return _scored_result(points, scale, file_name, pool, exercise_type, invalid_feedback, timer)
+
+
+def _scored_result(points, scale, file_name, pool, exercise_type, invalid_feedback, timer):
+    result = _score_detection(points, scale, file_name, exercise_type, invalid_feedback, timer)
+    result["model_complexity"] = getattr(pool, "model_complexity", None)
+    return result
+
+
+def _score_detection(points, scale, file_name, exercise_type, invalid_feedback, timer):
+    auto = exercise_type is None
+    unknown = "unknown" if auto else exercise_type
+    decode_scale = round(scale, 3) if scale is not None else None
+
+    if points is None:
+        return _empty_result(file_name, unknown, invalid_feedback, auto=auto)
+
+    if not len(points):
+        return _empty_result(file_name, unknown, "No person detected", auto=auto, decode_scale=decode_scale)
+
+    exercise, confidence, angle, angles = measure_landmarks(points, exercise_type)
+    timer.lap("classify")
+
+    if angle is None:
+        if auto:
+            result = _empty_result(file_name, exercise, "Unable to compute angle", pose_detected=True,
+                                   decode_scale=decode_scale)
+            result["rep_angles"] = _rounded_rep_angles(angles)
+            return result
+        return _empty_result(file_name, exercise, "Invalid landmark selection for exercise", auto=False,
+                             decode_scale=decode_scale)
+
+    feedback, score = evaluate_angle(exercise, angle)
+    timer.lap("score")
+
+    if not auto:
+        return {
+            "file_name": file_name,
+            "exercise": exercise,
+            "pose_detected": True,
+            "angle": round(angle, 2),
+            "feedback": feedback,
+            "performance_score": round(score, 2),
+            "decode_scale": decode_scale
+        }
+
+    # Single-frame estimate; ordered sequences are counted with count_reps()
+    rep_count = 1 if score >= 0.8 else 0
+
+    return {
+        "file_name": file_name,
+        "exercise": exercise,
+        "confidence": round(confidence, 2),
+        "pose_detected": True,
+        "angle": round(angle, 2),
+        "asymmetry": round(float(bilateral_asymmetry(angles, exercise)), 2),
+        "feedback": feedback,
+        "performance_score": round(score, 2),
+        "rep_count": rep_count,
+        "rep_angles": _rounded_rep_angles(angles),
+        "decode_scale": decode_scale
+    }
+
+
+def _rounded_rep_angles(angles):
+    # Auto mode counts reps from these, whatever the frame was classified as
+    return {exercise: round(angle, 2) for exercise, angle in rep_angles(angles).items() if angle == angle}
+
+
+def score_stack(points, exercise_type=None):
+    """
+    Classify (unless ``exercise_type`` is given) and score a ``(N, 33, 4)``
+    landmark stack in whole-array passes over the compiled rule table.
+
+    Returns ``(exercises, confidences, angles, asymmetry, feedback, scores)``:
+    lists for the names and feedback, ``(N,)`` arrays otherwise. Frames
+    whose exercise has no scored joint get NaN angles and "Unable to
+    compute angle"; confidences is None when ``exercise_type`` was given.
+    """
+    points = np.asarray(points)
+    angles = joint_angles(points)
+
+    if exercise_type is None:
+        exercises, confidences = classify_stack(points, angles)
+        indices = RULES.exercise_indices(exercises)
+    else:
+        exercises, confidences = [exercise_type] * len(points), None
+        index = RULES.exercise_index(exercise_type)
+        indices = np.full(len(points), -1 if index is None else index, dtype=np.intp)
+
+    angle, asymmetry = RULES.frame_angles(angles, indices)
+    if exercise_type is None:
+        feedback, scores = RULES.evaluate_frames(indices, angle)
+    else:
+        feedback, scores = RULES.evaluate_array(exercise_type, angle)
+
+    unscored = indices < 0
+    if unscored.any():
+        feedback = ["Unable to compute angle" if skip else text for skip, text in zip(unscored.tolist(), feedback)]
+        scores = np.where(unscored, 0.0, scores)
+    return exercises, confidences, angle, asymmetry, feedback, scores
+
+
+def score_landmark_stack(points, exercise_type=None):
+    """
+    Score a ``(N, 33, 4)`` stack of precomputed landmarks without any image
+    work: angles, classification and band lookups all run as whole-array
+    passes (see ``score_stack``). Results use the auto-mode shape with a
+    ``frame`` index.
+    """
+    exercises, confidences, angles, asymmetry, feedback, scores = score_stack(points, exercise_type)
+    confidences = confidences.tolist() if confidences is not None else [None] * len(exercises)
+    frame_rep_angles = stack_rep_angles(points) if exercise_type is None else [None] * len(exercises)
+    results = []
+
+    for index, (exercise, confidence, angle, asym, text, score, rep_angles_row) in enumerate(
+            zip(exercises, confidences, angles.tolist(), asymmetry.tolist(), feedback, scores.tolist(),
+                frame_rep_angles)):
+        result = {
+            "frame": index,
+            "exercise": exercise,
+            "confidence": round(confidence, 2) if confidence is not None else None,
+            "pose_detected": True,
+            "angle": None,
+            "feedback": text,
+            "performance_score": 0.0,
+            "rep_count": 0
+        }
+
+        if angle == angle:
+            result.update({
+                "angle": round(angle, 2),
+                "asymmetry": round(asym, 2),
+                "performance_score": round(score, 2)
+            })
+        if rep_angles_row is not None:
+            result["rep_angles"] = rep_angles_row
+
+        results.append(result)
+
+    return results
+
+
+def stack_rep_angles(points):
+    """Rounded ``rep_angles`` for every frame of an ``(N, 33, 4)`` stack."""
+    angles = joint_angles(np.asarray(points))
+    columns = {exercise: np.round(RULES.exercise_angle(angles, exercise), 2).tolist() for exercise in RULES.rep_bands}
+    return [
+        {exercise: values[i] for exercise, values in columns.items() if values[i] == values[i]}
+        for i in range(len(angles))
+    ]
+
+
+class BatchSummary:
+    """
+    Running /workouts/batch summary, fed one result at a time so streamed
+    batches never hold the full results list. With ``track_reps`` each
+    auto-mode result's ``rep_count`` is replaced by the running rep count,
+    as count_reps() does for a whole list.
+    """
+
+    def __init__(self, track_reps=False):
+        self.total = 0
+        self.scored = 0
+        self.total_score = 0.0
+        self.exercise_counts = {}
+        self.tracker = RepTracker() if track_reps else None
+
+    def add(self, result):
+        index = self.total
+        self.total += 1
+        if result["pose_detected"]:
+            self.exercise_counts[result["exercise"]] = self.exercise_counts.get(result["exercise"], 0) + 1
+        if self.tracker is not None:
+            _track_rep(self.tracker, result, index)
+        if result["angle"] is not None:
+            self.scored += 1
+            self.total_score += result["performance_score"]
+        return result
+
+    def summary(self):
+        avg_score = round(self.total_score / self.scored, 2) if self.scored else 0.0
+        counts = self.exercise_counts
+        return {
+            "processed_images": self.scored,
+            "average_score": avg_score,
+            "most_common_exercise": max(counts, key=counts.get) if counts else "unknown"
+        }
+
+    def reps(self):
+        return self.tracker.summary() if self.tracker is not None else {}
+
+
+def summarize_batch(results):
+    """Summary fields of /workouts/batch computed from ordered per-image results."""
+    summary = BatchSummary()
+    for r in results:
+        summary.add(r)
+    return summary.summary()
+
+
+def _track_rep(tracker, result, index):
+    # Auto-mode results carry rep_angles and count toward the carried
+    # exercise; results of a given exercise count by their own angle
+    if "rep_angles" in result:
+        result["rep_count"], _ = tracker.update_auto(result["exercise"], result["rep_angles"], index)
+    elif result["angle"] is not None:
+        result["rep_count"], _ = tracker.update(result["exercise"], result["angle"], index)
+
+
+def count_reps(results):
+    """
+    Replace each result's ``rep_count`` with the running rep count over the
+    ordered batch, and return per-exercise totals. Auto-mode frames count
+    toward the last exercise classified with a rep band (see
+    ``RepTracker.update_auto``).
+    """
+    tracker = RepTracker()
+    for index, result in enumerate(results):
+        _track_rep(tracker, result, index)
+    return tracker.summary()
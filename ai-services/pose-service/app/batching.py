@@ -0,0 +1,100 @@
+import asyncio
+import os
+
+MICROBATCH_ENABLED = os.getenv("POSE_MICROBATCH", "0") == "1"
+MICROBATCH_MAX_SIZE = int(os.getenv("POSE_MICROBATCH_MAX_SIZE", "8"))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("POSE_MICROBATCH_MAX_WAIT_MS", "5"))
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item requests into small batches.
+
+    ``submit()`` parks the caller on a future; a collector task gathers
+    whatever arrives within ``max_wait_ms`` of the first item (up to
+    ``max_batch_size``), hands the list to ``dispatch`` in one call and fans
+    the ordered results back out to the waiters. A result that is an
+    exception fails only its own waiter; an exception raised by ``dispatch``
+    fails them all.
+    """
+
+    def __init__(self, dispatch, max_batch_size=None, max_wait_ms=None):
+        self.dispatch = dispatch
+        self.max_batch_size = max(1, max_batch_size or MICROBATCH_MAX_SIZE)
+        self.max_wait = (MICROBATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000.0
+
+        self._loop = None
+        self._queue = None
+        self._collector = None
+        self._running = set()
+        self._batches = 0
+        self._items = 0
+
+    def _ensure_collector(self):
+        # The collector is bound to the loop that serves requests; rebuild it
+        # if the app is driven from a new loop (e.g. a fresh test client).
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._collector is None or self._collector.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._collector = loop.create_task(self._collect())
+
+    async def submit(self, item):
+        self._ensure_collector()
+        future = self._loop.create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Dispatch without blocking collection of the next batch
+            task = self._loop.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch):
+        self._batches += 1
+        self._items += len(batch)
+        try:
+            results = await self.dispatch([item for item, _ in batch])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            # gather(return_exceptions=True) hands back CancelledError, which
+            # is a BaseException and cannot be set on a future
+            if isinstance(result, asyncio.CancelledError):
+                future.cancel()
+            elif isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "batches": self._batches,
+            "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0
+        }
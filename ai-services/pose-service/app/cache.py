@@ -0,0 +1,117 @@
+import hashlib
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+
+CACHE_MAX_BYTES = int(float(os.getenv("POSE_CACHE_MAX_MB", "64")) * 1024 * 1024)
+CACHE_DIR = os.getenv("POSE_CACHE_DIR") or None
+
+# Rough per-entry bookkeeping cost on top of the array bytes
+ENTRY_OVERHEAD = 128
+
+# Stored for images where MediaPipe found nobody, so re-uploads skip inference too
+NO_POSE = np.empty((0, 4), dtype=np.float32)
+
+
+def content_key(data, model_complexity=None):
+    """Fast content hash of raw upload bytes, per model tier when given."""
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    return digest if model_complexity is None else f"{digest}-t{model_complexity}"
+
+
+class LandmarkCache:
+    """
+    Content-addressed cache of extracted ``(33, 4)`` landmark arrays, each
+    stored with the decode scale of the image it came from.
+
+    The memory tier is an LRU bounded by total bytes; the optional disk tier
+    (one ``.npz`` per key under ``directory``) survives restarts and is shared
+    by worker processes. Safe to use from the inference threads.
+    """
+
+    def __init__(self, max_bytes=None, directory=None):
+        self.max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.directory = directory if directory is not None else CACHE_DIR
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def _insert(self, key, entry):
+        size = entry[0].nbytes + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[0].nbytes + ENTRY_OVERHEAD
+        self._entries[key] = entry
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes + ENTRY_OVERHEAD
+            self._stats["evictions"] += 1
+
+    def _load(self, key):
+        try:
+            with np.load(self._path(key)) as stored:
+                points, scale = stored["points"], float(stored["scale"])
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+        points.setflags(write=False)
+        return points, None if np.isnan(scale) else scale
+
+    def get(self, key):
+        """``(points, decode_scale)`` for ``key``, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry
+
+        if self.directory:
+            entry = self._load(key)
+            if entry is not None:
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+                    self._insert(key, entry)
+                return entry
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, key, points, scale=None):
+        points = np.ascontiguousarray(points, dtype=np.float32)
+        points.setflags(write=False)
+        with self._lock:
+            self._insert(key, (points, scale))
+
+        if self.directory:
+            # Write-then-rename so readers never see a half-written file
+            tmp = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    np.savez(f, points=points, scale=np.nan if scale is None else scale)
+                os.replace(tmp, self._path(key))
+            except OSError:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk": self.directory,
+                **self._stats,
+            }
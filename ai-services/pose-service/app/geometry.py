@@ -0,0 +1,77 @@
+import numpy as np
+
+NUM_LANDMARKS = 33
+
+# MediaPipe Pose landmark names, in landmark index order
+LANDMARK_NAMES = (
+    "nose", "left_eye_inner", "left_eye", "left_eye_outer", "right_eye_inner", "right_eye",
+    "right_eye_outer", "left_ear", "right_ear", "mouth_left", "mouth_right",
+    "left_shoulder", "right_shoulder", "left_elbow", "right_elbow", "left_wrist", "right_wrist",
+    "left_pinky", "right_pinky", "left_index", "right_index", "left_thumb", "right_thumb",
+    "left_hip", "right_hip", "left_knee", "right_knee", "left_ankle", "right_ankle",
+    "left_heel", "right_heel", "left_foot_index", "right_foot_index",
+)
+LANDMARK_INDEX = {name: i for i, name in enumerate(LANDMARK_NAMES)}
+
+# MediaPipe Pose landmark indices used by the scoring rules
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+
+# Joint name -> (a, b, c) landmark triplet; the angle is measured at b
+JOINTS = {
+    "left_knee": (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE),
+    "right_knee": (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE),
+    "left_elbow": (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST),
+    "right_elbow": (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST),
+    "left_hip": (LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE),
+    "right_hip": (RIGHT_SHOULDER, RIGHT_HIP, RIGHT_KNEE),
+    "left_shoulder": (LEFT_ELBOW, LEFT_SHOULDER, LEFT_HIP),
+    "right_shoulder": (RIGHT_ELBOW, RIGHT_SHOULDER, RIGHT_HIP),
+    "left_body": (LEFT_SHOULDER, LEFT_HIP, LEFT_ANKLE),
+    "right_body": (RIGHT_SHOULDER, RIGHT_HIP, RIGHT_ANKLE),
+}
+JOINT_NAMES = tuple(JOINTS)
+JOINT_COLUMN = {name: i for i, name in enumerate(JOINT_NAMES)}
+_TRIPLETS = np.array([JOINTS[name] for name in JOINT_NAMES], dtype=np.intp)
+
+def landmarks_to_array(lm):
+    """
+    Convert pose landmarks to a ``(33, 4)`` float32 array of
+    (x, y, z, visibility).
+
+    Accepts an existing array, a MediaPipe landmark list or any sequence of
+    objects with ``x``/``y`` attributes (``z`` and ``visibility`` default to
+    0 and 1).
+    """
+    if isinstance(lm, np.ndarray):
+        return lm.astype(np.float32, copy=False)
+    if hasattr(lm, "landmark"):
+        lm = lm.landmark
+    return np.array(
+        [(p.x, p.y, getattr(p, "z", 0.0), getattr(p, "visibility", 1.0)) for p in lm],
+        dtype=np.float32
+    )
+
+
+def joint_angles(points):
+    """
+    Angles in degrees (0-180) for every joint in ``JOINT_NAMES``.
+
+    ``points`` is ``(33, 4)`` for one frame or ``(N, 33, 4)`` for a stack;
+    the result is ``(J,)`` or ``(N, J)`` with columns in ``JOINT_NAMES``
+    order. Computed in float64 so band edges score exactly like the scalar
+    ``calculate_angle``.
+    """
+    xy = np.asarray(points)[..., :2].astype(np.float64)
+    a = xy[..., _TRIPLETS[:, 0], :]
+    b = xy[..., _TRIPLETS[:, 1], :]
+    c = xy[..., _TRIPLETS[:, 2], :]
+
+    radians = (np.arctan2(c[..., 1] - b[..., 1], c[..., 0] - b[..., 0])
+               - np.arctan2(a[..., 1] - b[..., 1], a[..., 0] - b[..., 0]))
+    angles = np.abs(np.degrees(radians))
+    return np.where(angles > 180.0, 360.0 - angles, angles)
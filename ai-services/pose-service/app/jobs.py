@@ -0,0 +1,395 @@
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import struct
+import tarfile
+import threading
+import time
+import uuid
+import zipfile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+JOBS_DIR = os.getenv("POSE_JOBS_DIR", os.path.join(os.path.dirname(BASE_DIR), "pose_jobs"))
+JOB_WORKERS = int(os.getenv("POSE_JOB_WORKERS", "1"))
+# Limits per uploaded archive: entries of any kind, and uncompressed image bytes
+MAX_ARCHIVE_MEMBERS = int(os.getenv("POSE_JOB_MAX_ARCHIVE_MEMBERS", "20000"))
+MAX_ARCHIVE_BYTES = int(float(os.getenv("POSE_JOB_MAX_ARCHIVE_MB", "2048")) * 1024 * 1024)
+# Finished and failed jobs (meta + results) are deleted this long after their last update
+JOB_RETENTION_SECONDS = float(os.getenv("POSE_JOB_RETENTION_SECONDS", str(24 * 3600)))
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+# One little-endian uint64 byte offset per results.jsonl line
+_OFFSET = struct.Struct("<Q")
+
+# Job status values
+QUEUED, RUNNING, COMPLETED, FAILED = "queued", "running", "completed", "failed"
+
+logger = logging.getLogger(__name__)
+
+
+def _write_json(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _is_archive(file_name):
+    return (file_name or "").lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def _is_image(file_name):
+    return file_name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+class _ArchiveLimits:
+    """Running member count and image bytes of one archive; raises ValueError past the caps."""
+
+    def __init__(self, max_members, max_bytes):
+        self.max_members = MAX_ARCHIVE_MEMBERS if max_members is None else max_members
+        self.max_bytes = MAX_ARCHIVE_BYTES if max_bytes is None else max_bytes
+        self.members = 0
+        self.bytes = 0
+
+    def member(self):
+        self.members += 1
+        if self.members > self.max_members:
+            raise ValueError(f"Archive has more than {self.max_members} entries")
+
+    def image(self, size):
+        # Declared sizes are safe to trust: zipfile and tarfile never read past them
+        self.bytes += size
+        if self.bytes > self.max_bytes:
+            raise ValueError(f"Archive expands to more than {self.max_bytes // (1024 * 1024)} MB of images")
+
+
+def iter_archive(fileobj, file_name, max_members=None, max_bytes=None):
+    """
+    Yield ``(member_name, fileobj)`` for every image in a zip or tar archive,
+    one member at a time so the archive is never fully extracted in memory.
+    Raises ValueError once the archive exceeds ``max_members`` entries or
+    ``max_bytes`` of uncompressed images.
+    """
+    limits = _ArchiveLimits(max_members, max_bytes)
+    fileobj.seek(0)
+    if file_name.lower().endswith(".zip"):
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                limits.member()
+                if not info.is_dir() and _is_image(info.filename):
+                    limits.image(info.file_size)
+                    with archive.open(info) as member:
+                        yield os.path.basename(info.filename), member
+        return
+
+    # "r|*" streams members in order without seeking
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+        for info in archive:
+            limits.member()
+            if info.isfile() and _is_image(info.name):
+                limits.image(info.size)
+                member = archive.extractfile(info)
+                if member is not None:
+                    yield os.path.basename(info.name), member
+
+
+class JobStore:
+    """
+    On-disk job state under ``JOBS_DIR/<job_id>/``:
+
+    - ``meta.json``: status, progress counters and final summary
+    - ``inputs/``: spooled items still waiting to be analyzed
+    - ``results.jsonl``: one result per processed item, appended in order;
+      an item that could not be analyzed gets an ``{"error": ...}`` line
+    - ``results.idx``: byte offset of every results line, so a page of
+      results seeks straight to its first line
+
+    Inputs are deleted as soon as their result is written, so a restart
+    resumes exactly where processing stopped. Leftover inputs of a finished
+    or failed job are removed with it, and ``expire()`` deletes such jobs
+    once they are older than ``retention`` seconds.
+    """
+
+    def __init__(self, directory=None, retention=None):
+        self.directory = directory or JOBS_DIR
+        self.retention = JOB_RETENTION_SECONDS if retention is None else retention
+        self._lock = threading.Lock()
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.directory, job_id)
+
+    def _meta_path(self, job_id):
+        return os.path.join(self._job_dir(job_id), "meta.json")
+
+    def create(self, uploads, exercise_type=None):
+        """
+        Spool ``[(file_name, fileobj), ...]`` into a new job. Archives are
+        expanded member by member. Returns the job metadata; raises
+        ValueError for a corrupt or oversized archive.
+        """
+        job_id = uuid.uuid4().hex
+        inputs = os.path.join(self._job_dir(job_id), "inputs")
+        os.makedirs(inputs)
+
+        total = 0
+        try:
+            for file_name, fileobj in uploads:
+                members = iter_archive(fileobj, file_name) if _is_archive(file_name) else [(file_name, fileobj)]
+                for member_name, member in members:
+                    path = os.path.join(inputs, f"{total:06d}_{os.path.basename(member_name or 'image')}")
+                    with open(path, "wb") as f:
+                        shutil.copyfileobj(member, f)
+                    total += 1
+        except (zipfile.BadZipFile, tarfile.TarError) as exc:
+            shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+            raise ValueError(f"Unreadable archive: {exc}")
+        except ValueError:
+            shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+            raise
+
+        meta = {
+            "job_id": job_id,
+            "status": QUEUED,
+            "exercise_type": exercise_type,
+            "total_items": total,
+            "processed_items": 0,
+            "failed_items": 0,
+            "created_at": time.time(),
+            "updated_at": time.time(),
+            "summary": None,
+            "error": None
+        }
+        _write_json(self._meta_path(job_id), meta)
+        return meta
+
+    def get(self, job_id):
+        if not _JOB_ID.fullmatch(job_id):
+            return None
+        try:
+            with open(self._meta_path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            meta = self.get(job_id)
+            if meta is None:
+                raise KeyError(f"Job {job_id} has no readable meta.json")
+            meta.update(fields, updated_at=time.time())
+            _write_json(self._meta_path(job_id), meta)
+            return meta
+
+    def discard_inputs(self, job_id):
+        """Delete the spooled inputs of a job that will not process them any more."""
+        shutil.rmtree(os.path.join(self._job_dir(job_id), "inputs"), ignore_errors=True)
+
+    def expire(self, now=None):
+        """Delete finished and failed jobs last updated more than ``retention`` seconds ago."""
+        if not os.path.isdir(self.directory):
+            return []
+        now = time.time() if now is None else now
+        expired = []
+        for job_id in sorted(os.listdir(self.directory)):
+            meta = self.get(job_id)
+            if meta and meta["status"] in (COMPLETED, FAILED) and now - meta["updated_at"] > self.retention:
+                shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+                expired.append(job_id)
+        return expired
+
+    def pending_inputs(self, job_id):
+        inputs = os.path.join(self._job_dir(job_id), "inputs")
+        if not os.path.isdir(inputs):
+            return []
+        return [os.path.join(inputs, name) for name in sorted(os.listdir(inputs))]
+
+    def _results_path(self, job_id):
+        return os.path.join(self._job_dir(job_id), "results.jsonl")
+
+    def _index_path(self, job_id):
+        return os.path.join(self._job_dir(job_id), "results.idx")
+
+    def append_result(self, job_id, result):
+        with open(self._results_path(job_id), "ab") as f:
+            offset = f.tell()
+            f.write((json.dumps(result) + "\n").encode())
+        with open(self._index_path(job_id), "ab") as f:
+            f.write(_OFFSET.pack(offset))
+
+    def result_count(self, job_id):
+        """
+        Number of results on disk. Also rewrites ``results.idx`` from them,
+        in case a crash came between a result line and its index entry;
+        called once when a job (re)starts.
+        """
+        offsets = []
+        path = self._results_path(job_id)
+        if os.path.exists(path):
+            position = 0
+            with open(path, "rb") as f:
+                for line in f:
+                    offsets.append(position)
+                    position += len(line)
+        index = self._index_path(job_id)
+        with open(f"{index}.tmp", "wb") as f:
+            f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        os.replace(f"{index}.tmp", index)
+        return len(offsets)
+
+    def results(self, job_id, offset=0, limit=None):
+        path = self._results_path(job_id)
+        if not os.path.exists(path):
+            return []
+        start, skip = 0, offset
+        if offset:
+            try:
+                with open(self._index_path(job_id), "rb") as f:
+                    f.seek(offset * _OFFSET.size)
+                    entry = f.read(_OFFSET.size)
+            except FileNotFoundError:
+                entry = None
+            if entry is not None:
+                if len(entry) < _OFFSET.size:
+                    return []
+                (start,), skip = _OFFSET.unpack(entry), 0
+        out = []
+        with open(path, "rb") as f:
+            f.seek(start)
+            for index, line in enumerate(f):
+                if index < skip:
+                    continue
+                if limit is not None and len(out) >= limit:
+                    break
+                out.append(json.loads(line))
+        return out
+
+    def iter_results(self, job_id):
+        """Yield every result in order, reading results.jsonl a line at a time."""
+        path = self._results_path(job_id)
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def unfinished(self):
+        """Job ids that were queued or running when the service last stopped."""
+        if not os.path.isdir(self.directory):
+            return []
+        job_ids = []
+        for job_id in sorted(os.listdir(self.directory)):
+            meta = self.get(job_id)
+            if meta and meta["status"] in (QUEUED, RUNNING):
+                job_ids.append(job_id)
+        return job_ids
+
+
+class JobRunner:
+    """
+    Background threads that work through queued jobs item by item.
+
+    ``analyze(data, file_name, exercise_type)`` scores one item and
+    ``summarize(results)`` builds the final summary from an iterator over
+    the items that succeeded, streamed from disk; both are supplied by the app so jobs share the request
+    path's Pose pool and landmark cache. The optional ``check(file_name,
+    fileobj)`` vets each spooled item before it is read, like the upload
+    checks of the request path. An item whose ``check`` or ``analyze``
+    raises is recorded as an error line and the job goes on with the next one.
+    """
+
+    def __init__(self, store, analyze, summarize, workers=None, check=None):
+        self.store = store
+        self.analyze = analyze
+        self.summarize = summarize
+        self.check = check
+        self.workers = workers or JOB_WORKERS
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _enqueue(self, job_id):
+        with self._lock:
+            if job_id in self._queued:
+                return
+            self._queued.add(job_id)
+        self._queue.put(job_id)
+
+    def start(self):
+        """Start the worker threads and resume jobs left unfinished by a restart."""
+        with self._lock:
+            if self._threads:
+                return self
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"pose-job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+        self._expire()
+        for job_id in self.store.unfinished():
+            self._enqueue(job_id)
+        return self
+
+    def submit(self, job_id):
+        self.start()
+        self._enqueue(job_id)
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                self._queued.discard(job_id)
+            try:
+                self.run_job(job_id)
+            except Exception as exc:
+                self._fail(job_id, exc)
+            self._expire()
+
+    def _fail(self, job_id, exc):
+        # Never let bookkeeping errors (missing meta, full disk) kill the worker
+        try:
+            self.store.update(job_id, status=FAILED, error=repr(exc))
+        except Exception:
+            logger.exception("Could not mark job %s as failed after %r", job_id, exc)
+        self.store.discard_inputs(job_id)
+
+    def _expire(self):
+        try:
+            self.store.expire()
+        except Exception:
+            logger.exception("Could not expire old jobs")
+
+    def run_job(self, job_id):
+        meta = self.store.update(job_id, status=RUNNING)
+        # Results already on disk win over leftover inputs, so an item whose
+        # result was written just before a crash is not analyzed twice.
+        processed = self.store.result_count(job_id)
+        failed = meta.get("failed_items", 0)
+
+        for path in self.store.pending_inputs(job_id):
+            item, file_name = os.path.basename(path).split("_", 1)
+            if int(item) >= processed:
+                try:
+                    with open(path, "rb") as f:
+                        if self.check is not None:
+                            self.check(file_name, f)
+                        data = f.read()
+                    result = self.analyze(data, file_name, meta["exercise_type"])
+                except Exception as exc:
+                    result = {"file_name": file_name, "error": str(exc) or repr(exc)}
+                    failed += 1
+                self.store.append_result(job_id, {"item": int(item), **result})
+                processed += 1
+                self.store.update(job_id, processed_items=processed, failed_items=failed)
+            os.remove(path)
+
+        summary = self.summarize(result for result in self.store.iter_results(job_id) if "error" not in result)
+        self.store.update(job_id, status=COMPLETED, summary=summary)
+        self.store.discard_inputs(job_id)
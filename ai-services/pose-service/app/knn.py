@@ -0,0 +1,186 @@
+"""
+Nearest-neighbour exercise classifier over a precomputed reference index.
+
+Landmarks are normalised into a pose feature vector (body keypoints
+centred on the hip midpoint and scaled by torso length, so position in
+the frame and distance from the camera drop out) and matched against
+labelled reference poses with one matrix product per query batch.
+
+The index is built offline from labelled landmark stacks (``.npy`` or the
+/workouts/landmarks JSON format) and memory-mapped at startup. Run from the
+pose-service directory:
+
+    python -m app.knn --out app/data/knn_index squat=squats.npy plank=planks.json
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from .geometry import LANDMARK_INDEX
+from .payloads import parse_landmark_payload
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CLASSIFIER = os.getenv("POSE_CLASSIFIER", "rules").lower()
+KNN_INDEX_DIR = os.getenv("POSE_KNN_INDEX", os.path.join(BASE_DIR, "data", "knn_index"))
+KNN_K = int(os.getenv("POSE_KNN_K", "5"))
+# Queries whose nearest reference is further than this (in torso lengths)
+# are rejected and left to the rule classifier
+KNN_MAX_DISTANCE = float(os.getenv("POSE_KNN_MAX_DISTANCE", "1.0"))
+
+INDEX_VERSION = 1
+QUERY_CHUNK = 1024
+
+FEATURE_LANDMARKS = (
+    "left_shoulder", "right_shoulder", "left_elbow", "right_elbow", "left_wrist", "right_wrist",
+    "left_hip", "right_hip", "left_knee", "right_knee", "left_ankle", "right_ankle",
+)
+_FEATURE_INDEX = np.array([LANDMARK_INDEX[name] for name in FEATURE_LANDMARKS], dtype=np.intp)
+_LEFT_HIP, _RIGHT_HIP = LANDMARK_INDEX["left_hip"], LANDMARK_INDEX["right_hip"]
+_LEFT_SHOULDER, _RIGHT_SHOULDER = LANDMARK_INDEX["left_shoulder"], LANDMARK_INDEX["right_shoulder"]
+
+
+def pose_features(points):
+    """
+    ``(N, 2 * len(FEATURE_LANDMARKS))`` float32 feature vectors for a
+    ``(N, 33, 4)`` stack (or one ``(33, 4)`` frame, giving ``(1, F)``).
+    """
+    xy = np.asarray(points, dtype=np.float32)[..., :2].reshape(-1, 33, 2)
+    hips = (xy[:, _LEFT_HIP] + xy[:, _RIGHT_HIP]) * 0.5
+    shoulders = (xy[:, _LEFT_SHOULDER] + xy[:, _RIGHT_SHOULDER]) * 0.5
+    torso = np.sqrt(((shoulders - hips) ** 2).sum(axis=1))
+    torso[torso < 1e-6] = 1.0
+    features = (xy[:, _FEATURE_INDEX] - hips[:, np.newaxis]) / torso[:, np.newaxis, np.newaxis]
+    return features.reshape(len(xy), -1)
+
+
+class KnnIndex:
+    """
+    Labelled reference poses: ``features`` ``(M, F)`` float32, ``labels``
+    ``(M,)`` indices into ``classes`` and precomputed squared ``norms``.
+    Arrays may be memory-mapped; they are only ever read.
+    """
+
+    def __init__(self, features, labels, classes, norms=None, k=None, max_distance=None):
+        self.features = features
+        self.labels = labels
+        self.classes = list(classes)
+        self.norms = norms if norms is not None else np.einsum("ij,ij->i", features, features)
+        self.k = min(k or KNN_K, len(labels))
+        self.max_distance = max_distance if max_distance is not None else KNN_MAX_DISTANCE
+
+    def __len__(self):
+        return len(self.labels)
+
+    def query(self, features):
+        """
+        Vote among the ``k`` nearest references for each ``(N, F)`` query.
+        Returns ``(labels, confidences)``: ``(N,)`` class indices (-1 when
+        the nearest reference is beyond ``max_distance``) and vote shares.
+        """
+        labels = np.empty(len(features), dtype=np.intp)
+        confidences = np.empty(len(features))
+        # Chunked so the (queries x references) distance matrix stays small
+        for start in range(0, len(features), QUERY_CHUNK):
+            chunk = features[start:start + QUERY_CHUNK]
+            distances = chunk @ self.features.T
+            distances *= -2.0
+            distances += self.norms
+            distances += np.einsum("ij,ij->i", chunk, chunk)[:, np.newaxis]
+
+            # k argmin passes beat argpartition for the small k used here
+            rows = np.arange(len(chunk))
+            votes = np.zeros((len(chunk), len(self.classes)))
+            for neighbour in range(self.k):
+                nearest = distances.argmin(axis=1)
+                if neighbour == 0:
+                    closest = np.sqrt(np.maximum(distances[rows, nearest], 0.0))
+                votes[rows, self.labels[nearest]] += 1.0
+                distances[rows, nearest] = np.inf
+
+            best = votes.argmax(axis=1)
+            labels[start:start + len(chunk)] = np.where(closest <= self.max_distance, best, -1)
+            confidences[start:start + len(chunk)] = votes[rows, best] / self.k
+        return labels, confidences
+
+    def classify_stack(self, points):
+        """``(exercises, confidences)`` for a landmark stack; rejected frames get ``None``."""
+        labels, confidences = self.query(pose_features(points))
+        return [self.classes[i] if i >= 0 else None for i in labels.tolist()], confidences
+
+    def stats(self):
+        return {"references": len(self), "classes": self.classes, "k": self.k, "max_distance": self.max_distance}
+
+
+def build_index(points, labels, directory):
+    """
+    Write an index for the ``(M, 33, 4)`` landmark stack ``points`` with
+    one exercise name per frame in ``labels``.
+    """
+    classes = sorted(set(labels))
+    features = pose_features(points)
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, "features.npy"), features)
+    np.save(os.path.join(directory, "labels.npy"),
+            np.array([classes.index(label) for label in labels], dtype=np.int16))
+    np.save(os.path.join(directory, "norms.npy"), np.einsum("ij,ij->i", features, features))
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump({"version": INDEX_VERSION, "classes": classes, "landmarks": list(FEATURE_LANDMARKS)}, f, indent=2)
+
+
+def load_index(directory=None, **kw):
+    """Memory-map the index in ``directory``; raises ValueError for a stale or foreign index."""
+    directory = directory or KNN_INDEX_DIR
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get("version") != INDEX_VERSION or meta.get("landmarks") != list(FEATURE_LANDMARKS):
+        raise ValueError(f"kNN index in {directory} was built with a different feature layout; rebuild it")
+
+    def mapped(name):
+        return np.load(os.path.join(directory, name), mmap_mode="r")
+
+    return KnnIndex(mapped("features.npy"), mapped("labels.npy"), meta["classes"], mapped("norms.npy"), **kw)
+
+
+def _startup_index():
+    """The index used by the service, or None when the rule classifier is selected or no index exists."""
+    if CLASSIFIER != "knn":
+        return None
+    try:
+        return load_index()
+    except (OSError, ValueError):
+        return None
+
+
+KNN_INDEX = _startup_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="+", metavar="EXERCISE=PATH",
+                        help="labelled landmark stack (.npy, raw float32 or landmarks JSON)")
+    parser.add_argument("--out", default=KNN_INDEX_DIR)
+    args = parser.parse_args(argv)
+
+    stacks, labels = [], []
+    for source in args.sources:
+        exercise, _, path = source.partition("=")
+        if not path:
+            parser.error(f"expected EXERCISE=PATH, got '{source}'")
+        with open(path, "rb") as f:
+            body = f.read()
+        content_type = "application/json" if path.endswith(".json") else "application/octet-stream"
+        stack = parse_landmark_payload(body, content_type)
+        stacks.append(stack)
+        labels += [exercise] * len(stack)
+
+    build_index(np.concatenate(stacks), labels, args.out)
+    print(f"Wrote {len(labels)} reference poses ({', '.join(sorted(set(labels)))}) to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,458 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from starlette.websockets import WebSocketDisconnect
+
+from .admission import Overloaded
+from .analysis import evaluate_angle, measure_landmarks, mp_pose
+from .geometry import landmarks_to_array
+from .pool import DEFAULT_MODEL_COMPLEXITY, TierUnavailable, create_pose
+from .preprocess import decode_for_pose
+from .reps import RepTracker
+from .rules import rep_angles
+from .timing import NULL_TIMER
+
+# Weight of the newest angle in the per-session moving average; 1 disables smoothing
+ANGLE_SMOOTHING = float(os.getenv("POSE_ANGLE_SMOOTHING", "0.5"))
+# Padding around the previous person's bounding box, as a fraction of its size
+ROI_MARGIN = float(os.getenv("POSE_ROI_MARGIN", "0.25"))
+# Crops covering more of the frame than this are not worth making
+ROI_MAX_AREA = 0.8
+ROI_MIN_PIXELS = 16
+
+SESSION_IDLE_SECONDS = float(os.getenv("POSE_SESSION_IDLE_SECONDS", "60"))
+MAX_SESSIONS = int(os.getenv("POSE_MAX_SESSIONS", "32"))
+
+
+class LatestFrame:
+    """
+    Single-slot mailbox that always holds the newest frame.
+
+    Putting a frame while one is still waiting replaces it and counts it as
+    dropped, so a client that sends faster than inference never builds up a
+    backlog of stale frames.
+    """
+
+    def __init__(self):
+        self._frame = None
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, frame):
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = frame
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def get(self):
+        """Wait for the newest frame; returns None once the slot is closed and empty."""
+        while self._frame is None:
+            if self.closed:
+                return None
+            await self._ready.wait()
+            self._ready.clear()
+        frame, self._frame = self._frame, None
+        return frame
+
+
+class LiveSession:
+    """
+    Tracking-mode Pose instance and rep state bound to one client (a live
+    websocket or a /workouts/frame ``session_id``).
+
+    Consecutive frames are cropped to the previous person's bounding box
+    plus ``ROI_MARGIN`` before inference; the crop is kept while the person
+    stays well inside it, so MediaPipe's own tracking sees a stable frame,
+    and dropped for a full-frame retry as soon as the person is lost or the
+    frame size changes (e.g. a phone rotated mid-session). The
+    scored angle is an exponential moving average (``ANGLE_SMOOTHING``)
+    that restarts whenever the exercise changes. Without an exercise_type,
+    reps count toward the exercise carried across frames (see
+    ``RepTracker.update_auto``), on per-exercise smoothed angles. Frames of
+    one session are processed one at a time.
+    """
+
+    def __init__(self, exercise_type=None, model_complexity=None):
+        self.exercise_type = exercise_type
+        self.model_complexity = DEFAULT_MODEL_COMPLEXITY if model_complexity is None else model_complexity
+        self.pose = create_pose(self.model_complexity, static_image_mode=False)
+        self.tracker = RepTracker()
+        self.frames = 0
+        self.started = time.monotonic()
+        self.last_used = self.started
+
+        self.roi = None
+        # (width, height) of the frame the ROI was computed on
+        self.roi_frame_size = None
+        self.roi_frames = 0
+        self.last_points = None
+        self._smoothed = None
+        self._smoothed_exercise = None
+        self._rep_smoothed = {}
+        self._lock = threading.Lock()
+        # Registry bookkeeping (see SessionRegistry)
+        self.users = 0
+        self.retired = False
+
+    def process(self, data, timer=NULL_TIMER):
+        with self._lock:
+            return self._process(data, timer)
+
+    def _process(self, data, timer):
+        started = time.perf_counter()
+        self.frames += 1
+
+        result = {
+            "frame": self.frames,
+            "pose_detected": False,
+            "exercise": self.exercise_type or "unknown",
+            "angle": None,
+            "feedback": "Invalid image format",
+            "performance_score": 0.0,
+            "rep_count": 0,
+            "rep": None,
+            "roi": False,
+            "model_complexity": self.model_complexity
+        }
+
+        img, _ = decode_for_pose(data, timer=timer)
+        if img is not None:
+            points, cropped = self._detect(img, timer)
+            result["feedback"] = "No person detected"
+            result["roi"] = cropped
+
+            if points is not None:
+                exercise, _, angle, angles = measure_landmarks(points, self.exercise_type)
+                angle = self._smooth(exercise, angle)
+                if angle is None:
+                    feedback, score = "Unable to compute angle", 0.0
+                else:
+                    feedback, score = evaluate_angle(exercise, angle)
+                timer.lap("score")
+
+                elapsed = time.monotonic() - self.started
+                if self.exercise_type is None:
+                    rep_count, rep = self.tracker.update_auto(exercise, self._smooth_rep_angles(angles), elapsed)
+                else:
+                    rep_count, rep = self.tracker.update(exercise, angle, elapsed)
+                result.update({
+                    "pose_detected": True,
+                    "exercise": exercise,
+                    "angle": round(angle, 2) if angle is not None else None,
+                    "feedback": feedback,
+                    "performance_score": round(score, 2),
+                    "rep_count": rep_count,
+                    "rep": rep
+                })
+
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    def _detect(self, img, timer):
+        """Landmarks in full-frame coordinates (or None) and whether the ROI crop was used."""
+        height, width = img.shape[:2]
+        if self.roi is not None and self.roi_frame_size != (width, height):
+            # The crop is in the previous frame's pixels and may not fit this one
+            self.roi = None
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            try:
+                res = self.pose.process(np.ascontiguousarray(img[y0:y1, x0:x1]))
+            except Exception:
+                # Start the next frame from the whole image instead of the same crop
+                self.roi = None
+                raise
+            timer.lap("pose_process")
+            if res.pose_landmarks:
+                points = landmarks_to_array(res.pose_landmarks.landmark).copy()
+                points[:, 0] = (x0 + points[:, 0] * (x1 - x0)) / width
+                points[:, 1] = (y0 + points[:, 1] * (y1 - y0)) / height
+                self.roi_frames += 1
+                self._track(points, width, height)
+                return points, True
+            # Person left the crop: look at the whole frame again
+            self.roi = None
+
+        res = self.pose.process(img)
+        timer.lap("pose_process")
+        if not res.pose_landmarks:
+            self.last_points = None
+            return None, False
+        points = landmarks_to_array(res.pose_landmarks.landmark)
+        self._track(points, width, height)
+        return points, False
+
+    def _track(self, points, width, height):
+        """Remember the landmarks and move the crop if the person got close to its edge."""
+        self.last_points = points
+        visible = points[points[:, 3] >= 0.5]
+        if len(visible) < 4:
+            visible = points
+        bx0, by0 = visible[:, 0].min() * width, visible[:, 1].min() * height
+        bx1, by1 = visible[:, 0].max() * width, visible[:, 1].max() * height
+        box_width, box_height = bx1 - bx0, by1 - by0
+        if box_width < ROI_MIN_PIXELS or box_height < ROI_MIN_PIXELS:
+            self.roi = None
+            return
+
+        pad_x, pad_y = box_width * ROI_MARGIN, box_height * ROI_MARGIN
+        if self.roi is not None:
+            # Keep the crop while at least half the margin is left on every side
+            x0, y0, x1, y1 = self.roi
+            if (x0 <= max(0, bx0 - pad_x / 2) and y0 <= max(0, by0 - pad_y / 2)
+                    and x1 >= min(width, bx1 + pad_x / 2) and y1 >= min(height, by1 + pad_y / 2)):
+                return
+
+        x0, y0 = max(0, int(bx0 - pad_x)), max(0, int(by0 - pad_y))
+        x1, y1 = min(width, math.ceil(bx1 + pad_x)), min(height, math.ceil(by1 + pad_y))
+        if (x1 - x0) * (y1 - y0) >= ROI_MAX_AREA * width * height:
+            self.roi = None
+        else:
+            self.roi = (x0, y0, x1, y1)
+            self.roi_frame_size = (width, height)
+
+    def _smooth(self, exercise, angle):
+        if angle is None or self._smoothed is None or exercise != self._smoothed_exercise:
+            self._smoothed = angle
+        else:
+            self._smoothed += ANGLE_SMOOTHING * (angle - self._smoothed)
+        self._smoothed_exercise = exercise
+        return self._smoothed
+
+    def _smooth_rep_angles(self, angles):
+        # One moving average per exercise joint, kept across classification changes
+        for exercise, angle in rep_angles(angles).items():
+            if angle != angle:
+                continue
+            previous = self._rep_smoothed.get(exercise)
+            self._rep_smoothed[exercise] = angle if previous is None else previous + ANGLE_SMOOTHING * (angle - previous)
+        return self._rep_smoothed
+
+    def close(self):
+        with self._lock:
+            self.pose.close()
+
+
+def _close_all(sessions):
+    for session in sessions:
+        session.close()
+
+
+class SessionRegistry:
+    """
+    LiveSessions of /workouts/frame clients keyed by ``session_id``.
+
+    Callers pin a session with ``acquire`` for as long as they use it and
+    hand it back with ``release``. Unpinned sessions idle for longer than
+    ``idle_seconds`` are closed on the next acquire or release, or by the
+    ``sweep`` task when no frames arrive at all; beyond ``max_sessions``
+    the least recently used one is evicted. A session that is closed,
+    evicted or replaced while pinned leaves the registry at once but keeps
+    its Pose instance until the last user releases it. Models are loaded
+    outside the registry lock.
+    """
+
+    def __init__(self, idle_seconds=None, max_sessions=None, clock=time.monotonic):
+        self.idle_seconds = SESSION_IDLE_SECONDS if idle_seconds is None else idle_seconds
+        self.max_sessions = max_sessions or MAX_SESSIONS
+        self.clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._expired = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def acquire(self, session_id, exercise_type=None, model_complexity=None):
+        """
+        Pin and return the session for ``session_id``, created on first use.
+        Every call must be paired with ``release``. Raises TierUnavailable
+        if its model tier cannot be loaded.
+        """
+        if model_complexity is None:
+            model_complexity = DEFAULT_MODEL_COMPLEXITY
+        closing = []
+        try:
+            with self._lock:
+                self._expire(closing)
+                session = self._lookup(session_id, model_complexity, closing)
+                if session is not None:
+                    return self._pin(session_id, session, exercise_type)
+
+            # Loading a model is slow: do it without holding up other sessions
+            created = LiveSession(exercise_type, model_complexity)
+            with self._lock:
+                session = self._lookup(session_id, model_complexity, closing)
+                if session is None:
+                    while len(self._sessions) >= self.max_sessions:
+                        _, oldest = self._sessions.popitem(last=False)
+                        self._retire(oldest, closing)
+                        self._expired += 1
+                    session = created
+                    self._sessions[session_id] = session
+                    self._created += 1
+                else:
+                    # Another request created the session first
+                    closing.append(created)
+                return self._pin(session_id, session, exercise_type)
+        finally:
+            _close_all(closing)
+
+    def release(self, session):
+        """Unpin ``session``; closes it if it left the registry while in use."""
+        closing = []
+        with self._lock:
+            session.users -= 1
+            session.last_used = self.clock()
+            if session.retired and not session.users:
+                closing.append(session)
+            self._expire(closing)
+        _close_all(closing)
+
+    def _lookup(self, session_id, model_complexity, closing):
+        session = self._sessions.get(session_id)
+        if session is not None and session.model_complexity != model_complexity:
+            # A different model tier needs a different Pose instance
+            self._retire(self._sessions.pop(session_id), closing)
+            session = None
+        return session
+
+    def _pin(self, session_id, session, exercise_type):
+        self._sessions.move_to_end(session_id)
+        session.users += 1
+        session.exercise_type = exercise_type
+        session.last_used = self.clock()
+        return session
+
+    @staticmethod
+    def _retire(session, closing):
+        """Queue a removed session for closing, or leave that to its last user."""
+        session.retired = True
+        if not session.users:
+            closing.append(session)
+
+    def expire(self):
+        closing = []
+        with self._lock:
+            self._expire(closing)
+        _close_all(closing)
+
+    async def sweep(self, interval=None):
+        """Close idle sessions every ``interval`` seconds (default half of ``idle_seconds``); run as a task."""
+        interval = interval or max(1.0, self.idle_seconds / 2)
+        while True:
+            await asyncio.sleep(interval)
+            await run_in_threadpool(self.expire)
+
+    def _expire(self, closing):
+        deadline = self.clock() - self.idle_seconds
+        for session_id, session in list(self._sessions.items()):
+            if session.last_used > deadline:
+                break
+            if session.users:
+                # In use, so not idle however long the frame takes
+                continue
+            del self._sessions[session_id]
+            self._retire(session, closing)
+            self._expired += 1
+
+    def close(self, session_id):
+        """Close ``session_id``; returns the closed session, or None if there was none."""
+        closing = []
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._retire(session, closing)
+        _close_all(closing)
+        return session
+
+    def close_all(self):
+        closing = []
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), OrderedDict()
+            for session in sessions:
+                self._retire(session, closing)
+        _close_all(closing)
+
+    def stats(self):
+        return {
+            "active": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "idle_seconds": self.idle_seconds,
+            "created": self._created,
+            "expired": self._expired
+        }
+
+
+async def serve_live_session(websocket, run, exercise_type=None, model_complexity=None):
+    """
+    Pump JPEG frames from ``websocket`` through a LiveSession.
+
+    A receiver task keeps only the newest frame in a LatestFrame slot while
+    the loop below runs inference on it via ``run`` (the inference gate) and
+    sends one JSON result per processed frame. Text messages are not
+    frames: the socket is closed with 1003 (unsupported data).
+    """
+    try:
+        # Loading the model blocks, so keep it off the event loop
+        session = await run_in_threadpool(LiveSession, exercise_type, model_complexity)
+    except TierUnavailable as exc:
+        await websocket.send_json({"error": str(exc)})
+        await websocket.close(code=1011)
+        return
+    slot = LatestFrame()
+
+    async def receive():
+        """Feed binary frames into the slot; returns a close code for bad input, else None."""
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return None
+                if message.get("bytes") is None:
+                    return 1003
+                slot.put(message["bytes"])
+        finally:
+            slot.close()
+
+    receiver = asyncio.ensure_future(receive())
+    close_code = None
+    try:
+        while True:
+            frame = await slot.get()
+            if frame is None:
+                break
+
+            try:
+                result = await run(session.process, frame)
+            except Overloaded as exc:
+                result = {"error": "overloaded", "retry_after": exc.retry_after}
+
+            result["dropped_frames"] = slot.dropped
+            await websocket.send_json(result)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await run_in_threadpool(session.close)
+        if not receiver.done():
+            receiver.cancel()
+        try:
+            # Re-raises anything the receiver failed with
+            close_code = await receiver
+        except asyncio.CancelledError:
+            pass
+
+    if close_code is not None:
+        await websocket.close(code=close_code)
@@ -1,14 +1,99 @@
-from fastapi import FastAPI, File, UploadFile, Form
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request, WebSocket
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List
-import numpy as np
-import cv2
-import mediapipe as mp
+import asyncio
+import json
 import math
-
-app = FastAPI(title="AI Gym Trainer Service (Multi-Exercise)")
-
-mp_pose = mp.solutions.pose
+import re
+import time
+
+from . import IMPORT_STARTED
+
+# Scoring helpers stay importable from app.main for existing callers
+from .analysis import (
+    BatchSummary,
+    analyze_image,
+    calculate_angle,
+    classify_exercise,
+    count_reps,
+    evaluate_angle,
+    extract_landmarks,
+    score_landmark_stack,
+    summarize_batch,
+)
+from .admission import InferenceGate, Overloaded
+from .batching import MICROBATCH_ENABLED, MicroBatcher
+from .cache import LandmarkCache
+from .jobs import JobRunner, JobStore
+from .knn import KNN_INDEX
+from .memory import (
+    MAX_UPLOAD_BYTES,
+    REQUEST_MEMORY_BUDGET,
+    MemoryStats,
+    UploadTooLarge,
+    check_upload,
+    read_upload,
+    upload_size,
+)
+from .live import SessionRegistry, serve_live_session
+from .payloads import parse_landmark_payload
+from .pipeline import PIPELINE_ENABLED, DecodePipeline
+from .pool import PoolExhausted, TieredPosePool, TierUnavailable
+from .startup import IMPORT_SECONDS, Warmup, lazy_import
+from .tiers import AUTO, TierSelector, parse_tier
+from .timing import StageMetrics, TimedJSONResponse, TimingMiddleware, image_timer
+from .video import MAX_VIDEO_BYTES, VIDEO_SAMPLE_FPS, analyze_video_upload
+from .workers import EXECUTION_MODE, BatchProcessPool
+
+app = FastAPI(title="AI Gym Trainer Service (Multi-Exercise)", default_response_class=TimedJSONResponse)
+
+# Per-stage latency histograms behind /metrics and the Server-Timing header (see app/timing.py)
+stage_metrics = StageMetrics()
+app.add_middleware(TimingMiddleware, metrics=stage_metrics)
+
+mp_pose = lazy_import("mediapipe.python.solutions.pose")
+
+# Warm Pose instances shared by every route, one pool per model tier (see app/pool.py)
+pose_pools = TieredPosePool()
+
+# Per-request model tier, with optional load-based degradation (see app/tiers.py)
+tier_selector = TierSelector()
+
+# Landmarks of recently seen uploads, keyed by content hash (see app/cache.py)
+landmark_cache = LandmarkCache()
+
+# Bounded executor + admission queue for all CPU-bound inference (see app/admission.py)
+inference_gate = InferenceGate()
+
+# Multi-core batch execution, enabled with POSE_EXECUTION_MODE=process
+batch_process_pool = BatchProcessPool() if EXECUTION_MODE == "process" else None
+
+# Tracking-mode sessions of /workouts/frame?session_id=... (see app/live.py)
+live_sessions = SessionRegistry()
+
+# Process RSS and per-request upload/decode footprint (see app/memory.py)
+memory_stats = MemoryStats()
+
+# Decode-ahead for thread-mode batches, disabled with POSE_PIPELINE=0 (see app/pipeline.py)
+decode_pipeline = DecodePipeline(memory=memory_stats) if PIPELINE_ENABLED else None
+
+def _models_warm():
+    """Whether the default pools were already started, e.g. by a request in lazy mode."""
+    return pose_pools.ready(pose_pools.default_tier) and (batch_process_pool is None or batch_process_pool.started)
+
+
+# Model loads behind /health/ready, run per POSE_WARMUP (see app/startup.py)
+warmup = Warmup(
+    [("pose_pool", pose_pools.start)]
+    + ([("process_pool", batch_process_pool.start)] if batch_process_pool is not None else []),
+    is_warm=_models_warm
+)
+STARTED_AT = time.monotonic()
+
+NDJSON = "application/x-ndjson"
 
 
 # --------------------- MODELS ---------------------
@@ -19,178 +104,413 @@ class PoseResult(BaseModel):
     angle: float | None
     feedback: str
     performance_score: float
+    decode_scale: float | None = None
+    timings: dict | None = None
+    model_complexity: int | None = None
 
 
-# --------------------- UTILITIES ------------------
-def calculate_angle(a, b, c):
-    """Return the angle (in degrees) between three points a-b-c."""
-    a, b, c = np.array(a), np.array(b), np.array(c)
-    radians = math.atan2(c[1]-b[1], c[0]-b[0]) - math.atan2(a[1]-b[1], a[0]-b[0])
-    angle = abs(radians * 180.0 / math.pi)
-    return 360 - angle if angle > 180.0 else angle
-
-
-def evaluate_angle(exercise, angle):
-    """Return feedback and score based on exercise type and angle thresholds."""
-    exercise = exercise.lower()
-
-    if exercise == "squat":
-        if angle > 160:
-            return "Standing too tall", 0.4
-        elif 90 <= angle <= 160:
-            return "Good squat depth", 1.0
-        elif angle < 90:
-            return "Too low – control your depth", 0.6
-
-    elif exercise == "pushup":
-        if angle > 160:
-            return "Arms too straight, lower your body", 0.4
-        elif 90 <= angle <= 160:
-            return "Good push-up depth", 1.0
-        elif angle < 90:
-            return "Too low – risk of shoulder strain", 0.6
-
-    elif exercise == "plank":
-        if 170 <= angle <= 180:
-            return "Perfect plank posture", 1.0
-        elif angle < 170:
-            return "Hips too low", 0.5
-        else:
-            return "Hips too high", 0.6
-
-    elif exercise == "lunge":
-        if angle > 160:
-            return "Incomplete lunge – go lower", 0.5
-        elif 90 <= angle <= 160:
-            return "Good lunge form", 1.0
-        elif angle < 90:
-            return "Too deep – unsafe range", 0.6
-
-    elif exercise == "bicep_curl":
-        if angle > 150:
-            return "Arm extended – ready position", 0.5
-        elif 45 <= angle <= 150:
-            return "Good curl range", 1.0
-        elif angle < 45:
-            return "Curl too tight", 0.7
-
-    return "Unrecognized exercise", 0.0
-
-
-def extract_landmarks(lm, exercise):
-    """Select landmarks depending on exercise type."""
-    if exercise in ["squat", "lunge"]:
-        a = [lm[mp_pose.PoseLandmark.LEFT_HIP.value].x, lm[mp_pose.PoseLandmark.LEFT_HIP.value].y]
-        b = [lm[mp_pose.PoseLandmark.LEFT_KNEE.value].x, lm[mp_pose.PoseLandmark.LEFT_KNEE.value].y]
-        c = [lm[mp_pose.PoseLandmark.LEFT_ANKLE.value].x, lm[mp_pose.PoseLandmark.LEFT_ANKLE.value].y]
-    elif exercise in ["pushup", "bicep_curl"]:
-        a = [lm[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x, lm[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-        b = [lm[mp_pose.PoseLandmark.LEFT_ELBOW.value].x, lm[mp_pose.PoseLandmark.LEFT_ELBOW.value].y]
-        c = [lm[mp_pose.PoseLandmark.LEFT_WRIST.value].x, lm[mp_pose.PoseLandmark.LEFT_WRIST.value].y]
-    elif exercise == "plank":
-        a = [lm[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x, lm[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-        b = [lm[mp_pose.PoseLandmark.LEFT_HIP.value].x, lm[mp_pose.PoseLandmark.LEFT_HIP.value].y]
-        c = [lm[mp_pose.PoseLandmark.LEFT_ANKLE.value].x, lm[mp_pose.PoseLandmark.LEFT_ANKLE.value].y]
-    else:
-        a, b, c = None, None, None
-    return a, b, c
+# --------------------- LIFECYCLE ------------------
+@app.on_event("startup")
+def warm_pose_pool():
+    job_runner.start()
+    warmup.on_startup()
+
+
+@app.on_event("startup")
+async def start_session_sweep():
+    # Idle sessions give back their Pose instances even if no client comes back
+    app.state.session_sweep = asyncio.ensure_future(live_sessions.sweep())
+
+
+@app.on_event("shutdown")
+def close_pose_pool():
+    sweep = getattr(app.state, "session_sweep", None)
+    if sweep is not None:
+        sweep.cancel()
+    pose_pools.close()
+    live_sessions.close_all()
+    inference_gate.shutdown()
+    if decode_pipeline is not None:
+        decode_pipeline.shutdown()
+    if batch_process_pool is not None:
+        batch_process_pool.shutdown()
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+@app.exception_handler(TierUnavailable)
+async def tier_unavailable_handler(request: Request, exc: TierUnavailable):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
+# --------------------- HELPERS --------------------
+def _analyze_items(items, exercise_type=None, invalid_feedback="Invalid image", costs=None):
+    """
+    Analyze ``[(file_name, data, timer, pool), ...]`` in order; ``data`` is
+    bytes or a spooled upload file, read one item at a time.
+    """
+    if decode_pipeline is not None and len(items) > 1:
+        return decode_pipeline.run(items, exercise_type, invalid_feedback, landmark_cache, costs,
+                                   REQUEST_MEMORY_BUDGET)
 
-def classify_exercise(landmarks):
+    results = []
+    for index, (file_name, data, timer, pool) in enumerate(items):
+        if not isinstance(data, bytes):
+            timer.restart()
+            data = read_upload(data)
+            timer.lap("read")
+        if costs is not None:
+            memory_stats.observe_request(costs[index])
+        results.append(analyze_image(data, file_name, pool, exercise_type, invalid_feedback, landmark_cache, timer))
+        # Drop this upload's bytes before reading the next one
+        del data
+    return results
+
+
+async def _choose_pool(model_complexity=None):
     """
-    Stronger, more accurate multi-exercise classifier.
+    Resolve a request's ``model_complexity`` to the PosePool of the tier it
+    runs on, warming that tier on first use. Adaptive requests fall back to
+    the default tier when the chosen one cannot be loaded.
     """
     try:
-        left_hip = landmarks[23]
-        right_hip = landmarks[24]
-        left_knee = landmarks[25]
-        right_knee = landmarks[26]
-        left_ankle = landmarks[27]
-        right_ankle = landmarks[28]
-        left_shoulder = landmarks[11]
-        right_shoulder = landmarks[12]
-        left_elbow = landmarks[13]
-        right_elbow = landmarks[14]
-        left_wrist = landmarks[15]
-        right_wrist = landmarks[16]
-
-        # ----------------------------------------------------
-        # 1️⃣ LUNGE (robust detection)
-        # ----------------------------------------------------
-        # Knee angles (left and right)
-        left_knee_angle = calculate_angle(
-            [left_hip.x, left_hip.y],
-            [left_knee.x, left_knee.y],
-            [left_ankle.x, left_ankle.y]
-        )
+        requested = parse_tier(model_complexity)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    tier = tier_selector.select(requested, inference_gate.queued)
+    # Process-mode workers warm their own pools
+    if batch_process_pool is None and not pose_pools.ready(tier):
+        try:
+            await run_in_threadpool(pose_pools.prepare, tier)
+        except TierUnavailable:
+            if isinstance(requested, int) or tier == pose_pools.default_tier:
+                raise
+            tier = pose_pools.default_tier
+    return pose_pools.pool(tier)
+
+
+async def _check_uploads(files):
+    """Per-upload memory costs; rejects oversized uploads with 413 before any work starts."""
+    try:
+        # Header reads may hit disk once an upload has rolled over from memory
+        return await run_in_threadpool(lambda: [check_upload(file.filename, file.file) for file in files])
+    except UploadTooLarge as exc:
+        memory_stats.rejected += 1
+        raise HTTPException(status_code=413, detail=str(exc))
+
+
+_SESSION_ID = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+
+
+async def _analyze_session_frame(file, session_id, model_complexity, timings):
+    """One frame of a /workouts/frame session, run on the session's own Pose instance."""
+    if not _SESSION_ID.fullmatch(session_id):
+        raise HTTPException(status_code=400, detail="session_id must be 1-64 characters of [A-Za-z0-9_.-]")
+    try:
+        tier = _explicit_tier(model_complexity)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    await _check_uploads([file])
+    data, timer = await _read_timed(file)
+    session = await run_in_threadpool(live_sessions.acquire, session_id, None, tier)
+    try:
+        result = await inference_gate.run(session.process, data, timer)
+    finally:
+        # Closes the session here if it was ended or evicted meanwhile
+        await run_in_threadpool(live_sessions.release, session)
+    result = {"file_name": file.filename, "session_id": session_id, **result}
+    return _attach_timings([result], [timer])[0] if timings else result
+
+
+def _explicit_tier(model_complexity):
+    """Tier for per-connection models (video, live), which are not adaptive."""
+    tier = parse_tier(model_complexity)
+    return pose_pools.default_tier if tier is None or tier == AUTO else tier
 
-        right_knee_angle = calculate_angle(
-            [right_hip.x, right_hip.y],
-            [right_knee.x, right_knee.y],
-            [right_ankle.x, right_ankle.y]
+
+def _record_latencies(timers):
+    for timer in timers:
+        tier_selector.record(sum(timer.stages.values()))
+
+
+async def _read_timed(file):
+    """Read one upload into a fresh per-image timer; returns ``(data, timer)``."""
+    timer = image_timer()
+    data = await file.read()
+    timer.lap("read")
+    return data, timer
+
+
+def _attach_timings(results, timers):
+    for result, timer in zip(results, timers):
+        result["timings"] = timer.as_ms()
+    return results
+
+
+async def _dispatch_frames(items):
+    """
+    Run one micro-batch. MediaPipe Pose takes a single image per call, so the
+    frames spread over the inference threads (one pool instance each) and
+    each is admitted on its own, exactly as an unbatched request would be:
+    the gate's in-flight + queue bound holds per frame, and a rejected frame
+    fails only its own request.
+    """
+    return await asyncio.gather(*(
+        inference_gate.run(
+            analyze_image, data, file_name, pool,
+            invalid_feedback="Invalid image format", cache=landmark_cache, timer=timer
         )
+        for file_name, data, timer, pool in items
+    ), return_exceptions=True)
+
+
+# Coalesces concurrent /workouts/frame requests, enabled with POSE_MICROBATCH=1
+frame_batcher = MicroBatcher(_dispatch_frames) if MICROBATCH_ENABLED else None
+
+
+def _analyze_job_item(data, file_name, exercise_type):
+    # Job threads share the request path's inference threads instead of
+    # competing with them for Pose instances
+    return inference_gate.call(analyze_image, data, file_name, pose_pools.pool(), exercise_type, cache=landmark_cache)
 
-        knee_angle_diff = abs(left_knee_angle - right_knee_angle)
 
-        # One foot forward (difference in y position)
-        leg_forward = abs(left_ankle.y - right_ankle.y) > 0.10
+def _check_job_item(file_name, fileobj):
+    # Same size, pixel and memory limits as a multipart upload; a rejected
+    # item becomes an error line of its job
+    try:
+        check_upload(file_name, fileobj)
+    except UploadTooLarge:
+        memory_stats.rejected += 1
+        raise
+
+
+def _summarize_job(results):
+    # Fed one result at a time from results.jsonl, however large the job
+    summary = BatchSummary(track_reps=True)
+    for result in results:
+        summary.add(result)
+    return {"total_images": summary.total, **summary.summary(), "reps": summary.reps()}
+
 
-        # Hip displacement (side shift)
-        hip_forward = abs(left_hip.x - right_hip.x) > 0.08
+# Persistent background jobs for very large batches (see app/jobs.py)
+job_store = JobStore()
+job_runner = JobRunner(job_store, _analyze_job_item, _summarize_job, check=_check_job_item)
 
-        # Final lunge condition
-        if knee_angle_diff > 18 and leg_forward and hip_forward:
-            return "lunge", 0.96
 
+async def _analyze_uploads(files, pool, exercise_type=None, timings=False):
+    """
+    Run every upload through the pipeline and return results in upload order.
+    A whole batch is admitted as one job so it is never rejected half-way.
+    Uploads stay in their spooled files and are read one at a time, within
+    the per-request memory budget. With ``timings`` each result carries its
+    per-stage times in ms.
+    """
+    costs = await _check_uploads(files)
+    timers = []
+
+    if batch_process_pool is not None:
+        async with inference_gate.admit():
+            # At most one upload per worker is read into memory at a time
+            results = [
+                result async for result in batch_process_pool.stream(
+                    _read_uploads(files, timers), exercise_type, timers, pool.model_complexity
+                )
+            ]
+    else:
+        items = [(file.filename, file.file, image_timer(), pool) for file in files]
+        timers = [timer for _, _, timer, _ in items]
+        results = await inference_gate.run(_analyze_items, items, exercise_type, costs=costs)
 
-        # ----------------------------------------------------
-        # 2️⃣ PUSHUP
-        # ----------------------------------------------------
-        upper_body_horizontal = abs(left_shoulder.y - left_hip.y) < 0.15
-        arm_straightness = abs(left_wrist.y - left_elbow.y) < 0.15
+    _record_latencies(timers)
+    return _attach_timings(results, timers) if timings else results
 
-        if upper_body_horizontal and arm_straightness:
-            return "pushup", 0.92
 
-        # ----------------------------------------------------
-        # 3️⃣ PLANK
-        # ----------------------------------------------------
-        if upper_body_horizontal and abs(left_shoulder.y - left_wrist.y) < 0.05:
-            return "plank", 0.88
+async def _read_body(request, limit=None):
+    """Request body up to ``limit`` bytes (POSE_MAX_UPLOAD_MB); 413 beyond that, before reading it all."""
+    limit = limit or MAX_UPLOAD_BYTES
+    too_large = HTTPException(status_code=413, detail=f"Request body is larger than {limit} bytes")
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > limit:
+        memory_stats.rejected += 1
+        raise too_large
 
-        # ----------------------------------------------------
-        # 4️⃣ SQUAT
-        # ----------------------------------------------------
-        knee_angle = left_knee_angle
-        hip_drop = left_hip.y
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            memory_stats.rejected += 1
+            raise too_large
+    return bytes(body)
 
-        if knee_angle < 120 and hip_drop > 0.47:
-            return "squat", 0.95
 
-        # ----------------------------------------------------
-        # 5️⃣ JUMPING JACK
-        # ----------------------------------------------------
-        arms_wide = abs(left_wrist.x - right_wrist.x) > 0.80
-        legs_wide = abs(left_ankle.x - right_ankle.x) > 0.50
+def _wants_stream(request, stream):
+    return stream or NDJSON in request.headers.get("accept", "")
 
-        if arms_wide and legs_wide:
-            return "jumping_jack", 0.90
 
-        return "unknown", 0.50
+async def _read_uploads(files, timers):
+    for file in files:
+        data, timer = await _read_timed(file)
+        timers.append(timer)
+        yield file.filename, data
 
-    except:
-        return "unknown", 0.0
 
+async def _spooled_uploads(files, timers):
+    """Like _read_uploads, but yields the spooled file for the decode stage to read."""
+    for file in files:
+        timers.append(image_timer())
+        yield file.filename, file.file
 
 
+# Failures of a single streamed item, reported on its own line once the
+# response has started instead of cutting the stream short
+_ITEM_ERRORS = (TierUnavailable, PoolExhausted)
+
+
+async def _execute_item(fn, data, file_name, *args, **kwargs):
+    """inference_gate.execute for one streamed item; item failures become ``{"file_name", "error"}``."""
+    try:
+        return await inference_gate.execute(fn, data, file_name, *args, **kwargs)
+    except _ITEM_ERRORS as exc:
+        return {"file_name": file_name, "error": str(exc)}
+
+
+async def _stream_uploads(files, pool, exercise_type=None, to_line=dict, timings=False, costs=None):
+    """
+    Yield one NDJSON line per upload as soon as it is analyzed, then a
+    ``{"summary": ...}`` line. Only the current upload and the running
+    summary are held in memory, whatever the batch size. An upload that
+    fails on its own (no Pose instance, model tier lost) gets an
+    ``{"file_name", "error"}`` line and is left out of the summary.
+    """
+    summary = BatchSummary(track_reps=exercise_type is None)
+    timers = []
+    failed = 0
+    try:
+        async with inference_gate.admit():
+            if batch_process_pool is not None:
+                results = batch_process_pool.stream(
+                    _read_uploads(files, timers), exercise_type, timers, pool.model_complexity,
+                    item_errors=_ITEM_ERRORS
+                )
+            elif decode_pipeline is not None:
+                results = decode_pipeline.stream(
+                    _spooled_uploads(files, timers), pool, _execute_item, exercise_type,
+                    cache=landmark_cache, timers=timers, costs=costs, budget=REQUEST_MEMORY_BUDGET
+                )
+            else:
+                # _read_uploads appends each item's timer before yielding it
+                results = (
+                    await _execute_item(
+                        analyze_image, data, file_name, pool, exercise_type,
+                        cache=landmark_cache, timer=timers[-1]
+                    )
+                    async for file_name, data in _read_uploads(files, timers)
+                )
+            index = 0
+            async for result in results:
+                timer = timers[index]
+                index += 1
+                if "error" in result:
+                    failed += 1
+                    yield json.dumps(result) + "\n"
+                    continue
+                tier_selector.record(sum(timer.stages.values()))
+                if timings:
+                    result["timings"] = timer.as_ms()
+                yield json.dumps(to_line(summary.add(result))) + "\n"
+    except Overloaded as exc:
+        # Admission was checked before the response started, so this only
+        # happens when the queue filled up in between
+        yield json.dumps({"error": str(exc), "retry_after": exc.retry_after}) + "\n"
+        return
+
+    line = {"total_images": summary.total + failed, "failed_images": failed, **summary.summary()}
+    if exercise_type is None:
+        line["reps"] = summary.reps()
+    yield json.dumps({"summary": line}) + "\n"
+
+
+async def _streaming_response(files, pool, exercise_type=None, to_line=dict, timings=False):
+    costs = await _check_uploads(files)
+    inference_gate.check()
+    return StreamingResponse(_stream_uploads(files, pool, exercise_type, to_line, timings, costs), media_type=NDJSON)
+
+
+def _health():
+    # Component stats take their locks, so this runs on a worker thread
+    return {
+        "status": "ok",
+        "supported_exercises": ["squat", "pushup", "plank", "lunge", "bicep_curl"],
+        "pose_pool": pose_pools.stats(),
+        "model_tiers": tier_selector.stats(),
+        "inference": inference_gate.stats(),
+        "landmark_cache": landmark_cache.stats(),
+        "microbatch": frame_batcher.stats() if frame_batcher is not None else None,
+        "sessions": live_sessions.stats(),
+        "startup": warmup.stats(),
+        "execution_mode": EXECUTION_MODE,
+        "decode_pipeline": decode_pipeline.stats() if decode_pipeline is not None else None,
+        "classifier": {
+            "mode": "knn" if KNN_INDEX is not None else "rules",
+            "knn_index": KNN_INDEX.stats() if KNN_INDEX is not None else None
+        }
+    }
 
 
 # --------------------- ROUTES ---------------------
 @app.get("/health")
 async def health_check():
-    return {"status": "ok", "supported_exercises": ["squat", "pushup", "plank", "lunge", "bicep_curl"]}
+    return await run_in_threadpool(_health)
+
+
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving; never touches the models."""
+    return {"status": "alive", "uptime_seconds": round(time.monotonic() - STARTED_AT, 3)}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """
+    200 once the model pools are loaded, 503 until then (or after warmup
+    failed). In lazy mode that is after the first request or POST
+    /health/warmup.
+    """
+    ready = warmup.ready
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else warmup.state, "pools_warm": warmup.ready, **warmup.stats()}
+    )
+
+
+@app.post("/health/warmup")
+async def start_warmup():
+    """Explicit warmup hook: load the model pools in the background; poll /health/ready."""
+    warmup.start()
+    return JSONResponse(status_code=200 if warmup.ready else 202, content=warmup.stats())
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of per-endpoint, per-stage latency histograms."""
+    return PlainTextResponse(stage_metrics.render() + memory_stats.render() + warmup.render(), media_type="text/plain; version=0.0.4")
 
 @app.post("/workouts/frame")
-async def analyze_single_frame(file: UploadFile = File(...)):
+async def analyze_single_frame(
+        file: UploadFile = File(...),
+        timings: bool = False,
+        model_complexity: str | None = None,
+        session_id: str | None = None
+):
     """
     Analyze a single image:
     - Auto detect exercise
@@ -198,247 +518,218 @@ async def analyze_single_frame(file: UploadFile = File(...)):
     - Calculate angle
     - Generate feedback
     - Estimate reps
+
+    `?model_complexity=0|1|2` (lite/full/heavy) picks the model tier, `auto`
+    lets the service drop to a lighter tier under load.
+
+    `?session_id=...` binds consecutive frames of one workout to a server-side
+    session: a tracking-mode Pose instance, a crop around the previous
+    person's position, smoothed angles and a running rep count. Sessions
+    expire after POSE_SESSION_IDLE_SECONDS without frames.
     """
-    data = await file.read()
-    np_arr = np.frombuffer(data, np.uint8)
-    img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-
-    if img is None:
-        return {
-            "file_name": file.filename,
-            "exercise": "unknown",
-            "pose_detected": False,
-            "angle": None,
-            "feedback": "Invalid image format",
-            "performance_score": 0.0,
-            "rep_count": 0
-        }
+    if session_id is not None:
+        return await _analyze_session_frame(file, session_id, model_complexity, timings)
+
+    pool = await _choose_pool(model_complexity)
+    await _check_uploads([file])
+    data, timer = await _read_timed(file)
+    if frame_batcher is not None:
+        result = await frame_batcher.submit((file.filename, data, timer, pool))
+    else:
+        result = await inference_gate.run(
+            analyze_image, data, file.filename, pool,
+            invalid_feedback="Invalid image format", cache=landmark_cache, timer=timer
+        )
+    _record_latencies([timer])
+    return _attach_timings([result], [timer])[0] if timings else result
+
+@app.delete("/workouts/sessions/{session_id}")
+async def end_session(session_id: str):
+    """Close a /workouts/frame session before it expires and return its rep totals."""
+    session = await run_in_threadpool(live_sessions.close, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"session_id": session_id, "frames": session.frames, "reps": session.tracker.summary()}
 
-    with mp_pose.Pose(static_image_mode=True) as pose:
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        res = pose.process(img_rgb)
-
-        if not res.pose_landmarks:
-            return {
-                "file_name": file.filename,
-                "exercise": "unknown",
-                "pose_detected": False,
-                "angle": None,
-                "feedback": "No person detected",
-                "performance_score": 0.0,
-                "rep_count": 0
-            }
-
-        lm = res.pose_landmarks.landmark
-
-        # Auto exercise detection
-        exercise, confidence = classify_exercise(lm)
-
-        # Get joints for angle calculation
-        a, b, c = extract_landmarks(lm, exercise)
-
-        if not a or not b or not c:
-            return {
-                "file_name": file.filename,
-                "exercise": exercise,
-                "pose_detected": True,
-                "angle": None,
-                "feedback": "Unable to compute angle",
-                "performance_score": 0.0,
-                "rep_count": 0
-            }
-
-        # Angle
-        angle = calculate_angle(a, b, c)
-
-        # Feedback
-        feedback, score = evaluate_angle(exercise, angle)
-
-        # Rep estimation
-        rep_count = 1 if score >= 0.8 else 0
-
-        return {
-            "file_name": file.filename,
-            "exercise": exercise,
-            "confidence": round(confidence, 2),
-            "pose_detected": True,
-            "angle": round(angle, 2),
-            "feedback": feedback,
-            "performance_score": round(score, 2),
-            "rep_count": rep_count
-        }
 
 @app.post("/workouts/batch")
-async def analyze_batch_auto(files: List[UploadFile] = File(...)):
+async def analyze_batch_auto(
+        request: Request,
+        files: List[UploadFile] = File(...),
+        stream: bool = False,
+        timings: bool = False,
+        model_complexity: str | None = None
+):
     """
     Analyze multiple images:
     - Auto detect exercise for each image
     - Calculate angles
     - Provide feedback
     - Score performance
+    - Count reps across the ordered images
     - Return summary statistics
+
+    With `?stream=true` or `Accept: application/x-ndjson` each result is sent
+    as one JSON line as soon as it is ready, followed by a summary line.
+    `?timings=true` adds per-stage times (ms) to every result and
+    `?model_complexity=` picks the model tier as for /workouts/frame.
     """
+    pool = await _choose_pool(model_complexity)
+    if _wants_stream(request, stream):
+        return await _streaming_response(files, pool, timings=timings)
 
-    results = []
-    total_score = 0
-    valid_count = 0
-    exercise_counts = {}
-
-    with mp_pose.Pose(static_image_mode=True) as pose:
-        for file in files:
-            data = await file.read()
-            np_arr = np.frombuffer(data, np.uint8)
-            img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-
-            if img is None:
-                results.append({
-                    "file_name": file.filename,
-                    "exercise": "unknown",
-                    "pose_detected": False,
-                    "angle": None,
-                    "feedback": "Invalid image",
-                    "performance_score": 0.0,
-                    "rep_count": 0
-                })
-                continue
-
-            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            res = pose.process(img_rgb)
-
-            if not res.pose_landmarks:
-                results.append({
-                    "file_name": file.filename,
-                    "exercise": "unknown",
-                    "pose_detected": False,
-                    "angle": None,
-                    "feedback": "No person detected",
-                    "performance_score": 0.0,
-                    "rep_count": 0
-                })
-                continue
-
-            lm = res.pose_landmarks.landmark
-
-            # 1️⃣ Auto exercise detection
-            exercise, confidence = classify_exercise(lm)
-
-            # Count exercises
-            exercise_counts[exercise] = exercise_counts.get(exercise, 0) + 1
-
-            # 2️⃣ Extract joints
-            a, b, c = extract_landmarks(lm, exercise)
-
-            if not a or not b or not c:
-                results.append({
-                    "file_name": file.filename,
-                    "exercise": exercise,
-                    "pose_detected": True,
-                    "angle": None,
-                    "feedback": "Unable to compute angle",
-                    "performance_score": 0.0,
-                    "rep_count": 0
-                })
-                continue
-
-            # 3️⃣ Compute angle
-            angle = calculate_angle(a, b, c)
-
-            # 4️⃣ Get feedback and score
-            feedback, score = evaluate_angle(exercise, angle)
-
-            # 5️⃣ Rep estimation
-            rep_count = 1 if score >= 0.8 else 0
-
-            # Track performance
-            total_score += score
-            valid_count += 1
-
-            results.append({
-                "file_name": file.filename,
-                "exercise": exercise,
-                "confidence": round(confidence, 2),
-                "pose_detected": True,
-                "angle": round(angle, 2),
-                "feedback": feedback,
-                "performance_score": round(score, 2),
-                "rep_count": rep_count
-            })
-
-    # Summary
-    avg_score = round(total_score / valid_count, 2) if valid_count > 0 else 0.0
-    most_common_exercise = max(exercise_counts, key=exercise_counts.get) if exercise_counts else "unknown"
+    results = await _analyze_uploads(files, pool, timings=timings)
+    reps = count_reps(results)
 
     return {
         "total_images": len(files),
-        "processed_images": valid_count,
-        "average_score": avg_score,
-        "most_common_exercise": most_common_exercise,
+        **summarize_batch(results),
+        "reps": reps,
         "results": results
     }
 
 
 @app.post("/analyze-batch", response_model=List[PoseResult])
 async def analyze_batch(
+        request: Request,
         exercise_type: str = Form(...),
-        files: List[UploadFile] = File(...)
+        files: List[UploadFile] = File(...),
+        stream: bool = False,
+        timings: bool = False,
+        model_complexity: str | None = None
 ):
-    results = []
+    pool = await _choose_pool(model_complexity)
+    if _wants_stream(request, stream):
+        return await _streaming_response(
+            files, pool, exercise_type, lambda r: jsonable_encoder(PoseResult(**r)), timings
+        )
 
-    with mp_pose.Pose(static_image_mode=True) as pose:
-        for file in files:
-            data = await file.read()
-            np_arr = np.frombuffer(data, np.uint8)
-            img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-
-            if img is None:
-                results.append(PoseResult(
-                    file_name=file.filename,
-                    exercise=exercise_type,
-                    pose_detected=False,
-                    angle=None,
-                    feedback="Invalid image",
-                    performance_score=0.0
-                ))
-                continue
-
-            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            res = pose.process(img_rgb)
-
-            if not res.pose_landmarks:
-                results.append(PoseResult(
-                    file_name=file.filename,
-                    exercise=exercise_type,
-                    pose_detected=False,
-                    angle=None,
-                    feedback="No person detected",
-                    performance_score=0.0
-                ))
-                continue
-
-            lm = res.pose_landmarks.landmark
-            a, b, c = extract_landmarks(lm, exercise_type)
-
-            if not a or not b or not c:
-                results.append(PoseResult(
-                    file_name=file.filename,
-                    exercise=exercise_type,
-                    pose_detected=False,
-                    angle=None,
-                    feedback="Invalid landmark selection for exercise",
-                    performance_score=0.0
-                ))
-                continue
-
-            angle = calculate_angle(a, b, c)
-            feedback, score = evaluate_angle(exercise_type, angle)
-
-            results.append(PoseResult(
-                file_name=file.filename,
-                exercise=exercise_type,
-                pose_detected=True,
-                angle=round(angle, 2),
-                feedback=feedback,
-                performance_score=round(score, 2)
-            ))
+    results = await _analyze_uploads(files, pool, exercise_type, timings)
+    return [PoseResult(**r) for r in results]
 
-    return results
+
+@app.post("/workouts/landmarks")
+async def score_landmarks_only(request: Request, exercise_type: str | None = None, dtype: str = "float32"):
+    """
+    Score precomputed landmarks (no image decode, no MediaPipe):
+    - JSON `{"landmarks": ...}` with one (33, k) frame or an (N, 33, k) list
+    - or a binary body: `.npy`, or raw float16/float32 `(N, 33, 4)` (`?dtype=`)
+    - Auto detect or use `exercise_type`, then angle, feedback, score and reps
+    """
+    timer = image_timer()
+    body = await _read_body(request)
+    timer.lap("read")
+    try:
+        points = parse_landmark_payload(body, request.headers.get("content-type"), dtype)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    timer.lap("parse")
+
+    results = await inference_gate.run(score_landmark_stack, points, exercise_type)
+    timer.lap("score")
+    reps = count_reps(results)
+
+    return {
+        "total_frames": len(results),
+        **summarize_batch(results),
+        "reps": reps,
+        "results": results
+    }
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+        files: List[UploadFile] = File(...),
+        exercise_type: str | None = Form(None)
+):
+    """
+    Queue a large batch for background analysis:
+    - Accepts images and/or zip/tar archives (expanded member by member)
+    - Returns a job id immediately; poll /jobs/{job_id} for progress
+    """
+    uploads = [(file.filename, file.file) for file in files]
+    try:
+        meta = await run_in_threadpool(job_store.create, uploads, exercise_type)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    job_runner.submit(meta["job_id"])
+    return meta
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    meta = await run_in_threadpool(job_store.get, job_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return meta
+
+
+@app.get("/jobs/{job_id}/results")
+async def job_results(job_id: str, offset: int = 0, limit: int = 100):
+    if offset < 0 or limit < 1:
+        raise HTTPException(status_code=400, detail="offset must be >= 0 and limit >= 1")
+    meta = await run_in_threadpool(job_store.get, job_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "job_id": job_id,
+        "status": meta["status"],
+        "offset": offset,
+        "results": await run_in_threadpool(job_store.results, job_id, offset, limit)
+    }
+
+
+@app.post("/workouts/video")
+async def analyze_workout_video(
+        file: UploadFile = File(...),
+        exercise_type: str | None = Form(None),
+        sample_fps: float = Form(VIDEO_SAMPLE_FPS),
+        model_complexity: str | None = Form(None)
+):
+    """
+    Analyze an uploaded MP4/WebM video:
+    - Sample frames at `sample_fps`
+    - Track the person across frames (MediaPipe tracking mode)
+    - Return a per-frame angle/score time series, completed reps
+      (tempo, range of motion) and a session summary
+
+    Uploads are capped at POSE_MAX_VIDEO_MB and analysis at
+    POSE_MAX_VIDEO_FRAMES sampled frames (`summary.truncated`).
+    """
+    if not (math.isfinite(sample_fps) and sample_fps > 0):
+        raise HTTPException(status_code=400, detail="sample_fps must be a positive number")
+    try:
+        tier = _explicit_tier(model_complexity)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    size = await run_in_threadpool(upload_size, file.file)
+    if size > MAX_VIDEO_BYTES:
+        memory_stats.rejected += 1
+        raise HTTPException(status_code=413, detail=f"'{file.filename}' is {size} bytes, the limit is {MAX_VIDEO_BYTES}")
+
+    # A video holds its slot far longer than an image; keep it out of Retry-After
+    async with inference_gate.admit(timed=False):
+        return await inference_gate.execute(
+            analyze_video_upload, file.file, file.filename, exercise_type, sample_fps, tier
+        )
+
+
+@app.websocket("/workouts/live")
+async def live_frames(websocket: WebSocket, exercise_type: str | None = None, model_complexity: str | None = None):
+    """
+    Live coaching channel:
+    - Client streams JPEG frames as binary messages
+    - A tracking-mode Pose instance stays bound to the connection
+    - Only the newest frame is analyzed; stale frames are dropped
+    - Each result carries angle, feedback, running rep count and latency
+    """
+    try:
+        tier = _explicit_tier(model_complexity)
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    await serve_live_session(websocket, inference_gate.run, exercise_type, tier)
+
+
+IMPORT_SECONDS["app"] = time.perf_counter() - IMPORT_STARTED
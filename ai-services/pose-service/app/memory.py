@@ -0,0 +1,130 @@
+import os
+import resource
+
+from .preprocess import TARGET_SIZE, choose_reduction, image_dimensions
+
+# Largest accepted upload and decoded image size
+MAX_UPLOAD_BYTES = int(float(os.getenv("POSE_MAX_UPLOAD_MB", "25")) * 1024 * 1024)
+MAX_IMAGE_PIXELS = int(float(os.getenv("POSE_MAX_IMAGE_MEGAPIXELS", "50")) * 1_000_000)
+# Upload bytes plus decoded image buffers one request may hold at once
+REQUEST_MEMORY_BUDGET = int(float(os.getenv("POSE_REQUEST_MEMORY_MB", "128")) * 1024 * 1024)
+
+# Enough for the JPEG SOF marker behind a typical EXIF block
+HEADER_BYTES = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """An upload exceeds the size, pixel or per-request memory limits."""
+
+
+def upload_size(fileobj):
+    position = fileobj.tell()
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(position)
+    return size
+
+
+def read_upload(source):
+    """Bytes of an upload given as bytes or a spooled file object."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+    source.seek(0)
+    return source.read()
+
+
+def decoded_bytes(header):
+    """
+    Peak bytes of the arrays ``decode_for_pose`` allocates for an image with
+    ``(format, width, height)`` header: the (DCT-reduced) decode plus the
+    resized copy when it is still larger than the target.
+    """
+    if header is None:
+        # Unknown size: assume a decode at the target size plus its resize
+        return 2 * TARGET_SIZE * TARGET_SIZE * 3
+    fmt, width, height = header
+    factor = choose_reduction(width, height) if fmt == "jpeg" else 1
+    width, height = -(-width // factor), -(-height // factor)
+    total = width * height * 3
+    longest = max(width, height)
+    if longest > TARGET_SIZE:
+        ratio = TARGET_SIZE / longest
+        total += round(width * ratio) * round(height * ratio) * 3
+    return total
+
+
+def check_upload(file_name, fileobj, budget=None):
+    """
+    Reject an upload from its size and image header before anything is
+    decoded. Returns the bytes it will cost while being analyzed (upload
+    plus decode buffers); raises UploadTooLarge.
+    """
+    budget = budget or REQUEST_MEMORY_BUDGET
+    size = upload_size(fileobj)
+    if size > MAX_UPLOAD_BYTES:
+        raise UploadTooLarge(f"'{file_name}' is {size} bytes, the limit is {MAX_UPLOAD_BYTES}")
+
+    position = fileobj.tell()
+    fileobj.seek(0)
+    header = image_dimensions(fileobj.read(HEADER_BYTES))
+    fileobj.seek(position)
+    if header is not None and header[1] * header[2] > MAX_IMAGE_PIXELS:
+        raise UploadTooLarge(f"'{file_name}' is {header[1]}x{header[2]} pixels, the limit is {MAX_IMAGE_PIXELS}")
+
+    cost = size + decoded_bytes(header)
+    if cost > budget:
+        raise UploadTooLarge(f"'{file_name}' needs ~{cost} bytes to analyze, the per-request budget is {budget}")
+    return cost
+
+
+def rss_bytes():
+    """Current resident set size, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class MemoryStats:
+    """Process RSS plus the largest per-request upload/decode footprint seen."""
+
+    def __init__(self):
+        self.request_peak = 0
+        self.rejected = 0
+
+    def observe_request(self, nbytes):
+        if nbytes > self.request_peak:
+            self.request_peak = nbytes
+
+    def render(self):
+        lines = [
+            "# HELP pose_process_peak_rss_bytes Peak resident set size of the service process.",
+            "# TYPE pose_process_peak_rss_bytes gauge",
+            f"pose_process_peak_rss_bytes {peak_rss_bytes()}",
+        ]
+        rss = rss_bytes()
+        if rss is not None:
+            lines += [
+                "# HELP pose_process_rss_bytes Current resident set size of the service process.",
+                "# TYPE pose_process_rss_bytes gauge",
+                f"pose_process_rss_bytes {rss}",
+            ]
+        lines += [
+            "# HELP pose_request_memory_peak_bytes Largest upload + decode footprint held by one request.",
+            "# TYPE pose_request_memory_peak_bytes gauge",
+            f"pose_request_memory_peak_bytes {self.request_peak}",
+            "# HELP pose_request_memory_budget_bytes Per-request upload + decode memory budget.",
+            "# TYPE pose_request_memory_budget_bytes gauge",
+            f"pose_request_memory_budget_bytes {REQUEST_MEMORY_BUDGET}",
+            "# HELP pose_uploads_rejected_total Uploads rejected for size, pixels or memory budget.",
+            "# TYPE pose_uploads_rejected_total counter",
+            f"pose_uploads_rejected_total {self.rejected}",
+        ]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,63 @@
+import io
+import json
+
+import numpy as np
+
+from .geometry import NUM_LANDMARKS
+
+BINARY_DTYPES = {"float16": np.float16, "float32": np.float32}
+_NPY_MAGIC = b"\x93NUMPY"
+
+
+def _as_stack(array):
+    """Normalise to ``(N, 33, 4)`` float32, padding missing z/visibility columns."""
+    try:
+        array = np.asarray(array, dtype=np.float32)
+    except (TypeError, ValueError) as exc:
+        # Ragged lists, dicts or strings instead of numbers
+        raise ValueError(f"Landmarks must be numeric arrays: {exc}")
+    if array.ndim == 2:
+        array = array[np.newaxis]
+    if array.ndim != 3 or array.shape[1] != NUM_LANDMARKS or not 2 <= array.shape[2] <= 4:
+        raise ValueError(f"Expected landmarks shaped (N, {NUM_LANDMARKS}, 2..4), got {array.shape}")
+
+    if array.shape[2] < 4:
+        padded = np.zeros(array.shape[:2] + (4,), dtype=np.float32)
+        padded[..., 3] = 1.0
+        padded[..., :array.shape[2]] = array
+        array = padded
+    return array
+
+
+def parse_landmark_payload(body, content_type, dtype="float32"):
+    """
+    Parse precomputed landmarks into a ``(N, 33, 4)`` float32 stack.
+
+    - ``application/json``: ``{"landmarks": [...]}`` or a bare list, one frame
+      ``(33, k)`` or many ``(N, 33, k)`` with k in 2..4
+    - anything else is binary: a ``.npy`` file, or raw little-endian
+      ``dtype`` (float16/float32) values forming ``(N, 33, 4)``
+
+    Raises ValueError for malformed payloads.
+    """
+    if (content_type or "").split(";")[0].strip() == "application/json":
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Invalid JSON: {exc}")
+        if isinstance(payload, dict):
+            payload = payload.get("landmarks")
+        if payload is None:
+            raise ValueError("JSON payload has no 'landmarks'")
+        return _as_stack(payload)
+
+    if body[:6] == _NPY_MAGIC:
+        return _as_stack(np.load(io.BytesIO(body), allow_pickle=False))
+
+    if dtype not in BINARY_DTYPES:
+        raise ValueError(f"Unsupported dtype '{dtype}', use one of {sorted(BINARY_DTYPES)}")
+    item = np.dtype(BINARY_DTYPES[dtype]).newbyteorder("<")
+    frame_bytes = NUM_LANDMARKS * 4 * item.itemsize
+    if not body or len(body) % frame_bytes:
+        raise ValueError(f"Binary payload must be a multiple of {frame_bytes} bytes for {dtype}")
+    return _as_stack(np.frombuffer(body, dtype=item).reshape(-1, NUM_LANDMARKS, 4))
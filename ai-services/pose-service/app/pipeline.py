@@ -0,0 +1,143 @@
+import asyncio
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .analysis import analyze_decoded, decode_upload
+from .memory import read_upload
+from .timing import NULL_TIMER
+
+PIPELINE_ENABLED = os.getenv("POSE_PIPELINE", "1") == "1"
+DECODE_WORKERS = int(os.getenv("POSE_DECODE_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+# Decoded images allowed ahead of inference; each is at most TARGET_SIZE on
+# its longest side (~1.2 MB at 640px), so this caps pipeline memory.
+PIPELINE_DEPTH = int(os.getenv("POSE_PIPELINE_DEPTH", "0")) or 2 * DECODE_WORKERS
+
+
+def _decode(source, pool, cache, timer):
+    # Time spent queued behind other decodes since the upload was read
+    timer.lap("pipeline_wait")
+    if not isinstance(source, bytes):
+        # Spooled uploads are read here, one at a time, not up front
+        source = read_upload(source)
+        timer.lap("read")
+    return decode_upload(source, pool, cache, timer)
+
+
+class DecodePipeline:
+    """
+    Two-stage batch pipeline: cache lookup + JPEG decode + colour
+    conversion run on a small decode thread pool (OpenCV releases the GIL)
+    while the caller runs inference on the image before. At most ``depth``
+    decoded images wait for the model, and with per-item ``costs`` (see
+    ``memory.check_upload``) their summed cost stays within ``budget``, so
+    memory stays bounded whatever the batch size. Results come back in
+    input order. ``memory`` (a MemoryStats) records each run's peak.
+    """
+
+    def __init__(self, workers=None, depth=None, memory=None):
+        self.workers = workers or DECODE_WORKERS
+        self.depth = max(1, depth or PIPELINE_DEPTH)
+        self.memory = memory
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._items = 0
+
+    def _decoder(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pose-decode")
+            return self._executor
+
+    def run(self, items, exercise_type=None, invalid_feedback="Invalid image", cache=None, costs=None,
+            budget=None):
+        """
+        Analyze ``[(file_name, data, timer, pool), ...]`` on the calling
+        thread, decoding ahead of inference. ``data`` is bytes or a spooled
+        upload file, read only when its turn to decode comes.
+        """
+        decoder = self._decoder()
+        pending = deque()
+        results = []
+        in_flight = peak = 0
+
+        def finish():
+            nonlocal in_flight
+            (file_name, _, timer, pool), cost, future = pending.popleft()
+            decoded = future.result()
+            timer.lap("pipeline_wait")
+            results.append(analyze_decoded(decoded, file_name, pool, exercise_type, invalid_feedback, cache, timer))
+            in_flight -= cost
+
+        for index, item in enumerate(items):
+            cost = costs[index] if costs is not None else 0
+            while pending and (len(pending) >= self.depth or (budget and in_flight + cost > budget)):
+                finish()
+
+            _, data, timer, pool = item
+            timer.restart()
+            pending.append((item, cost, decoder.submit(_decode, data, pool, cache, timer)))
+            in_flight += cost
+            peak = max(peak, in_flight)
+            self._items += 1
+        while pending:
+            finish()
+
+        if self.memory is not None:
+            self.memory.observe_request(peak)
+        return results
+
+    async def stream(self, items, pool, execute, exercise_type=None, cache=None, timers=None, costs=None,
+                     budget=None):
+        """
+        Analyze an async iterable of ``(file_name, data)`` and yield results
+        in order. Decoding runs ahead on the decode threads while
+        ``execute(fn, *args)`` (e.g. ``InferenceGate.execute``) runs
+        inference; ``timers`` is filled by the producer as items are read.
+        ``costs`` and ``budget`` bound memory as in ``run()``.
+        """
+        loop = asyncio.get_running_loop()
+        decoder = self._decoder()
+        pending = deque()
+        index = 0
+        in_flight = peak = 0
+
+        async def next_result():
+            nonlocal index, in_flight
+            file_name, cost, future = pending.popleft()
+            decoded = await future
+            timer = timers[index] if timers is not None else NULL_TIMER
+            index += 1
+            timer.lap("pipeline_wait")
+            result = await execute(analyze_decoded, decoded, file_name, pool, exercise_type, cache=cache, timer=timer)
+            in_flight -= cost
+            return result
+
+        try:
+            count = 0
+            async for file_name, data in items:
+                cost = costs[count] if costs is not None else 0
+                count += 1
+                while pending and (len(pending) >= self.depth or (budget and in_flight + cost > budget)):
+                    yield await next_result()
+
+                timer = timers[-1] if timers is not None else NULL_TIMER
+                pending.append((file_name, cost, loop.run_in_executor(decoder, _decode, data, pool, cache, timer)))
+                in_flight += cost
+                peak = max(peak, in_flight)
+                self._items += 1
+            while pending:
+                yield await next_result()
+        finally:
+            if self.memory is not None:
+                self.memory.observe_request(peak)
+
+    def stats(self):
+        return {"decode_workers": self.workers, "depth": self.depth, "items": self._items}
+
+    def shutdown(self):
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
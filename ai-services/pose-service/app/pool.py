@@ -0,0 +1,299 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from .startup import lazy_import
+
+# MediaPipe is imported on first use, not with the app (see app/startup.py)
+mp_pose = lazy_import("mediapipe.python.solutions.pose")
+
+DEFAULT_POOL_SIZE = int(os.getenv("POSE_POOL_SIZE", "0")) or (os.cpu_count() or 1)
+CHECKOUT_TIMEOUT = float(os.getenv("POSE_POOL_CHECKOUT_TIMEOUT", "30"))
+WARMUP_FRAME_SIZE = 256
+
+# MediaPipe model_complexity tiers: cost and accuracy both grow with the tier
+MODEL_TIERS = {0: "lite", 1: "full", 2: "heavy"}
+DEFAULT_MODEL_COMPLEXITY = int(os.getenv("POSE_MODEL_COMPLEXITY", "1"))
+# Tiers other than the default are warmed on first use unless preloaded here
+PRELOAD_TIERS = [int(t) for t in os.getenv("POSE_PRELOAD_TIERS", "").split(",") if t.strip()]
+# A tier that failed to load (e.g. model download blocked) is retried after this
+TIER_RETRY_SECONDS = float(os.getenv("POSE_TIER_RETRY_SECONDS", "60"))
+
+
+class PoolExhausted(RuntimeError):
+    """Raised when no Pose instance becomes free before the checkout timeout."""
+
+
+class TierUnavailable(RuntimeError):
+    """Raised when the Pose model for a model_complexity tier cannot be loaded."""
+
+
+def create_pose(model_complexity=None, **pose_kwargs):
+    """
+    Build a MediaPipe Pose for a tier. The lite and heavy models are fetched
+    by MediaPipe on first use, so loading errors surface as TierUnavailable.
+    """
+    tier = DEFAULT_MODEL_COMPLEXITY if model_complexity is None else model_complexity
+    try:
+        return mp_pose.Pose(model_complexity=tier, **pose_kwargs)
+    except Exception as exc:
+        raise TierUnavailable(f"model_complexity {tier} ({MODEL_TIERS.get(tier)}) unavailable: {exc}")
+
+
+class PooledPose:
+    """
+    Thin wrapper around a MediaPipe Pose instance that records health.
+
+    Only exceptions raised by ``process`` mark the instance unhealthy, so
+    errors in the scoring code never cause a model to be thrown away.
+    """
+
+    def __init__(self, pose, slot, generation=0):
+        self.pose = pose
+        self.slot = slot
+        # PosePool.close() generation the instance belongs to
+        self.generation = generation
+        self.created_at = time.time()
+        self.uses = 0
+        self.healthy = True
+        self.last_error = None
+
+    def process(self, image):
+        self.uses += 1
+        try:
+            return self.pose.process(image)
+        except Exception as exc:
+            self.healthy = False
+            self.last_error = repr(exc)
+            raise
+
+    def close(self):
+        try:
+            self.pose.close()
+        except Exception:
+            pass
+
+
+class EmptySlot:
+    """
+    Stand-in for an instance whose replacement failed to load; the next
+    checkout that draws it tries to build the instance again.
+    """
+
+    def __init__(self, slot, error, generation=0):
+        self.slot = slot
+        self.last_error = error
+        self.generation = generation
+
+    def close(self):
+        pass
+
+
+class PosePool:
+    """
+    Fixed-size pool of pre-initialised, warmed-up MediaPipe Pose instances.
+
+    Requests check an instance out with ``checkout()`` and hand it back when
+    the ``with`` block exits. Instances whose ``process`` call raised are
+    closed and replaced by a fresh warm one before going back into the pool;
+    if that fails the slot goes back empty and is rebuilt on a later checkout.
+    ``close()`` closes the idle instances at once and the checked-out ones
+    as they are returned, even if the pool has been started again since.
+    """
+
+    def __init__(self, size=None, warmup=True, model_complexity=None, **pose_kwargs):
+        self.size = max(1, size or DEFAULT_POOL_SIZE)
+        self.warmup = warmup
+        self.model_complexity = DEFAULT_MODEL_COMPLEXITY if model_complexity is None else model_complexity
+        self.pose_kwargs = {"static_image_mode": True, **pose_kwargs}
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        # Serialises start(); held while models load, so nothing else takes it
+        self._start_lock = threading.Lock()
+        self._started = False
+        self._generation = 0
+        self._stats = {"checkouts": 0, "replaced": 0, "failures": 0, "rebuild_failures": 0, "wait_seconds": 0.0}
+        self._last_error = None
+
+    # ---------------- lifecycle ----------------
+    def _create(self, slot):
+        instance = PooledPose(create_pose(self.model_complexity, **self.pose_kwargs), slot, self._generation)
+        if self.warmup:
+            blank = np.zeros((WARMUP_FRAME_SIZE, WARMUP_FRAME_SIZE, 3), dtype=np.uint8)
+            instance.pose.process(blank)
+        return instance
+
+    def _rebuild(self, slot):
+        """A fresh instance for ``slot``, or an EmptySlot if it cannot be created."""
+        try:
+            return self._create(slot)
+        except Exception as exc:
+            with self._lock:
+                self._stats["rebuild_failures"] += 1
+                self._last_error = repr(exc)
+            return EmptySlot(slot, repr(exc), self._generation)
+
+    def start(self):
+        """
+        Create and warm every instance. Safe to call more than once. Models
+        are built under ``_start_lock`` only, so ``stats()`` and ``ready``
+        checks never wait for a warmup.
+        """
+        with self._start_lock:
+            if self._started:
+                return self
+            created = []
+            try:
+                for slot in range(self.size):
+                    created.append(self._create(slot))
+            except Exception:
+                for instance in created:
+                    instance.close()
+                raise
+            with self._lock:
+                for instance in created:
+                    self._idle.put(instance)
+                self._started = True
+        return self
+
+    @property
+    def started(self):
+        # A plain attribute read: safe from the event loop while a start() runs
+        return self._started
+
+    def close(self):
+        with self._lock:
+            # Instances still checked out are now stale and closed on return
+            self._generation += 1
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._started = False
+
+    # ---------------- checkout -----------------
+    @contextmanager
+    def checkout(self, timeout=CHECKOUT_TIMEOUT):
+        if not self._started:
+            self.start()
+
+        waited = time.perf_counter()
+        try:
+            instance = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolExhausted(f"No Pose instance free after {timeout}s")
+
+        if isinstance(instance, EmptySlot):
+            rebuilt = self._rebuild(instance.slot)
+            if isinstance(rebuilt, EmptySlot):
+                self._idle.put(rebuilt)
+                raise TierUnavailable(f"Pose instance could not be rebuilt: {rebuilt.last_error}")
+            instance = rebuilt
+
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["wait_seconds"] += time.perf_counter() - waited
+
+        try:
+            yield instance
+        finally:
+            if not instance.healthy and instance.generation == self._generation:
+                instance.close()
+                with self._lock:
+                    self._stats["failures"] += 1
+                    self._stats["replaced"] += 1
+                instance = self._rebuild(instance.slot)
+            # Checked under the lock so a concurrent close() cannot miss it
+            with self._lock:
+                stale = instance.generation != self._generation
+                if not stale:
+                    self._idle.put(instance)
+            if stale:
+                # The pool was closed while this instance was in use
+                instance.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "model_complexity": self.model_complexity,
+                "idle": self._idle.qsize(),
+                "started": self._started,
+                "last_error": self._last_error,
+                **self._stats,
+            }
+
+
+class TieredPosePool:
+    """
+    One PosePool per model_complexity tier, all the same size.
+
+    The default tier (plus ``PRELOAD_TIERS``) is warmed by ``start()``; other
+    tiers are warmed by ``prepare()`` on first use. A tier that fails to load
+    is reported as unavailable for ``TIER_RETRY_SECONDS`` before retrying.
+    """
+
+    def __init__(self, size=None, warmup=True, default_tier=None, **pose_kwargs):
+        self.size = size
+        self.warmup = warmup
+        self.default_tier = DEFAULT_MODEL_COMPLEXITY if default_tier is None else default_tier
+        self.pose_kwargs = pose_kwargs
+        self._pools = {}
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def pool(self, tier=None):
+        """The (possibly not yet started) PosePool for ``tier``."""
+        tier = self.default_tier if tier is None else tier
+        if tier not in MODEL_TIERS:
+            raise ValueError(f"model_complexity must be one of {sorted(MODEL_TIERS)}")
+        with self._lock:
+            pool = self._pools.get(tier)
+            if pool is None:
+                pool = self._pools[tier] = PosePool(
+                    self.size, self.warmup, model_complexity=tier, **self.pose_kwargs
+                )
+            return pool
+
+    def ready(self, tier):
+        pool = self._pools.get(tier)
+        return pool is not None and pool.started
+
+    def prepare(self, tier):
+        """Start the pool for ``tier`` (blocking); raises TierUnavailable."""
+        failure = self._failures.get(tier)
+        if failure is not None and time.monotonic() - failure[0] < TIER_RETRY_SECONDS:
+            raise TierUnavailable(failure[1])
+        try:
+            pool = self.pool(tier).start()
+        except TierUnavailable as exc:
+            self._failures[tier] = (time.monotonic(), str(exc))
+            raise
+        self._failures.pop(tier, None)
+        return pool
+
+    def start(self, tiers=None):
+        for tier in tiers if tiers is not None else [self.default_tier, *PRELOAD_TIERS]:
+            self.prepare(tier)
+        return self
+
+    def close(self):
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            pool.close()
+
+    def stats(self):
+        with self._lock:
+            pools = dict(self._pools)
+        return {
+            "default_tier": self.default_tier,
+            "tiers": {MODEL_TIERS[tier]: pool.stats() for tier, pool in sorted(pools.items())},
+            "unavailable": {MODEL_TIERS[tier]: error for tier, (_, error) in self._failures.items()},
+        }
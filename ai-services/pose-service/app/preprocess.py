@@ -0,0 +1,107 @@
+import os
+import struct
+
+import numpy as np
+
+from .startup import lazy_import
+from .timing import NULL_TIMER
+
+# OpenCV is imported on the first decode, not with the app (see app/startup.py)
+cv2 = lazy_import("cv2")
+
+# Longest image side handed to MediaPipe; the pose model itself runs at a
+# few hundred pixels, so anything larger is wasted decode time and memory.
+TARGET_SIZE = int(os.getenv("POSE_TARGET_SIZE", "640"))
+
+# cv2.imdecode flag names by DCT reduction factor
+REDUCED_DECODE_FLAGS = {
+    1: "IMREAD_COLOR",
+    2: "IMREAD_REDUCED_COLOR_2",
+    4: "IMREAD_REDUCED_COLOR_4",
+    8: "IMREAD_REDUCED_COLOR_8",
+}
+
+# JPEG start-of-frame markers carrying the image size (excludes DHT/JPG/DAC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def image_dimensions(data):
+    """
+    Read ``(format, width, height)`` from a JPEG or PNG header without decoding.
+    Returns None for anything else or a truncated header.
+    """
+    if data[:8] == _PNG_SIGNATURE and len(data) >= 24:
+        width, height = struct.unpack(">II", data[16:24])
+        return "png", width, height
+
+    if data[:2] != b"\xff\xd8":
+        return None
+
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in _SOF_MARKERS:
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return "jpeg", width, height
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        (length,) = struct.unpack(">H", data[i + 2:i + 4])
+        i += 2 + length
+    return None
+
+
+def choose_reduction(width, height, target=None):
+    """Largest JPEG DCT reduction (1/2/4/8) that keeps the longest side >= target."""
+    target = target or TARGET_SIZE
+    longest = max(width, height)
+    factor = 1
+    while factor < 8 and longest / (factor * 2) >= target:
+        factor *= 2
+    return factor
+
+
+def decode_for_pose(data, target=None, timer=NULL_TIMER):
+    """
+    Decode upload bytes into an RGB image sized for pose inference.
+
+    JPEGs are decoded directly at a reduced scale picked from the header
+    dimensions, the result is area-resized down to ``target`` if still
+    larger, and the BGR->RGB conversion happens in place. Returns
+    ``(image, scale)`` where scale is output size / original size, or
+    ``(None, None)`` if the bytes cannot be decoded. ``timer`` gets the
+    ``imdecode`` (decode + resize) and ``cvtColor`` stages.
+    """
+    target = target or TARGET_SIZE
+    header = image_dimensions(data)
+    if header is not None and not (header[1] and header[2]):
+        header = None
+
+    factor = 1
+    if header is not None and header[0] == "jpeg":
+        factor = choose_reduction(header[1], header[2], target)
+
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), getattr(cv2, REDUCED_DECODE_FLAGS[factor]))
+    if img is None:
+        timer.lap("imdecode")
+        return None, None
+
+    height, width = img.shape[:2]
+    longest = max(height, width)
+    # Compare longest sides: EXIF rotation may swap width and height
+    original_longest = max(header[1], header[2]) if header is not None else longest
+    if longest > target:
+        ratio = target / longest
+        img = cv2.resize(img, (max(1, round(width * ratio)), max(1, round(height * ratio))),
+                         interpolation=cv2.INTER_AREA)
+    timer.lap("imdecode")
+
+    cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img)
+    timer.lap("cvtColor")
+    return img, max(img.shape[:2]) / original_longest
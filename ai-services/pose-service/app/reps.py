@@ -0,0 +1,161 @@
+from collections import deque
+
+from .rules import RULES
+
+# Angle bands (good_low, good_high) from the rule table's ``rep_band``. A rep
+# is extended (angle above good_high) -> flexed past the middle of the good
+# band -> extended again.
+REP_BANDS = RULES.rep_bands
+# Auto-mode frames kept until the first one is classified as a rep exercise
+PENDING_FRAMES = 32
+
+
+def rep_thresholds(exercise):
+    """Return (up, down) hysteresis thresholds for an exercise, or None."""
+    band = REP_BANDS.get((exercise or "").lower())
+    if band is None:
+        return None
+    low, high = band
+    return high, (low + high) / 2.0
+
+
+class RepCounter:
+    """
+    Incremental rep counter for one exercise driven by a joint angle.
+
+    Feed one angle at a time with ``update()``; it keeps O(1) state (current
+    phase plus the extremes of the rep in progress) and returns a rep summary
+    dict when a rep completes, otherwise None. Timestamps are seconds for
+    video/live streams; when omitted the sample index is used instead.
+    """
+
+    def __init__(self, exercise, up=None, down=None):
+        thresholds = rep_thresholds(exercise)
+        if thresholds is None and (up is None or down is None):
+            raise ValueError(f"No rep thresholds for exercise '{exercise}'")
+
+        self.exercise = exercise
+        self.up = up if up is not None else thresholds[0]
+        self.down = down if down is not None else thresholds[1]
+
+        self.count = 0
+        self.last_rep = None
+        self._samples = 0
+        self._phase = None           # None until the first extended sample
+        self._top_angle = None
+        self._top_time = None
+        self._min_angle = None
+        self._min_time = None
+        self._tempo_total = 0.0
+
+    def update(self, angle, timestamp=None):
+        if timestamp is None:
+            timestamp = float(self._samples)
+        self._samples += 1
+
+        if angle is None:
+            return None
+
+        if self._phase is None:
+            if angle >= self.up:
+                self._phase = "up"
+                self._top_angle, self._top_time = angle, timestamp
+            return None
+
+        if self._phase == "up":
+            if angle >= self.up:
+                # Still extended: the rep starts from the last extended sample
+                self._top_angle, self._top_time = angle, timestamp
+                self._min_angle = None
+                return None
+
+            if self._min_angle is None or angle < self._min_angle:
+                self._min_angle, self._min_time = angle, timestamp
+            if angle <= self.down:
+                self._phase = "down"
+            return None
+
+        # phase == "down"
+        if angle < self._min_angle:
+            self._min_angle, self._min_time = angle, timestamp
+            return None
+        if angle < self.up:
+            return None
+
+        return self._complete(angle, timestamp)
+
+    def _complete(self, angle, timestamp):
+        self.count += 1
+        duration = timestamp - self._top_time
+        self._tempo_total += duration
+        self.last_rep = {
+            "rep": self.count,
+            "start": round(self._top_time, 3),
+            "bottom": round(self._min_time, 3),
+            "end": round(timestamp, 3),
+            "duration": round(duration, 3),
+            "eccentric": round(self._min_time - self._top_time, 3),
+            "concentric": round(timestamp - self._min_time, 3),
+            "min_angle": round(self._min_angle, 2),
+            "max_angle": round(max(self._top_angle, angle), 2),
+            "range_of_motion": round(max(self._top_angle, angle) - self._min_angle, 2)
+        }
+
+        self._phase = "up"
+        self._top_angle, self._top_time = angle, timestamp
+        self._min_angle = self._min_time = None
+        return self.last_rep
+
+    @property
+    def average_tempo(self):
+        return round(self._tempo_total / self.count, 3) if self.count else None
+
+
+class RepTracker:
+    """
+    One RepCounter per exercise, for sequences whose exercise may vary.
+
+    Auto-mode sequences go through ``update_auto``: the two ends of a
+    movement rarely classify alike (the standing top of a squat comes back
+    "unknown"), so every frame counts toward the last exercise classified
+    with a rep band, using that exercise's joint angle from the frame.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.exercise = None
+        self._pending = deque(maxlen=PENDING_FRAMES)
+
+    def update(self, exercise, angle, timestamp=None):
+        """Return (running rep count, completed rep or None) for this exercise."""
+        counter = self.counters.get(exercise)
+        if counter is None:
+            if rep_thresholds(exercise) is None:
+                return 0, None
+            counter = self.counters[exercise] = RepCounter(exercise)
+        rep = counter.update(angle, timestamp)
+        return counter.count, rep
+
+    def update_auto(self, exercise, rep_angles, timestamp=None):
+        """
+        Auto-mode ``update`` for a frame classified as ``exercise`` with
+        ``rep_angles`` (see ``rules.rep_angles``). Frames before the first
+        rep exercise is seen are replayed into its counter once it is.
+        """
+        if rep_thresholds(exercise) is None:
+            if self.exercise is None:
+                self._pending.append((rep_angles, timestamp))
+                return 0, None
+            exercise = self.exercise
+        elif self.exercise is None:
+            for angles, at in self._pending:
+                self.update(exercise, angles.get(exercise), at)
+            self._pending.clear()
+        self.exercise = exercise
+        return self.update(exercise, rep_angles.get(exercise), timestamp)
+
+    def summary(self):
+        return {
+            exercise: {"reps": counter.count, "average_tempo": counter.average_tempo}
+            for exercise, counter in self.counters.items()
+        }
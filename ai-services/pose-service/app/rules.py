@@ -0,0 +1,285 @@
+import bisect
+import json
+import operator
+import os
+
+import numpy as np
+
+from .geometry import JOINT_COLUMN, JOINTS, LANDMARK_INDEX, NUM_LANDMARKS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RULES_FILE = os.getenv("POSE_RULES_PATH", os.path.join(BASE_DIR, "data", "exercise_rules.json"))
+
+_OPS = (">", ">=", "<", "<=")
+_OP_FUNCS = (operator.gt, operator.ge, operator.lt, operator.le)
+_DIFF_KINDS = {"dx": 0, "dy": 1, "angle_diff": None}
+_VALUE_KINDS = {"x": 0, "y": 1, "angle": None}
+
+
+class ExerciseRules:
+    """
+    Exercise rule table compiled into array lookups.
+
+    Each exercise's angle bands become a sorted edge array, so scoring an
+    angle is a ``bisect`` (one frame) or ``np.searchsorted`` (an ``(N,)``
+    array of angles). The classifier predicates become a feature gather plus
+    one comparison matrix, evaluated for one frame or a whole stack at once;
+    the first rule whose conditions all hold wins, as in the table order.
+
+    See ``app/data/exercise_rules.json`` for the table format.
+    """
+
+    def __init__(self, table):
+        self._compile_exercises(table["exercises"], table["unrecognized"])
+        self._compile_classifier(table["features"], table["classifier"], table["default"])
+
+    # ---------------------------------------------------------------- scoring
+    def _compile_exercises(self, exercises, unrecognized):
+        triplets = {triplet: name for name, triplet in JOINTS.items()}
+        self.names = tuple(exercises)
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self.unrecognized = (unrecognized["feedback"], float(unrecognized["score"]))
+
+        self.joints = {}
+        self.rep_bands = {}
+        self._edges, self._closed, self._feedback, self._scores = [], [], [], []
+        for name, spec in exercises.items():
+            triplet = tuple(LANDMARK_INDEX[landmark] for landmark in spec["joint"])
+            if triplet not in triplets:
+                raise ValueError(f"Exercise '{name}': {spec['joint']} is not a known joint")
+            self.joints[name] = triplets[triplet]
+            if "rep_band" in spec:
+                low, high = spec["rep_band"]
+                self.rep_bands[name] = (float(low), float(high))
+
+            # Band i covers (edge[i-1], edge[i]); "through" puts the edge in
+            # band i, "below" in band i + 1, so closed[i] flags the latter.
+            edges, closed = [], []
+            for band in spec["bands"][:-1]:
+                edge = band.get("through", band.get("below"))
+                if edge is None:
+                    raise ValueError(f"Exercise '{name}': only the last band may be open-ended")
+                if edges and edge <= edges[-1]:
+                    raise ValueError(f"Exercise '{name}': band edges must increase")
+                edges.append(float(edge))
+                closed.append("below" in band)
+            self._edges.append(edges)
+            self._closed.append(closed)
+            self._feedback.append([band["feedback"] for band in spec["bands"]])
+            self._scores.append([float(band["score"]) for band in spec["bands"]])
+
+        # Padded 2-D copies for scoring frames of mixed exercises together
+        width = max(len(edges) for edges in self._edges)
+        count = len(self.names)
+        self._edge_table = np.full((count, width), np.inf)
+        self._closed_table = np.zeros((count, width), dtype=bool)
+        self._score_table = np.full((count + 1, width + 1), self.unrecognized[1])
+        self._feedback_table = np.full((count + 1, width + 1), self.unrecognized[0], dtype=object)
+        for i in range(count):
+            n = len(self._edges[i])
+            self._edge_table[i, :n] = self._edges[i]
+            self._closed_table[i, :n] = self._closed[i]
+            self._score_table[i, :n + 1] = self._scores[i]
+            self._feedback_table[i, :n + 1] = self._feedback[i]
+        self._joint_columns = np.array([JOINT_COLUMN[self.joints[name]] for name in self.names], dtype=np.intp)
+        self._twin_columns = np.array(
+            [JOINT_COLUMN[self.joints[name].replace("left_", "right_")] for name in self.names], dtype=np.intp
+        )
+
+    def exercise_index(self, exercise):
+        """Row of ``exercise`` in the table (case-insensitive), or None."""
+        index = self._index.get(exercise)
+        if index is None and isinstance(exercise, str):
+            index = self._index.get(exercise.lower())
+        return index
+
+    def exercise_indices(self, exercises):
+        """Rows for a sequence of exercise names; -1 marks unknown exercises."""
+        rows = [self.exercise_index(exercise) for exercise in exercises]
+        return np.array([-1 if row is None else row for row in rows], dtype=np.intp)
+
+    def evaluate(self, exercise, angle):
+        """``(feedback, score)`` for one angle of ``exercise``."""
+        index = self.exercise_index(exercise)
+        if index is None or angle != angle:
+            return self.unrecognized
+
+        edges = self._edges[index]
+        band = bisect.bisect_left(edges, angle)
+        if band < len(edges) and edges[band] == angle and self._closed[index][band]:
+            band += 1
+        return self._feedback[index][band], self._scores[index][band]
+
+    def evaluate_array(self, exercise, angles):
+        """
+        Score an ``(N,)`` angle array of one exercise with ``np.searchsorted``.
+        Returns ``(feedback list, scores)``; NaN angles are unrecognized.
+        """
+        angles = np.asarray(angles, dtype=np.float64)
+        index = self.exercise_index(exercise)
+        if index is None:
+            return [self.unrecognized[0]] * len(angles), np.full(angles.shape, self.unrecognized[1])
+
+        edges = self._edge_table[index, :len(self._edges[index])]
+        band = np.searchsorted(edges, angles, side="left")
+        edge = np.minimum(band, len(edges) - 1)
+        band += (band < len(edges)) & (edges[edge] == angles) & self._closed_table[index, edge]
+        return self._lookup(np.full(angles.shape, index), band, np.isnan(angles))
+
+    def evaluate_frames(self, indices, angles):
+        """
+        Score ``(N,)`` angles where frame i belongs to exercise row
+        ``indices[i]`` (-1 for unknown). Returns ``(feedback list, scores)``.
+        """
+        angles = np.asarray(angles, dtype=np.float64)
+        known = np.maximum(indices, 0)
+        edges = self._edge_table[known]
+        column = angles[:, np.newaxis]
+        band = (edges < column).sum(axis=1) + ((edges == column) & self._closed_table[known]).sum(axis=1)
+        return self._lookup(known, band, np.isnan(angles) | (indices < 0))
+
+    def _lookup(self, rows, band, unrecognized):
+        # The extra last row of the tables holds the unrecognized result
+        rows = np.where(unrecognized, len(self.names), rows)
+        band = np.where(unrecognized, 0, band)
+        return self._feedback_table[rows, band].tolist(), self._score_table[rows, band]
+
+    def exercise_angle(self, angles, exercise):
+        """Pick the scored joint angle(s) for ``exercise`` out of ``joint_angles`` output, or None."""
+        index = self.exercise_index(exercise)
+        if index is None:
+            return None
+        return angles[..., self._joint_columns[index]]
+
+    def rep_angles(self, angles):
+        """``{exercise: angle}`` of one ``joint_angles`` row for every exercise with a rep band."""
+        return {name: float(self.exercise_angle(angles, name)) for name in self.rep_bands}
+
+    def bilateral_asymmetry(self, angles, exercise):
+        """Absolute left/right difference of the scored joint, or None."""
+        index = self.exercise_index(exercise)
+        if index is None:
+            return None
+        return np.abs(angles[..., self._joint_columns[index]] - angles[..., self._twin_columns[index]])
+
+    def frame_angles(self, angles, indices):
+        """Scored joint and asymmetry per frame of an ``(N, J)`` stack; NaN for unknown exercises."""
+        rows = np.arange(len(indices))
+        safe = np.maximum(indices, 0)
+        angle = angles[rows, self._joint_columns[safe]]
+        asymmetry = np.abs(angle - angles[rows, self._twin_columns[safe]])
+        unknown = indices < 0
+        return np.where(unknown, np.nan, angle), np.where(unknown, np.nan, asymmetry)
+
+    # ------------------------------------------------------------- classifier
+    def _compile_classifier(self, features, classifier, default):
+        # Features are |a - b| or a over one source row per frame:
+        # [x of 33 landmarks, y of 33 landmarks, joint angles]
+        def source(kind_axis, ref):
+            if kind_axis is None:
+                return 2 * NUM_LANDMARKS + JOINT_COLUMN[ref]
+            return kind_axis * NUM_LANDMARKS + LANDMARK_INDEX[ref]
+
+        columns = {}
+        first, second = [], []
+        for name, spec in features.items():
+            (kind, ref), = spec.items()
+            if kind in _DIFF_KINDS:
+                first.append(source(_DIFF_KINDS[kind], ref[0]))
+                second.append(source(_DIFF_KINDS[kind], ref[1]))
+            elif kind in _VALUE_KINDS:
+                first.append(source(_VALUE_KINDS[kind], ref))
+                second.append(-1)
+            else:
+                raise ValueError(f"Feature '{name}': unknown kind '{kind}'")
+            columns[name] = len(columns)
+        self._feature_first = np.array(first, dtype=np.intp)
+        self._feature_second = np.array(second, dtype=np.intp)
+        self._feature_is_diff = self._feature_second >= 0
+        self._feature_second = np.maximum(self._feature_second, 0)
+
+        feature, op, value, starts = [], [], [], []
+        # Plain-Python copy for single frames, where NumPy call overhead dominates
+        self._scalar_features = list(zip(first, second))
+        self._scalar_rules = []
+        for label, rule in enumerate(classifier):
+            starts.append(len(feature))
+            conditions = []
+            for name, symbol, threshold in rule["all"]:
+                if symbol not in _OPS:
+                    raise ValueError(f"Rule '{rule['exercise']}': unknown operator '{symbol}'")
+                feature.append(columns[name])
+                op.append(_OPS.index(symbol))
+                value.append(float(threshold))
+                conditions.append((columns[name], _OP_FUNCS[op[-1]], value[-1]))
+            self._scalar_rules.append((label, conditions))
+        self._cond_feature = np.array(feature, dtype=np.intp)
+        self._cond_value = np.array(value)
+        op = np.array(op)
+        self._cond_ops = [op == i for i in range(len(_OPS))]
+        self._rule_starts = np.array(starts, dtype=np.intp)
+        self.labels = [rule["exercise"] for rule in classifier] + [default["exercise"]]
+        self._confidence = np.array([rule["confidence"] for rule in classifier] + [default["confidence"]])
+
+    def _features(self, points, angles):
+        xy = np.asarray(points)[..., :2].astype(np.float64)
+        src = np.concatenate([xy[..., 0], xy[..., 1], angles], axis=-1)
+        a = src[..., self._feature_first]
+        b = src[..., self._feature_second]
+        return np.where(self._feature_is_diff, np.abs(a - b), a)
+
+    def classify_indices(self, points, angles):
+        """
+        Index into ``labels`` for one ``(33, 4)`` frame or an ``(N, 33, 4)``
+        stack with matching ``joint_angles`` output.
+        """
+        values = self._features(points, angles)[..., self._cond_feature]
+        gt, ge, lt, le = self._cond_ops
+        thresholds = self._cond_value
+        hold = ((gt & (values > thresholds)) | (ge & (values >= thresholds))
+                | (lt & (values < thresholds)) | (le & (values <= thresholds)))
+        matched = np.logical_and.reduceat(hold, self._rule_starts, axis=-1)
+        return np.where(matched.any(axis=-1), matched.argmax(axis=-1), len(self.labels) - 1)
+
+    def classify(self, points, angles):
+        """``(exercise, confidence)`` for one frame; same rules as ``classify_indices``."""
+        xy = np.asarray(points)[:, :2].astype(np.float64)
+        src = xy[:, 0].tolist() + xy[:, 1].tolist() + np.asarray(angles, dtype=np.float64).tolist()
+        values = [src[a] if b < 0 else abs(src[a] - src[b]) for a, b in self._scalar_features]
+
+        label = len(self.labels) - 1
+        for rule, conditions in self._scalar_rules:
+            if all(op(values[column], threshold) for column, op, threshold in conditions):
+                label = rule
+                break
+        return self.labels[label], float(self._confidence[label])
+
+    def classify_stack(self, points, angles):
+        """``(exercises list, confidences array)`` for an ``(N, 33, 4)`` stack."""
+        labels = self.classify_indices(points, angles)
+        return [self.labels[i] for i in labels.tolist()], self._confidence[labels]
+
+
+def load_rules(path=None):
+    """Load and compile the rule table at ``path`` (default ``RULES_FILE``)."""
+    with open(path or RULES_FILE, encoding="utf-8") as f:
+        return ExerciseRules(json.load(f))
+
+
+# Compiled once at import; shared by every request
+RULES = load_rules()
+
+
+def exercise_angle(angles, exercise):
+    """``RULES.exercise_angle``: the scored joint angle(s) for ``exercise``, or None."""
+    return RULES.exercise_angle(angles, exercise)
+
+
+def rep_angles(angles):
+    """``RULES.rep_angles``: the rep joint angle of every exercise with a rep band."""
+    return RULES.rep_angles(angles)
+
+
+def bilateral_asymmetry(angles, exercise):
+    """``RULES.bilateral_asymmetry``: left/right difference of the scored joint, or None."""
+    return RULES.bilateral_asymmetry(angles, exercise)
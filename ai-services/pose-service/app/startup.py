@@ -0,0 +1,165 @@
+import importlib
+import os
+import sys
+import threading
+import time
+
+# When the pose pools are loaded: "background" warms them on a thread after
+# startup (the server answers /health/live at once), "startup" blocks startup
+# until they are warm, "lazy" leaves them to the first request or an explicit
+# POST /health/warmup.
+WARMUP_MODE = os.getenv("POSE_WARMUP", "background").lower()
+WARMUP_MODES = ("background", "startup", "lazy")
+
+# Seconds spent on the first import of each lazily imported module
+IMPORT_SECONDS = {}
+_import_lock = threading.Lock()
+_lazy_modules = {}
+
+
+class LazyModule:
+    """
+    Stand-in for a heavy module (cv2, MediaPipe) that imports it on first
+    attribute access and records the time taken in IMPORT_SECONDS.
+
+    Attribute writes and deletes go to the real module, so patch targets
+    such as ``app.pool.mp_pose.Pose.process`` behave as before.
+    """
+
+    def __init__(self, name):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def load(self):
+        module = self._module
+        if module is None:
+            with _import_lock:
+                module = self._module
+                if module is None:
+                    cold = self._name not in sys.modules
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    if cold:
+                        IMPORT_SECONDS[self._name] = time.perf_counter() - started
+                    object.__setattr__(self, "_module", module)
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.load(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self.load(), name)
+
+    def __dir__(self):
+        return dir(self.load())
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'{'' if self.loaded else ' (not loaded)'}>"
+
+
+def lazy_import(name):
+    """The shared LazyModule for ``name``."""
+    with _import_lock:
+        module = _lazy_modules.get(name)
+        if module is None:
+            module = _lazy_modules[name] = LazyModule(name)
+        return module
+
+
+class Warmup:
+    """
+    Readiness of the service: runs the named ``steps`` (model pool loads)
+    once, either blocking or on a background thread, and records how long
+    each took. ``ready`` is True once every step succeeded, or once
+    ``is_warm()`` reports the models were loaded some other way (lazy mode
+    warms them on the first request).
+    """
+
+    def __init__(self, steps, mode=None, is_warm=None):
+        self.steps = list(steps)
+        self.is_warm = is_warm
+        self.mode = mode or WARMUP_MODE
+        if self.mode not in WARMUP_MODES:
+            raise ValueError(f"POSE_WARMUP must be one of {', '.join(WARMUP_MODES)}")
+        self.state = "pending"
+        self.error = None
+        self.step_seconds = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        if self.state == "pending" and self.is_warm is not None and self.is_warm():
+            self.state = "ready"
+        return self.state == "ready"
+
+    def run(self):
+        """Run the steps on the calling thread; a failure is recorded, not raised."""
+        with self._lock:
+            if self.state in ("running", "ready"):
+                return self.ready
+            self.state, self.error = "running", None
+        try:
+            for name, step in self.steps:
+                started = time.perf_counter()
+                step()
+                self.step_seconds[name] = time.perf_counter() - started
+        except Exception as exc:
+            self.state, self.error = "failed", repr(exc)
+        else:
+            self.state = "ready"
+        return self.ready
+
+    def start(self):
+        """Run the steps on a background thread unless already running or done."""
+        with self._lock:
+            if self.state in ("running", "ready") or (self._thread is not None and self._thread.is_alive()):
+                return self
+            self._thread = threading.Thread(target=self.run, name="pose-warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def on_startup(self):
+        if self.mode == "startup":
+            self.run()
+        elif self.mode == "background":
+            self.start()
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "state": self.state,
+            "error": self.error,
+            "step_seconds": {name: round(seconds, 4) for name, seconds in self.step_seconds.items()},
+            "import_seconds": {name: round(seconds, 4) for name, seconds in IMPORT_SECONDS.items()},
+        }
+
+    def render(self):
+        """Prometheus gauges for import and warmup times plus readiness."""
+        lines = [
+            "# HELP pose_import_seconds Time spent on the first import of a heavy module.",
+            "# TYPE pose_import_seconds gauge",
+        ]
+        lines += [f'pose_import_seconds{{module="{name}"}} {seconds:.6f}' for name, seconds in IMPORT_SECONDS.items()]
+        lines += [
+            "# HELP pose_warmup_seconds Time spent on each warmup step.",
+            "# TYPE pose_warmup_seconds gauge",
+        ]
+        lines += [f'pose_warmup_seconds{{step="{name}"}} {seconds:.6f}' for name, seconds in self.step_seconds.items()]
+        lines += [
+            "# HELP pose_ready Whether warmup has completed.",
+            "# TYPE pose_ready gauge",
+            f"pose_ready {int(self.ready)}",
+        ]
+        return "\n".join(lines) + "\n"
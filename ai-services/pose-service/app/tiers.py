@@ -0,0 +1,110 @@
+import os
+import time
+from collections import deque
+
+from .pool import DEFAULT_MODEL_COMPLEXITY, MODEL_TIERS
+
+# Requests without a model_complexity follow the adaptive policy when enabled
+ADAPTIVE_TIERS = os.getenv("POSE_ADAPTIVE_TIERS", "0") == "1"
+ADAPTIVE_QUEUE_HIGH = int(os.getenv("POSE_ADAPTIVE_QUEUE_HIGH", "8"))
+ADAPTIVE_P95_MS = float(os.getenv("POSE_ADAPTIVE_P95_MS", "250"))
+ADAPTIVE_COOLDOWN_SECONDS = float(os.getenv("POSE_ADAPTIVE_COOLDOWN_S", "5"))
+ADAPTIVE_MIN_TIER = int(os.getenv("POSE_ADAPTIVE_MIN_TIER", "0"))
+
+# Latency samples needed before p95 is trusted to degrade a tier
+MIN_SAMPLES = 20
+
+AUTO = "auto"
+_TIER_NAMES = {name: tier for tier, name in MODEL_TIERS.items()}
+
+
+def parse_tier(value):
+    """
+    Parse a ``model_complexity`` request value: 0/1/2, lite/full/heavy or
+    "auto". Returns the tier, AUTO, or None when not given. Raises ValueError.
+    """
+    if value is None or value == "":
+        return None
+    value = str(value).strip().lower()
+    if value == AUTO:
+        return AUTO
+    if value in _TIER_NAMES:
+        return _TIER_NAMES[value]
+    if value.isdigit() and int(value) in MODEL_TIERS:
+        return int(value)
+    raise ValueError(f"model_complexity must be one of 0, 1, 2, lite, full, heavy or auto (got {value!r})")
+
+
+class TierSelector:
+    """
+    Picks the model_complexity tier for each request.
+
+    Explicit tiers are always honoured. Adaptive requests (``auto``, or no
+    tier when ``adaptive`` is on) get the default tier capped by ``cap``,
+    which drops one tier when the inference queue reaches ``queue_high`` or
+    the recent per-image p95 exceeds ``p95_ms``, and climbs back one tier
+    once the queue is short and p95 is under half the limit. Changes are at
+    least ``cooldown`` seconds apart so the tier does not flap. Only used
+    from the event loop, so no lock is needed.
+    """
+
+    def __init__(self, default_tier=None, adaptive=None, queue_high=None, p95_ms=None,
+                 cooldown=None, min_tier=None, window=200, clock=time.monotonic):
+        self.default_tier = DEFAULT_MODEL_COMPLEXITY if default_tier is None else default_tier
+        self.adaptive = ADAPTIVE_TIERS if adaptive is None else adaptive
+        self.queue_high = queue_high or ADAPTIVE_QUEUE_HIGH
+        self.p95_limit = (p95_ms or ADAPTIVE_P95_MS) / 1000.0
+        self.cooldown = ADAPTIVE_COOLDOWN_SECONDS if cooldown is None else cooldown
+        self.min_tier = min(self.default_tier, ADAPTIVE_MIN_TIER if min_tier is None else min_tier)
+        self.cap = self.default_tier
+        self.clock = clock
+
+        self._latencies = deque(maxlen=window)
+        self._changed_at = float("-inf")
+        self._changes = 0
+
+    def record(self, seconds):
+        """Per-image pipeline time of a finished image."""
+        self._latencies.append(seconds)
+
+    def p95(self):
+        if len(self._latencies) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def _set_cap(self, cap, now):
+        self.cap = cap
+        self._changed_at = now
+        self._changes += 1
+        # Samples from the previous tier say nothing about the new one
+        self._latencies.clear()
+
+    def _adjust(self, queue_depth):
+        now = self.clock()
+        if now - self._changed_at < self.cooldown:
+            return
+        p95 = self.p95()
+        if queue_depth >= self.queue_high or (p95 is not None and p95 > self.p95_limit):
+            if self.cap > self.min_tier:
+                self._set_cap(self.cap - 1, now)
+        elif queue_depth <= self.queue_high // 4 and (p95 is None or p95 < self.p95_limit / 2):
+            if self.cap < self.default_tier:
+                self._set_cap(self.cap + 1, now)
+
+    def select(self, requested, queue_depth=0):
+        """Tier for a request given its parsed ``model_complexity`` and the current queue depth."""
+        if requested == AUTO or (requested is None and self.adaptive):
+            self._adjust(queue_depth)
+            return self.cap
+        return self.default_tier if requested is None else requested
+
+    def stats(self):
+        p95 = self.p95()
+        return {
+            "adaptive": self.adaptive,
+            "default_tier": self.default_tier,
+            "current_tier": self.cap,
+            "recent_p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+            "changes": self._changes
+        }
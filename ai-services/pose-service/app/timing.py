@@ -0,0 +1,248 @@
+import bisect
+import contextvars
+import json
+import time
+
+from fastapi.responses import JSONResponse
+from starlette.routing import Match
+
+# Histogram bucket upper bounds in seconds: 100us to ~100s, sqrt(2) apart,
+# fine enough to estimate p50/p95/p99 within a few percent.
+BUCKETS = tuple(0.0001 * 2 ** (i / 2) for i in range(41))
+QUANTILES = (0.5, 0.95, 0.99)
+
+_request_timings = contextvars.ContextVar("pose_request_timings", default=None)
+
+
+class StageTimer:
+    """
+    Lap timer for one image (or one request): each ``lap(stage)`` adds the
+    time since the previous lap to that stage. Costs one perf_counter()
+    call and a dict update per stage, so it stays on in production.
+    """
+
+    __slots__ = ("stages", "_last")
+
+    def __init__(self):
+        self.stages = {}
+        self._last = time.perf_counter()
+
+    def restart(self):
+        """Start timing from now without charging the gap to any stage."""
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def merge(self, stages):
+        for stage, seconds in stages.items():
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def as_ms(self):
+        return {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()}
+
+
+class _NullTimer:
+    """Stand-in for callers that don't time anything."""
+
+    __slots__ = ()
+    stages = {}
+
+    def restart(self):
+        pass
+
+    def lap(self, stage):
+        pass
+
+    def merge(self, stages):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class RequestTimings:
+    """Stage timers of one HTTP request: one per image plus request-level stages."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.request = StageTimer()
+        self.images = []
+
+    def image_timer(self):
+        timer = StageTimer()
+        self.images.append(timer)
+        return timer
+
+    def totals(self):
+        totals = dict(self.request.stages)
+        for timer in self.images:
+            for stage, seconds in timer.stages.items():
+                totals[stage] = totals.get(stage, 0.0) + seconds
+        return totals
+
+    def server_timing(self, total):
+        """``Server-Timing`` header value; image stages are summed over the batch."""
+        metrics = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in self.totals().items()]
+        metrics.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(metrics)
+
+
+def current_timings():
+    """RequestTimings of the request being served, or None outside TimingMiddleware."""
+    return _request_timings.get()
+
+
+def image_timer():
+    """A StageTimer for one image, attached to the current request if there is one."""
+    timings = _request_timings.get()
+    return timings.image_timer() if timings is not None else StageTimer()
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse that charges its own rendering to the ``serialize`` stage."""
+
+    def render(self, content):
+        timings = _request_timings.get()
+        if timings is None:
+            return super().render(content)
+        timings.request.restart()
+        body = super().render(content)
+        timings.request.lap("serialize")
+        return body
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+
+class StageMetrics:
+    """
+    Per-endpoint, per-stage latency histograms rendered in the Prometheus
+    text format. Only updated from the event loop, so no lock is needed.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+
+    def observe(self, endpoint, stage, seconds):
+        key = (endpoint, stage)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = _Histogram()
+        histogram.observe(seconds)
+
+    def observe_request(self, endpoint, timings, total):
+        for stage, seconds in timings.request.stages.items():
+            self.observe(endpoint, stage, seconds)
+        for timer in timings.images:
+            for stage, seconds in timer.stages.items():
+                self.observe(endpoint, stage, seconds)
+        self.observe(endpoint, "total", total)
+
+    def quantiles(self, endpoint, stage):
+        histogram = self._histograms.get((endpoint, stage))
+        if histogram is None:
+            return None
+        return {f"p{round(q * 100)}": histogram.quantile(q) for q in QUANTILES}
+
+    def render(self):
+        lines = [
+            "# HELP pose_stage_seconds Time per pipeline stage (per image for image stages).",
+            "# TYPE pose_stage_seconds histogram",
+        ]
+        for (endpoint, stage), histogram in sorted(self._histograms.items()):
+            labels = f'endpoint={json.dumps(endpoint)},stage="{stage}"'
+            cumulative = 0
+            for bound, n in zip(BUCKETS, histogram.counts):
+                cumulative += n
+                lines.append(f'pose_stage_seconds_bucket{{{labels},le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'pose_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"pose_stage_seconds_sum{{{labels}}} {histogram.total:.6f}")
+            lines.append(f"pose_stage_seconds_count{{{labels}}} {histogram.count}")
+
+        lines += [
+            "# HELP pose_stage_quantile_seconds Estimated stage latency quantiles.",
+            "# TYPE pose_stage_quantile_seconds gauge",
+        ]
+        for (endpoint, stage), histogram in sorted(self._histograms.items()):
+            labels = f'endpoint={json.dumps(endpoint)},stage="{stage}"'
+            for q in QUANTILES:
+                lines.append(f'pose_stage_quantile_seconds{{{labels},quantile="{q}"}} {histogram.quantile(q):.6f}')
+        return "\n".join(lines) + "\n"
+
+
+def _route_path(scope):
+    """Route template of a request, e.g. ``/jobs/{job_id}``, or None if unmatched."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Older FastAPI releases don't put the route in the scope
+    for route in getattr(scope.get("app"), "routes", ()):
+        if route.matches(scope)[0] == Match.FULL:
+            return route.path
+    return None
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware that gives every HTTP request a RequestTimings, adds a
+    ``Server-Timing`` header when the response starts and feeds the stage
+    histograms, labelled by route template (e.g. ``/jobs/{job_id}``).
+    Streamed bodies are timed up to their first byte.
+    """
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - timings.started
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"server-timing", timings.server_timing(total).encode("latin-1"))
+                ]
+                endpoint = _route_path(scope)
+                if endpoint is not None:
+                    self.metrics.observe_request(endpoint, timings, total)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
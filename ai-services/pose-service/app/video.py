@@ -0,0 +1,158 @@
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from .analysis import mp_pose, score_stack, stack_rep_angles
+from .geometry import landmarks_to_array
+from .pool import DEFAULT_MODEL_COMPLEXITY, create_pose
+from .reps import RepTracker
+from .startup import lazy_import
+
+cv2 = lazy_import("cv2")
+
+VIDEO_SAMPLE_FPS = float(os.getenv("POSE_VIDEO_SAMPLE_FPS", "10"))
+FALLBACK_FPS = 30.0
+# Largest accepted video upload, and most sampled frames analyzed per video
+MAX_VIDEO_BYTES = int(float(os.getenv("POSE_MAX_VIDEO_MB", "200")) * 1024 * 1024)
+MAX_VIDEO_FRAMES = int(os.getenv("POSE_MAX_VIDEO_FRAMES", "3000"))
+
+
+def analyze_video(path, file_name, exercise_type=None, sample_fps=None, model_complexity=None, max_frames=None):
+    """
+    Run pose analysis over a video file and return a per-frame time series.
+
+    Frames are sampled at ``sample_fps``; skipped frames are only ``grab()``-ed
+    so they are never converted. Analysis stops after ``max_frames`` sampled
+    frames (``MAX_VIDEO_FRAMES``) and the summary is marked ``truncated``. The Pose instance runs in tracking mode
+    (``static_image_mode=False``) so each frame reuses the previous frame's
+    ROI instead of running full-frame person detection. It is created per
+    video because tracking state must not leak between uploads.
+    """
+    sample_fps = sample_fps or VIDEO_SAMPLE_FPS
+    max_frames = max_frames or MAX_VIDEO_FRAMES
+    model_complexity = DEFAULT_MODEL_COMPLEXITY if model_complexity is None else model_complexity
+    started = time.perf_counter()
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return {
+            "file_name": file_name,
+            "feedback": "Invalid video format",
+            "frames": [],
+            "reps": [],
+            "summary": None
+        }
+
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or FALLBACK_FPS
+    step = max(1, round(source_fps / sample_fps))
+
+    frames = []
+    detected = []
+    landmarks = []
+    frame_index = 0
+    truncated = False
+
+    try:
+        with create_pose(model_complexity, static_image_mode=False) as pose:
+            while True:
+                if len(frames) >= max_frames:
+                    truncated = cap.grab()
+                    break
+                if frame_index % step:
+                    if not cap.grab():
+                        break
+                    frame_index += 1
+                    continue
+
+                ok, img = cap.read()
+                if not ok:
+                    break
+
+                cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img)
+                res = pose.process(img)
+                timestamp = frame_index / source_fps
+                entry = {
+                    "frame": frame_index,
+                    "timestamp": round(timestamp, 3),
+                    "pose_detected": bool(res.pose_landmarks),
+                    "exercise": exercise_type or "unknown",
+                    "angle": None,
+                    "feedback": "No person detected",
+                    "performance_score": 0.0,
+                    "rep_count": 0
+                }
+
+                if res.pose_landmarks:
+                    detected.append((entry, timestamp))
+                    landmarks.append(landmarks_to_array(res.pose_landmarks.landmark))
+
+                frames.append(entry)
+                frame_index += 1
+    finally:
+        cap.release()
+
+    # Score every detected frame in one vectorised pass, then count reps in order
+    tracker = RepTracker()
+    reps = []
+    exercise_counts = {}
+    if landmarks:
+        stack = np.stack(landmarks)
+        exercises, _, angles, _, feedback, scores = score_stack(stack, exercise_type or None)
+        # Auto mode counts reps toward the exercise carried across frames
+        # classified differently, e.g. the standing top of a squat
+        frame_rep_angles = stack_rep_angles(stack) if not exercise_type else [None] * len(exercises)
+        for (entry, timestamp), exercise, angle, text, score, rep_angles in zip(
+                detected, exercises, angles.tolist(), feedback, scores.tolist(), frame_rep_angles):
+            angle = angle if angle == angle else None
+            exercise_counts[exercise] = exercise_counts.get(exercise, 0) + 1
+            if rep_angles is not None:
+                rep_count, rep = tracker.update_auto(exercise, rep_angles, timestamp)
+            else:
+                rep_count, rep = tracker.update(exercise, angle, timestamp)
+            if rep is not None:
+                reps.append({"exercise": tracker.exercise or exercise, **rep})
+            entry.update({
+                "exercise": exercise,
+                "angle": round(angle, 2) if angle is not None else None,
+                "feedback": text,
+                "performance_score": round(score, 2),
+                "rep_count": rep_count
+            })
+
+    scored = [f["performance_score"] for f in frames if f["angle"] is not None]
+    duration = frame_index / source_fps
+    elapsed = time.perf_counter() - started
+
+    return {
+        "file_name": file_name,
+        "source_fps": round(source_fps, 2),
+        "sample_fps": round(source_fps / step, 2),
+        "model_complexity": model_complexity,
+        "frames": frames,
+        "reps": reps,
+        "summary": {
+            "total_frames": frame_index,
+            "sampled_frames": len(frames),
+            "frames_with_pose": sum(1 for f in frames if f["pose_detected"]),
+            "average_score": round(sum(scored) / len(scored), 2) if scored else 0.0,
+            "most_common_exercise": max(exercise_counts, key=exercise_counts.get) if exercise_counts else "unknown",
+            "reps": tracker.summary(),
+            "duration_seconds": round(duration, 2),
+            "processing_seconds": round(elapsed, 3),
+            "realtime_factor": round(duration / elapsed, 2) if elapsed > 0 else None,
+            "truncated": truncated
+        }
+    }
+
+
+def analyze_video_upload(fileobj, file_name, exercise_type=None, sample_fps=None, model_complexity=None):
+    """Spool an uploaded video to a temp file (VideoCapture needs a path) and analyze it."""
+    suffix = os.path.splitext(file_name or "")[1] or ".mp4"
+    with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+        fileobj.seek(0)
+        shutil.copyfileobj(fileobj, tmp)
+        tmp.flush()
+        return analyze_video(tmp.name, file_name, exercise_type, sample_fps, model_complexity)
@@ -0,0 +1,127 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from starlette.concurrency import run_in_threadpool
+
+from .analysis import analyze_image
+from .cache import LandmarkCache
+from .pool import TieredPosePool
+from .timing import StageTimer
+
+# "thread" keeps batches in the API process on the shared PosePool,
+# "process" fans batch images out over BatchProcessPool workers.
+EXECUTION_MODE = os.getenv("POSE_EXECUTION_MODE", "thread").lower()
+BATCH_WORKERS = int(os.getenv("POSE_BATCH_WORKERS", "0")) or (os.cpu_count() or 1)
+
+# One warm Pose per model tier and a landmark cache per worker process,
+# created by the pool initializer (non-default tiers on first use). Workers
+# share hits across processes only via POSE_CACHE_DIR.
+_worker_pools = None
+_worker_cache = None
+
+
+def _init_worker():
+    global _worker_pools, _worker_cache
+    _worker_pools = TieredPosePool(size=1).start()
+    _worker_cache = LandmarkCache()
+
+
+def _ping(_):
+    return os.getpid()
+
+
+def _analyze_in_worker(data, file_name, exercise_type, model_complexity=None):
+    timer = StageTimer()
+    pool = _worker_pools.prepare(_worker_pools.default_tier if model_complexity is None else model_complexity)
+    result = analyze_image(data, file_name, pool, exercise_type, cache=_worker_cache, timer=timer)
+    return result, timer.stages
+
+
+class BatchProcessPool:
+    """
+    Process pool that runs decode + pose.process + scoring per image.
+
+    Workers are spawned (not forked) so no MediaPipe graph state leaks from
+    the API process, and each one keeps its own warm Pose instance. Results
+    come back in upload order.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or BATCH_WORKERS
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def started(self):
+        return self._executor is not None
+
+    def start(self):
+        """Spawn and warm the workers (blocking); a no-op once started."""
+        with self._executor_lock:
+            if self._executor is None:
+                executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker
+                )
+                try:
+                    # Spawn and warm every worker now instead of on the first batch
+                    list(executor.map(_ping, range(self.max_workers)))
+                except BaseException:
+                    executor.shutdown(cancel_futures=True)
+                    raise
+                self._executor = executor
+        return self
+
+    async def stream(self, items, exercise_type=None, timers=None, model_complexity=None, item_errors=()):
+        """
+        Analyze an async iterable of ``(file_name, data)`` and yield results in
+        upload order, with at most one image per worker in flight. ``timers``
+        may be filled by the producer as items are read. An item failing
+        with one of ``item_errors`` yields ``{"file_name", "error"}`` and the
+        stream goes on. If an item fails otherwise or the consumer stops
+        early, images still in flight are cancelled (or their outcome
+        retrieved) before the error propagates.
+        """
+        if not self.started:
+            await run_in_threadpool(self.start)
+        pending = deque()
+        index = 0
+
+        async def next_result():
+            nonlocal index
+            file_name, future = pending.popleft()
+            try:
+                result, stages = await future
+            except item_errors as exc:
+                result, stages = {"file_name": file_name, "error": str(exc)}, {}
+            if timers is not None:
+                timers[index].merge(stages)
+            index += 1
+            return result
+
+        try:
+            async for file_name, data in items:
+                pending.append((file_name, asyncio.wrap_future(
+                    self._executor.submit(_analyze_in_worker, data, file_name, exercise_type, model_complexity)
+                )))
+                if len(pending) >= self.max_workers:
+                    yield await next_result()
+            while pending:
+                yield await next_result()
+        finally:
+            for _, future in pending:
+                if future.done() and not future.cancelled():
+                    future.exception()
+                else:
+                    future.cancel()
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
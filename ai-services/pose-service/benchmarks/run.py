@@ -0,0 +1,414 @@
+"""
+Pose-service benchmark suite.
+
+Drives /workouts/frame, /workouts/batch, /analyze-batch and
+/workouts/landmarks with synthetic uploads at fixed concurrency levels,
+either in-process (ASGI transport, no sockets) or against a local uvicorn,
+and reports throughput, latency percentiles of successful requests, the
+server's peak RSS during each scenario (sampled from /proc, Linux only) and
+mean per-stage time (from the Server-Timing header). Run from the
+pose-service directory:
+
+    python -m benchmarks.run --targets inprocess,uvicorn --concurrency 1,4 \\
+        --output bench.json --baseline benchmarks/baseline.json
+
+``--save-baseline`` stores the run as the new baseline; otherwise the run is
+compared against the baseline (if present) and the exit status is 1 when a
+scenario's throughput or p95 latency regresses by more than ``--tolerance``.
+
+No baseline is committed: the numbers only mean something on the machine
+that produced them. Record one on the machine that runs the comparison,
+from the commit to compare against, with the same scenario options:
+
+    python -m benchmarks.run --targets inprocess,uvicorn --save-baseline
+"""
+import argparse
+import asyncio
+import inspect
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(SERVICE_DIR, "benchmarks", "baseline.json")
+
+RESOLUTIONS = {
+    "480p": (640, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+ENDPOINTS = ("frame", "batch", "analyze-batch", "landmarks")
+
+
+# --------------------- WORKLOADS ------------------
+def synthetic_image(width, height, seed=0):
+    """
+    JPEG of a rough standing figure on a noisy gradient. Noise keeps the
+    compressed size and decode cost close to a real photo, and a different
+    seed gives different bytes.
+    """
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(60, 190, width, dtype=np.float32)
+    img = np.repeat(gradient[np.newaxis, :, np.newaxis], height, axis=0).repeat(3, axis=2)
+    img += rng.normal(0, 12, img.shape).astype(np.float32)
+    img = np.clip(img, 0, 255).astype(np.uint8)
+
+    cx, unit = width // 2, height // 10
+    color = (40, 60, 90)
+    cv2.circle(img, (cx, 2 * unit), unit // 2, color, -1)
+    cv2.rectangle(img, (cx - unit // 2, 2 * unit + unit // 2), (cx + unit // 2, 6 * unit), color, -1)
+    for side in (-1, 1):
+        cv2.line(img, (cx, 3 * unit), (cx + side * 2 * unit, 5 * unit), color, max(2, unit // 4))
+        cv2.line(img, (cx + side * unit // 4, 6 * unit), (cx + side * unit, 9 * unit), color, max(2, unit // 3))
+
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return buf.tobytes()
+
+
+def synthetic_landmarks(frames, seed=0):
+    """Raw little-endian float32 ``(frames, 33, 4)`` payload for /workouts/landmarks."""
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0.2, 0.8, (frames, 33, 4)).astype("<f4")
+    points[..., 3] = 1.0
+    return points.tobytes()
+
+
+def build_requests(endpoint, resolution, batch_size, landmark_frames, variants=8):
+    """Return ``(label, images_per_request, make_request)`` for one scenario."""
+    if endpoint == "landmarks":
+        payloads = [synthetic_landmarks(landmark_frames, seed) for seed in range(variants)]
+
+        def make_request(client, i):
+            return client.post(
+                "/workouts/landmarks", content=payloads[i % variants],
+                headers={"content-type": "application/octet-stream"}
+            )
+        return f"{landmark_frames}f", landmark_frames, make_request
+
+    width, height = RESOLUTIONS[resolution]
+    images = [synthetic_image(width, height, seed) for seed in range(variants)]
+
+    if endpoint == "frame":
+        def make_request(client, i):
+            return client.post("/workouts/frame", files={"file": (f"{i}.jpg", images[i % variants], "image/jpeg")})
+        return resolution, 1, make_request
+
+    def batch_files(i):
+        return [
+            ("files", (f"{i}_{j}.jpg", images[(i + j) % variants], "image/jpeg"))
+            for j in range(batch_size)
+        ]
+
+    if endpoint == "batch":
+        def make_request(client, i):
+            return client.post("/workouts/batch", files=batch_files(i))
+    else:
+        def make_request(client, i):
+            return client.post("/analyze-batch", files=batch_files(i), data={"exercise_type": "squat"})
+    return resolution, batch_size, make_request
+
+
+# --------------------- MEASUREMENT ----------------
+def parse_server_timing(header):
+    stages = {}
+    for metric in filter(None, (part.strip() for part in (header or "").split(","))):
+        name, _, params = metric.partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                stages[name] = float(value)
+    return stages
+
+
+def rss_mb(pid=None):
+    """Current resident set size of ``pid`` (default: this process) via /proc; None elsewhere."""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class RssSampler:
+    """
+    Peak RSS of ``pid`` while the ``with`` block runs, sampled every
+    ``interval`` seconds on a background thread. Unlike ru_maxrss or
+    VmHWM it covers only this scenario, not the process lifetime.
+    """
+
+    def __init__(self, pid=None, interval=0.02):
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _sample(self):
+        rss = rss_mb(self.pid)
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    @property
+    def peak_mb(self):
+        return round(self.peak, 1) if self.peak is not None else None
+
+
+async def drive(client, make_request, total, concurrency):
+    """
+    Send ``total`` requests from ``concurrency`` workers; collect latency and
+    stages of the successful ones. Failed or non-200 requests only count as
+    errors, so fast rejections (e.g. 503 Overloaded) cannot flatter the
+    percentiles.
+    """
+    counter = itertools.count()
+    latencies = []
+    stage_totals = defaultdict(float)
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while (i := next(counter)) < total:
+            started = time.perf_counter()
+            try:
+                response = await make_request(client, i)
+            except Exception:
+                errors += 1
+                continue
+            if response.status_code != 200:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            for stage, ms in parse_server_timing(response.headers.get("server-timing")).items():
+                stage_totals[stage] += ms
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, stage_totals, errors, time.perf_counter() - started
+
+
+def summarize(latencies, stage_totals, errors, elapsed, total, images_per_request):
+    ok = max(1, total - errors)
+    ms = np.asarray(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round((total - errors) / elapsed, 3),
+        "images_per_s": round((total - errors) * images_per_request / elapsed, 3),
+        "latency_ms": {
+            "mean": round(float(ms.mean()), 2),
+            "p50": round(float(np.percentile(ms, 50)), 2),
+            "p95": round(float(np.percentile(ms, 95)), 2),
+            "p99": round(float(np.percentile(ms, 99)), 2),
+        },
+        "stages_ms": {stage: round(total_ms / ok, 3) for stage, total_ms in sorted(stage_totals.items())},
+    }
+
+
+# --------------------- TARGETS --------------------
+async def _call_hooks(hooks):
+    for hook in hooks:
+        result = hook()
+        if inspect.isawaitable(result):
+            await result
+
+
+async def run_inprocess(scenarios, args):
+    import httpx
+    from app.main import app
+
+    await _call_hooks(app.router.on_startup)
+    results = []
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            for scenario in scenarios:
+                results.append(await run_scenario(client, scenario, args, "inprocess", None))
+    finally:
+        await _call_hooks(app.router.on_shutdown)
+    return results
+
+
+async def run_uvicorn(scenarios, args):
+    import httpx
+
+    env = dict(os.environ, PYTHONPATH=SERVICE_DIR)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=SERVICE_DIR, env=env
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = []
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+            deadline = time.monotonic() + 120
+            while True:
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("uvicorn did not come up")
+                await asyncio.sleep(0.25)
+
+            for scenario in scenarios:
+                results.append(await run_scenario(client, scenario, args, "uvicorn", server.pid))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return results
+
+
+async def run_scenario(client, scenario, args, target, pid):
+    endpoint, resolution, concurrency = scenario
+    label, images_per_request, make_request = build_requests(
+        endpoint, resolution, args.batch_size, args.landmark_frames
+    )
+    name = f"{target}:{endpoint}:{label}:c{concurrency}"
+
+    # Warm pools, executors and allocator before measuring
+    await drive(client, make_request, max(1, concurrency), concurrency)
+    with RssSampler(pid) as rss:
+        latencies, stages, errors, elapsed = await drive(client, make_request, args.requests, concurrency)
+
+    result = {
+        "name": name,
+        "target": target,
+        "endpoint": endpoint,
+        "workload": label,
+        "concurrency": concurrency,
+        **summarize(latencies, stages, errors, elapsed, args.requests, images_per_request),
+        "peak_rss_mb": rss.peak_mb,
+    }
+    print(
+        f"{name:<44} {result['throughput_rps']:>9.2f} req/s  "
+        f"p50 {result['latency_ms']['p50']:>9.2f} ms  p95 {result['latency_ms']['p95']:>9.2f} ms  "
+        f"errors {errors}", flush=True
+    )
+    return result
+
+
+# --------------------- BASELINE -------------------
+def compare(results, baseline, tolerance):
+    """
+    Compare scenarios by name. Returns ``(rows, regressions)``; a regression is
+    throughput below, or p95 latency above, the baseline by more than ``tolerance``.
+    """
+    previous = {scenario["name"]: scenario for scenario in baseline.get("scenarios", [])}
+    rows, regressions = [], []
+    for scenario in results:
+        base = previous.get(scenario["name"])
+        if base is None:
+            continue
+        throughput = scenario["throughput_rps"] / base["throughput_rps"] - 1 if base["throughput_rps"] else 0.0
+        p95 = scenario["latency_ms"]["p95"] / base["latency_ms"]["p95"] - 1 if base["latency_ms"]["p95"] else 0.0
+        row = {"name": scenario["name"], "throughput_change": round(throughput, 4), "p95_change": round(p95, 4)}
+        rows.append(row)
+        if throughput < -tolerance or p95 > tolerance:
+            regressions.append(row)
+    return rows, regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", default="inprocess", help="inprocess,uvicorn")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--resolutions", default="480p,1080p", help=",".join(RESOLUTIONS))
+    parser.add_argument("--concurrency", default="1,4")
+    parser.add_argument("--requests", type=int, default=20, help="measured requests per scenario")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--landmark-frames", type=int, default=300)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", default=None, help="write results JSON here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, SERVICE_DIR)
+    # Every request must pay for decode + inference, so keep the landmark
+    # cache out of the measurements (before app.main is imported)
+    os.environ.setdefault("POSE_CACHE_MAX_MB", "0")
+
+    endpoints = [e for e in args.endpoints.split(",") if e]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        raise SystemExit(f"Unknown endpoints: {sorted(unknown)}")
+    resolutions = [r for r in args.resolutions.split(",") if r]
+    concurrency = [int(c) for c in args.concurrency.split(",") if c]
+
+    scenarios = []
+    for endpoint in endpoints:
+        # Landmark payloads have no resolution
+        for resolution in (["-"] if endpoint == "landmarks" else resolutions):
+            for c in concurrency:
+                scenarios.append((endpoint, resolution, c))
+
+    results = []
+    for target in args.targets.split(","):
+        runner = {"inprocess": run_inprocess, "uvicorn": run_uvicorn}[target]
+        results += asyncio.run(runner(scenarios, args))
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "scenarios": results,
+    }
+
+    status = 0
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            rows, regressions = compare(results, json.load(f), args.tolerance)
+        report["comparison"] = {"baseline": args.baseline, "rows": rows, "regressions": regressions}
+        for row in rows:
+            flag = "REGRESSION" if row in regressions else ""
+            print(f"{row['name']:<44} throughput {row['throughput_change']:+.1%}  p95 {row['p95_change']:+.1%}  {flag}")
+        status = 1 if regressions else 0
+    elif not args.save_baseline:
+        print(f"No baseline at {args.baseline}; record one with --save-baseline", flush=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import asyncio
+import threading
+
+import pytest
+from starlette.testclient import TestClient
+from unittest.mock import patch
+
+from app import main
+from app.admission import InferenceGate, Overloaded
+
+
+client = TestClient(main.app)
+
+
+def test_gate_rejects_when_queue_is_full():
+    gate = InferenceGate(max_in_flight=1, max_queue=0)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(gate.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(Overloaded) as exc:
+            await gate.run(lambda: None)
+
+        release.set()
+        await running
+        return exc.value
+
+    rejected = asyncio.run(scenario())
+
+    assert rejected.retry_after >= 1
+    assert gate.stats()["rejected"] == 1
+    assert gate.stats()["admitted"] == 0
+    gate.shutdown()
+
+
+def test_overloaded_returns_503_with_retry_after():
+    with patch.object(main.inference_gate, "run", side_effect=Overloaded(3)):
+        response = client.post(
+            "/workouts/frame",
+            files={"file": ("test.jpg", b"\xff\xd8\xff", "image/jpeg")}
+        )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
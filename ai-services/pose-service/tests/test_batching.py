@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+from app.batching import MicroBatcher
+
+
+def test_concurrent_submits_are_coalesced():
+    batch_sizes = []
+
+    async def dispatch(items):
+        batch_sizes.append(len(items))
+        return [item * 10 for item in items]
+
+    batcher = MicroBatcher(dispatch, max_batch_size=4, max_wait_ms=20)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    results = asyncio.run(scenario())
+
+    assert results == [0, 10, 20, 30, 40]
+    assert batch_sizes == [4, 1]
+    assert batcher.stats()["batches"] == 2
+
+
+def test_dispatch_errors_reach_every_waiter():
+    async def dispatch(items):
+        raise RuntimeError("inference failed")
+
+    batcher = MicroBatcher(dispatch, max_batch_size=2, max_wait_ms=5)
+
+    async def scenario():
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_item_errors_reach_only_their_waiter():
+    async def dispatch(items):
+        return [ValueError("bad frame") if item == 2 else item for item in items]
+
+    batcher = MicroBatcher(dispatch, max_batch_size=3, max_wait_ms=20)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert results[:2] == [0, 1]
+    assert isinstance(results[2], ValueError)
+
+
+def test_frame_batches_spread_over_the_inference_threads(monkeypatch):
+    from app import main
+    from app.admission import InferenceGate
+
+    # Both frames must be in analysis at once for either to finish
+    barrier = threading.Barrier(2, timeout=5)
+
+    def analyze_image(data, file_name, pool, **kwargs):
+        barrier.wait()
+        return {"file_name": file_name}
+
+    monkeypatch.setattr(main, "inference_gate", InferenceGate(max_in_flight=2))
+    monkeypatch.setattr(main, "analyze_image", analyze_image)
+
+    items = [("a.jpg", b"a", None, None), ("b.jpg", b"b", None, None)]
+    results = asyncio.run(main._dispatch_frames(items))
+
+    assert results == [{"file_name": "a.jpg"}, {"file_name": "b.jpg"}]
+
+
+def test_frame_batch_admits_each_frame(monkeypatch):
+    from app import main
+    from app.admission import InferenceGate, Overloaded
+
+    # Room for one frame: the second frame of the batch is rejected on its own
+    gate = InferenceGate(max_in_flight=1, max_queue=0)
+    monkeypatch.setattr(main, "inference_gate", gate)
+    monkeypatch.setattr(main, "analyze_image", lambda data, file_name, pool, **kwargs: {"file_name": file_name})
+
+    results = asyncio.run(main._dispatch_frames([("a.jpg", b"a", None, None), ("b.jpg", b"b", None, None)]))
+
+    assert results[0] == {"file_name": "a.jpg"}
+    assert isinstance(results[1], Overloaded)
+    assert gate.stats()["rejected"] == 1
+    assert gate.stats()["admitted"] == 0
+
+
+def test_cancelled_items_cancel_their_waiter():
+    async def dispatch(items):
+        return [asyncio.CancelledError() if item == 1 else item for item in items]
+
+    batcher = MicroBatcher(dispatch, max_batch_size=2, max_wait_ms=20)
+
+    async def scenario():
+        return await asyncio.gather(batcher.submit(0), batcher.submit(1), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert results[0] == 0
+    assert isinstance(results[1], asyncio.CancelledError)
@@ -0,0 +1,70 @@
+import asyncio
+import sys
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from benchmarks.run import RssSampler, compare, drive, parse_server_timing, synthetic_image, synthetic_landmarks
+
+
+def scenario(name, rps, p95):
+    return {"name": name, "throughput_rps": rps, "latency_ms": {"p95": p95}}
+
+
+def test_synthetic_workloads_have_requested_shape():
+    img = cv2.imdecode(np.frombuffer(synthetic_image(640, 480), np.uint8), cv2.IMREAD_COLOR)
+    assert img.shape == (480, 640, 3)
+    assert synthetic_image(64, 48, seed=1) != synthetic_image(64, 48, seed=2)
+    assert len(synthetic_landmarks(10)) == 10 * 33 * 4 * 4
+
+
+def test_server_timing_is_parsed():
+    assert parse_server_timing("imdecode;dur=2.50, pose_process;dur=14.1, total;dur=17") == {
+        "imdecode": 2.5, "pose_process": 14.1, "total": 17.0
+    }
+    assert parse_server_timing(None) == {}
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {"scenarios": [scenario("a", 100, 10), scenario("b", 100, 10), scenario("c", 100, 10)]}
+    results = [scenario("a", 95, 10.5), scenario("b", 70, 10), scenario("c", 100, 14), scenario("new", 1, 1)]
+
+    rows, regressions = compare(results, baseline, tolerance=0.1)
+
+    assert [row["name"] for row in rows] == ["a", "b", "c"]
+    assert [row["name"] for row in regressions] == ["b", "c"]
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {"server-timing": "total;dur=4"}
+
+
+def test_only_successful_requests_enter_latency_percentiles():
+    async def make_request(client, i):
+        if i % 2:
+            return FakeResponse(503)
+        await asyncio.sleep(0.01)
+        return FakeResponse(200)
+
+    latencies, stages, errors, _ = asyncio.run(drive(None, make_request, total=6, concurrency=2))
+
+    assert errors == 3
+    assert len(latencies) == 3
+    assert min(latencies) >= 0.01
+    assert stages == {"total": 12.0}
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="RSS is sampled from /proc")
+def test_rss_sampler_reports_the_scenario_peak():
+    with RssSampler(interval=0.005) as rss:
+        block = np.ones(64 * 1024 * 1024, np.uint8)
+        time.sleep(0.05)
+        del block
+    with RssSampler() as idle:
+        pass
+
+    assert rss.peak_mb - idle.peak_mb > 32
@@ -0,0 +1,81 @@
+import cv2
+import numpy as np
+from unittest.mock import patch, MagicMock
+
+from app.analysis import analyze_image
+from app.cache import LandmarkCache, content_key
+from app.pool import PosePool
+
+
+def fake_landmarks():
+    class LM:
+        def __init__(self, x=0.5, y=0.5):
+            self.x = x
+            self.y = y
+    return [LM() for _ in range(33)]
+
+
+def points(value):
+    return np.full((33, 4), value, dtype=np.float32)
+
+
+def test_lru_evicts_by_byte_budget():
+    entry = points(0).nbytes + 128
+    cache = LandmarkCache(max_bytes=entry * 2, directory="")
+
+    cache.put("a", points(1))
+    cache.put("b", points(2))
+    cache.get("a")
+    cache.put("c", points(3))
+
+    assert cache.get("b") is None
+    assert cache.get("a")[0][0, 0] == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    LandmarkCache(directory=str(tmp_path)).put("k", points(7), 0.5)
+    LandmarkCache(directory=str(tmp_path)).put("unscaled", points(8))
+
+    restarted = LandmarkCache(directory=str(tmp_path))
+
+    stored, scale = restarted.get("k")
+    assert stored[0, 0] == 7 and scale == 0.5
+    assert restarted.get("unscaled")[1] is None
+    assert restarted.stats()["disk_hits"] == 2
+
+
+@patch("app.pool.mp_pose.Pose.process")
+def test_repeat_upload_skips_inference(mock_process):
+    mock_process.return_value.pose_landmarks = MagicMock(landmark=fake_landmarks())
+    ok, buf = cv2.imencode(".jpg", np.full((64, 64, 3), 90, np.uint8))
+    data = buf.tobytes()
+    cache = LandmarkCache(directory="")
+    pool = PosePool(size=1, warmup=False)
+
+    first = analyze_image(data, "a.jpg", pool, "squat", cache=cache)
+    calls = mock_process.call_count
+    second = analyze_image(data, "a.jpg", pool, "pushup", cache=cache)
+
+    assert mock_process.call_count == calls
+    assert first["exercise"] == "squat" and second["exercise"] == "pushup"
+    assert content_key(data, pool.model_complexity) in cache._entries
+    assert second["decode_scale"] == first["decode_scale"] == 1.0
+    pool.close()
+
+
+@patch("app.pool.mp_pose.Pose.process")
+def test_no_person_results_report_decode_scale(mock_process):
+    mock_process.return_value.pose_landmarks = None
+    ok, buf = cv2.imencode(".jpg", np.full((64, 64, 3), 90, np.uint8))
+    cache = LandmarkCache(directory="")
+    pool = PosePool(size=1, warmup=False)
+
+    first = analyze_image(buf.tobytes(), "a.jpg", pool, cache=cache)
+    cached = analyze_image(buf.tobytes(), "a.jpg", pool, cache=cache)
+    invalid = analyze_image(b"not an image", "b.jpg", pool, cache=cache)
+
+    assert first["feedback"] == cached["feedback"] == "No person detected"
+    assert first["decode_scale"] == cached["decode_scale"] == 1.0
+    assert invalid["decode_scale"] is None
+    pool.close()
@@ -0,0 +1,53 @@
+import numpy as np
+
+from app.analysis import calculate_angle, classify_exercise, extract_landmarks
+from app.geometry import JOINTS, JOINT_NAMES, joint_angles, landmarks_to_array
+from app.rules import bilateral_asymmetry
+
+
+class FakeLM:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def random_points(n=None, seed=0):
+    rng = np.random.default_rng(seed)
+    shape = (33, 4) if n is None else (n, 33, 4)
+    return rng.random(shape, dtype=np.float32)
+
+
+def test_landmark_objects_convert_to_float32_array():
+    points = landmarks_to_array([FakeLM(0.1 * i, 0.2) for i in range(33)])
+
+    assert points.shape == (33, 4)
+    assert points.dtype == np.float32
+    assert points[3, 0] == np.float32(0.3)
+    assert points[0, 3] == 1.0
+
+
+def test_vectorised_angles_match_scalar_angle():
+    points = random_points()
+    angles = joint_angles(points)
+
+    for column, name in enumerate(JOINT_NAMES):
+        a, b, c = (points[i, :2].tolist() for i in JOINTS[name])
+        assert abs(angles[column] - calculate_angle(a, b, c)) < 1e-6
+
+
+def test_stacked_frames_give_one_row_per_frame():
+    stack = random_points(n=5)
+    angles = joint_angles(stack)
+
+    assert angles.shape == (5, len(JOINT_NAMES))
+    assert np.allclose(angles[2], joint_angles(stack[2]))
+    assert bilateral_asymmetry(angles, "squat").shape == (5,)
+
+
+def test_rules_accept_arrays_and_landmark_objects():
+    points = random_points(seed=3)
+    objects = [FakeLM(float(x), float(y)) for x, y, _, _ in points]
+
+    assert classify_exercise(points) == classify_exercise(objects)
+    assert extract_landmarks(points, "pushup") == extract_landmarks(objects, "pushup")
+    assert extract_landmarks(points, "yoga") == (None, None, None)
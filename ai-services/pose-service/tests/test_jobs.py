@@ -0,0 +1,247 @@
+import io
+import os
+import threading
+import time
+import zipfile
+from unittest.mock import patch
+
+import pytest
+from starlette.testclient import TestClient
+
+from app import main
+from app import jobs
+from app.jobs import COMPLETED, JobRunner, JobStore
+from app.main import app
+
+
+client = TestClient(app)
+
+
+def fake_analyze(data, file_name, exercise_type):
+    return {"file_name": file_name, "exercise": exercise_type or "squat", "score": len(data)}
+
+
+def summarize(results):
+    return {"processed_images": sum(1 for _ in results)}
+
+
+def zip_bytes(names):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as archive:
+        for name in names:
+            archive.writestr(f"frames/{name}", name.encode())
+        archive.writestr("notes.txt", b"ignored")
+    return buf.getvalue()
+
+
+def test_archive_members_become_items(tmp_path):
+    store = JobStore(str(tmp_path))
+    meta = store.create([
+        ("a.jpg", io.BytesIO(b"one")),
+        ("set.zip", io.BytesIO(zip_bytes(["b.jpg", "c.png"]))),
+    ])
+
+    assert meta["total_items"] == 3
+    JobRunner(store, fake_analyze, summarize).run_job(meta["job_id"])
+
+    job = store.get(meta["job_id"])
+    results = store.results(meta["job_id"])
+    assert job["status"] == COMPLETED
+    assert job["summary"] == {"processed_images": 3}
+    assert [r["file_name"] for r in results] == ["a.jpg", "b.jpg", "c.png"]
+    assert [r["item"] for r in results] == [0, 1, 2]
+    assert store.pending_inputs(meta["job_id"]) == []
+
+
+def test_restart_resumes_without_reprocessing(tmp_path):
+    store = JobStore(str(tmp_path))
+    meta = store.create([(f"{i}.jpg", io.BytesIO(b"x")) for i in range(4)])
+    calls = []
+
+    class WorkerDied(BaseException):
+        """Stands in for the process dying; item errors are Exceptions and are recorded instead."""
+
+    def crashing(data, file_name, exercise_type):
+        if len(calls) == 2:
+            raise WorkerDied()
+        calls.append(file_name)
+        return fake_analyze(data, file_name, exercise_type)
+
+    try:
+        JobRunner(store, crashing, summarize).run_job(meta["job_id"])
+    except WorkerDied:
+        pass
+
+    def counting(data, file_name, exercise_type):
+        calls.append(file_name)
+        return fake_analyze(data, file_name, exercise_type)
+
+    runner = JobRunner(store, counting, summarize)
+    runner.start()
+    for _ in range(100):
+        if store.get(meta["job_id"])["status"] == COMPLETED:
+            break
+        time.sleep(0.02)
+
+    assert calls == ["0.jpg", "1.jpg", "2.jpg", "3.jpg"]
+    assert store.get(meta["job_id"])["processed_items"] == 4
+
+
+def test_failed_items_are_recorded_and_the_job_goes_on(tmp_path):
+    store = JobStore(str(tmp_path))
+    meta = store.create([(f"{i}.jpg", io.BytesIO(b"x")) for i in range(3)])
+
+    def analyze(data, file_name, exercise_type):
+        if file_name == "1.jpg":
+            raise ValueError("corrupt image")
+        return fake_analyze(data, file_name, exercise_type)
+
+    JobRunner(store, analyze, summarize).run_job(meta["job_id"])
+
+    job = store.get(meta["job_id"])
+    results = store.results(meta["job_id"])
+    assert job["status"] == COMPLETED
+    assert job["failed_items"] == 1
+    assert job["summary"] == {"processed_images": 2}
+    assert results[1] == {"item": 1, "file_name": "1.jpg", "error": "corrupt image"}
+    assert not (tmp_path / meta["job_id"] / "inputs").exists()
+
+
+def test_worker_survives_a_job_whose_meta_is_gone(tmp_path):
+    store = JobStore(str(tmp_path))
+    broken = store.create([("a.jpg", io.BytesIO(b"x"))])
+    os.remove(tmp_path / broken["job_id"] / "meta.json")
+    meta = store.create([("b.jpg", io.BytesIO(b"x"))])
+
+    runner = JobRunner(store, fake_analyze, summarize)
+    runner.submit(broken["job_id"])
+    runner.submit(meta["job_id"])
+    for _ in range(100):
+        if store.get(meta["job_id"])["status"] == COMPLETED:
+            break
+        time.sleep(0.02)
+
+    assert store.get(meta["job_id"])["status"] == COMPLETED
+    assert not (tmp_path / broken["job_id"] / "inputs").exists()
+
+
+def test_old_finished_jobs_expire(tmp_path):
+    store = JobStore(str(tmp_path), retention=60)
+    done = store.create([("a.jpg", io.BytesIO(b"x"))])
+    JobRunner(store, fake_analyze, summarize).run_job(done["job_id"])
+    queued = store.create([("b.jpg", io.BytesIO(b"x"))])
+
+    assert store.expire(now=time.time() + 30) == []
+    assert store.expire(now=time.time() + 120) == [done["job_id"]]
+    assert store.get(done["job_id"]) is None
+    assert store.get(queued["job_id"])["status"] == "queued"
+
+
+def test_corrupt_archive_is_rejected(tmp_path):
+    store = JobStore(str(tmp_path))
+    with patch.object(main, "job_store", store):
+        response = client.post("/jobs", files=[("files", ("broken.zip", b"not a zip", "application/zip"))])
+    assert response.status_code == 400
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_oversized_archives_are_rejected(tmp_path):
+    store = JobStore(str(tmp_path))
+    names = [f"{i}.jpg" for i in range(5)]
+
+    with patch.object(jobs, "MAX_ARCHIVE_MEMBERS", 4), pytest.raises(ValueError, match="entries"):
+        store.create([("many.zip", io.BytesIO(zip_bytes(names)))])
+
+    with patch.object(jobs, "MAX_ARCHIVE_BYTES", 8), pytest.raises(ValueError, match="MB"):
+        store.create([("big.zip", io.BytesIO(zip_bytes(names)))])
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.skipif("POSE_JOBS_DIR" in os.environ, reason="jobs directory set explicitly")
+def test_jobs_dir_does_not_depend_on_the_working_directory():
+    service_root = os.path.dirname(os.path.dirname(os.path.abspath(jobs.__file__)))
+    assert jobs.JOBS_DIR == os.path.join(service_root, "pose_jobs")
+
+
+def test_job_items_run_on_the_inference_threads(monkeypatch):
+    threads = []
+
+    def analyze(data, file_name, pool, exercise_type, cache=None):
+        threads.append(threading.current_thread().name)
+        return {"file_name": file_name}
+
+    monkeypatch.setattr(main, "analyze_image", analyze)
+    assert main._analyze_job_item(b"x", "a.jpg", None) == {"file_name": "a.jpg"}
+    assert threads[0].startswith("pose-infer")
+
+
+def test_submit_and_poll(tmp_path):
+    store = JobStore(str(tmp_path))
+    runner = JobRunner(store, fake_analyze, summarize)
+
+    with patch.object(main, "job_store", store), patch.object(main, "job_runner", runner):
+        response = client.post(
+            "/jobs",
+            files=[("files", ("set.zip", zip_bytes(["a.jpg", "b.jpg", "c.jpg"]), "application/zip"))],
+            data={"exercise_type": "pushup"}
+        )
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        for _ in range(100):
+            status = client.get(f"/jobs/{job_id}").json()
+            if status["status"] == COMPLETED:
+                break
+            time.sleep(0.02)
+        assert status["processed_items"] == 3
+
+        page = client.get(f"/jobs/{job_id}/results", params={"offset": 1, "limit": 1}).json()
+        assert [r["file_name"] for r in page["results"]] == ["b.jpg"]
+        assert page["results"][0]["exercise"] == "pushup"
+
+        assert client.get("/jobs/0123456789abcdef0123456789abcdef").status_code == 404
+        assert client.get("/jobs/..").status_code == 404
+
+
+def test_result_pages_seek_from_the_index(tmp_path):
+    store = JobStore(str(tmp_path))
+    meta = store.create([(f"{i}.jpg", io.BytesIO(b"x")) for i in range(5)])
+    JobRunner(store, fake_analyze, summarize).run_job(meta["job_id"])
+
+    assert [r["item"] for r in store.results(meta["job_id"], 3, 10)] == [3, 4]
+    assert store.results(meta["job_id"], 5, 10) == []
+
+    # A lost index is rebuilt from results.jsonl, and pages still work without one
+    index = tmp_path / meta["job_id"] / "results.idx"
+    index.write_bytes(index.read_bytes()[:8])
+    assert store.result_count(meta["job_id"]) == 5
+    assert [r["item"] for r in store.results(meta["job_id"], 2, 1)] == [2]
+    index.unlink()
+    assert [r["item"] for r in store.results(meta["job_id"], 2, 1)] == [2]
+
+
+def test_job_summary_streams_results_from_disk(tmp_path):
+    store = JobStore(str(tmp_path))
+    meta = store.create([(f"{i}.jpg", io.BytesIO(b"x")) for i in range(3)])
+    results = [
+        {"file_name": "0.jpg", "exercise": "squat", "pose_detected": True, "angle": 170.0, "performance_score": 0.4},
+        {"file_name": "1.jpg", "exercise": "squat", "pose_detected": True, "angle": 80.0, "performance_score": 1.0},
+        {"file_name": "2.jpg", "exercise": "squat", "pose_detected": True, "angle": 170.0, "performance_score": 0.4},
+    ]
+    seen = []
+
+    def summarize_from_iterator(items):
+        assert not isinstance(items, list)
+        seen.append(True)
+        return main._summarize_job(items)
+
+    analyze = lambda data, file_name, exercise_type: dict(results[int(file_name[0])])
+    JobRunner(store, analyze, summarize_from_iterator).run_job(meta["job_id"])
+
+    summary = store.get(meta["job_id"])["summary"]
+    assert seen == [True]
+    assert summary["total_images"] == 3
+    assert summary["processed_images"] == 3
+    assert summary["most_common_exercise"] == "squat"
+    assert summary["reps"] == main.count_reps([dict(r) for r in results])
@@ -0,0 +1,105 @@
+import json
+
+import numpy as np
+import pytest
+
+from app import analysis
+from app.knn import KnnIndex, build_index, load_index, main, pose_features
+
+
+def poses(template, n, seed, noise=0.005, shift=0.0, scale=1.0):
+    """``n`` jittered copies of ``template`` moved and scaled in the frame."""
+    rng = np.random.default_rng(seed)
+    stack = np.repeat(template[np.newaxis], n, axis=0)
+    stack[..., :2] = stack[..., :2] * scale + shift + rng.normal(0, noise, (n, 33, 2))
+    return stack.astype(np.float32)
+
+
+TEMPLATES = {
+    "squat": np.random.default_rng(1).random((33, 4)),
+    "plank": np.random.default_rng(2).random((33, 4)),
+}
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    points = np.concatenate([poses(TEMPLATES["squat"], 50, 0), poses(TEMPLATES["plank"], 50, 1)])
+    build_index(points, ["squat"] * 50 + ["plank"] * 50, str(tmp_path))
+    return str(tmp_path)
+
+
+def test_features_ignore_position_and_scale():
+    template = TEMPLATES["squat"]
+    moved = poses(template, 1, 0, noise=0.0, shift=0.2, scale=0.5)
+
+    assert np.allclose(pose_features(template), pose_features(moved), atol=1e-5)
+
+
+def test_index_is_memory_mapped_and_classifies_batches(index_dir):
+    index = load_index(index_dir, k=5)
+    assert isinstance(index.features, np.memmap)
+
+    queries = np.concatenate([poses(TEMPLATES["plank"], 10, 7, shift=0.1), poses(TEMPLATES["squat"], 10, 8)])
+    exercises, confidences = index.classify_stack(queries)
+
+    assert exercises == ["plank"] * 10 + ["squat"] * 10
+    assert np.all(confidences == 1.0)
+    # Single-frame queries agree with the batch
+    assert index.classify_stack(queries[0])[0] == ["plank"]
+
+
+def test_distant_poses_are_rejected(index_dir):
+    index = load_index(index_dir, max_distance=0.5)
+    far = np.random.default_rng(9).random((3, 33, 4), dtype=np.float32)
+
+    exercises, _ = index.classify_stack(far)
+    assert exercises == [None, None, None]
+
+
+def test_stale_index_is_refused(index_dir):
+    meta_path = f"{index_dir}/meta.json"
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta["landmarks"] = meta["landmarks"][:-1]
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+
+    with pytest.raises(ValueError):
+        load_index(index_dir)
+
+
+def test_analysis_uses_index_and_falls_back_to_rules(index_dir, monkeypatch):
+    index = load_index(index_dir, max_distance=0.5)
+    monkeypatch.setattr(analysis, "KNN_INDEX", index)
+
+    squat = poses(TEMPLATES["squat"], 1, 3)[0]
+    far = np.random.default_rng(9).random((33, 4), dtype=np.float32)
+
+    assert analysis.classify_exercise(squat) == ("squat", 1.0)
+    assert analysis.classify_exercise(far) == analysis.RULES.classify(far, analysis.joint_angles(far))
+
+    results = analysis.score_landmark_stack(np.stack([squat, far]))
+    assert results[0]["exercise"] == "squat"
+    assert results[1]["exercise"] == analysis.classify_exercise(far)[0]
+
+
+def test_builder_cli_reads_landmark_files(tmp_path):
+    np.save(tmp_path / "squats.npy", poses(TEMPLATES["squat"], 4, 0))
+    (tmp_path / "planks.json").write_text(json.dumps({"landmarks": poses(TEMPLATES["plank"], 3, 1).tolist()}))
+    out = tmp_path / "index"
+
+    assert main([f"squat={tmp_path / 'squats.npy'}", f"plank={tmp_path / 'planks.json'}", "--out", str(out)]) == 0
+
+    index = load_index(str(out))
+    assert len(index) == 7
+    assert index.classes == ["plank", "squat"]
+
+
+def test_k_is_capped_by_index_size():
+    features = pose_features(poses(TEMPLATES["squat"], 2, 0))
+    index = KnnIndex(features, np.zeros(2, dtype=np.int16), ["squat"], k=5)
+
+    exercises, confidences = index.classify_stack(poses(TEMPLATES["squat"], 1, 1))
+    assert index.k == 2
+    assert exercises == ["squat"]
+    assert confidences.tolist() == [1.0]
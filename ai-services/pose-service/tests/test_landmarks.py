@@ -0,0 +1,69 @@
+import numpy as np
+from starlette.testclient import TestClient
+
+from app.main import app
+from app.payloads import parse_landmark_payload
+
+
+client = TestClient(app)
+
+
+def squat_frames(knee_angles):
+    """Landmark frames whose left knee bends to the given angles."""
+    frames = np.zeros((len(knee_angles), 33, 4), dtype=np.float32)
+    frames[..., 3] = 1.0
+    for i, deg in enumerate(knee_angles):
+        frames[i, :, :2] = 0.5
+        frames[i, 25, :2] = (0.5, 0.7)                 # knee
+        frames[i, 23, :2] = (0.5, 0.5)                 # hip, straight above
+        rad = np.radians(deg)
+        frames[i, 27, :2] = (0.5 + 0.2 * np.sin(rad), 0.7 - 0.2 * np.cos(rad))
+    return frames
+
+
+def test_payload_formats_agree():
+    frames = squat_frames([170, 100])
+
+    from_json = parse_landmark_payload(
+        '{"landmarks": %s}' % frames[..., :2].tolist(), "application/json"
+    )
+    from_f16 = parse_landmark_payload(frames.astype("<f2").tobytes(), "application/octet-stream", "float16")
+
+    assert from_json.shape == (2, 33, 4)
+    assert np.allclose(from_json, frames)
+    assert np.allclose(from_f16, frames, atol=1e-3)
+
+
+def test_binary_landmarks_are_scored_with_reps():
+    frames = squat_frames([170, 120, 100, 130, 170])
+
+    response = client.post(
+        "/workouts/landmarks?exercise_type=squat",
+        content=frames.tobytes(),
+        headers={"content-type": "application/octet-stream"}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_frames"] == 5
+    assert round(data["results"][2]["angle"]) == 100
+    assert data["results"][2]["feedback"] == "Good squat depth"
+    assert data["reps"]["squat"]["reps"] == 1
+
+
+def test_malformed_payload_is_rejected():
+    response = client.post(
+        "/workouts/landmarks",
+        content=b"\x00" * 10,
+        headers={"content-type": "application/octet-stream"}
+    )
+
+    assert response.status_code == 400
+
+
+def test_object_landmarks_are_rejected():
+    frame = [{"x": 0.5, "y": 0.5}] * 33
+
+    for payload in ({"landmarks": frame}, [[0.5, 0.5]] * 32 + [[0.5]]):
+        response = client.post("/workouts/landmarks", json=payload)
+        assert response.status_code == 400
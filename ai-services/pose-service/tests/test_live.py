@@ -0,0 +1,65 @@
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from unittest.mock import patch, MagicMock
+
+from app.live import LatestFrame
+from app.main import app
+
+
+client = TestClient(app)
+
+
+def fake_landmarks():
+    class LM:
+        def __init__(self, x=0.5, y=0.5):
+            self.x = x
+            self.y = y
+    return [LM() for _ in range(33)]
+
+
+def test_latest_frame_keeps_only_newest():
+    async def scenario():
+        slot = LatestFrame()
+        slot.put(b"1")
+        slot.put(b"2")
+        slot.put(b"3")
+        newest = await slot.get()
+        slot.close()
+        return slot, newest, await slot.get()
+
+    slot, newest, after_close = asyncio.run(scenario())
+
+    assert newest == b"3"
+    assert slot.dropped == 2
+    assert after_close is None
+
+
+@patch("app.live.mp_pose.Pose.process")
+def test_live_channel_returns_per_frame_results(mock_process):
+    mock_process.return_value.pose_landmarks = MagicMock(landmark=fake_landmarks())
+    ok, frame = cv2.imencode(".jpg", np.full((120, 160, 3), 127, np.uint8))
+
+    with client.websocket_connect("/workouts/live?exercise_type=squat") as ws:
+        ws.send_bytes(frame.tobytes())
+        result = ws.receive_json()
+
+    assert result["pose_detected"] is True
+    assert result["exercise"] == "squat"
+    assert "latency_ms" in result
+    assert result["rep_count"] == 0
+
+
+@patch("app.live.mp_pose.Pose.process")
+def test_text_messages_close_the_channel(mock_process):
+    with client.websocket_connect("/workouts/live") as ws:
+        ws.send_text("not a frame")
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+
+    assert closed.value.code == 1003
+    mock_process.assert_not_called()
@@ -0,0 +1,142 @@
+import io
+import struct
+from unittest.mock import MagicMock, patch
+
+import cv2
+import numpy as np
+import pytest
+from starlette.testclient import TestClient
+
+import app.memory as memory
+from app.main import app
+from app.memory import UploadTooLarge, check_upload, decoded_bytes
+from app.pipeline import DecodePipeline
+from app.timing import StageTimer
+
+
+client = TestClient(app)
+
+
+class LM:
+    def __init__(self, x=0.5, y=0.5):
+        self.x = x
+        self.y = y
+
+
+def png_header(width, height):
+    # Signature + IHDR is all image_dimensions needs
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", width, height) + b"\x00" * 64
+
+
+def jpeg(width, height, value=90):
+    ok, buf = cv2.imencode(".jpg", np.full((height, width, 3), value, np.uint8))
+    return buf.tobytes()
+
+
+def test_decoded_size_follows_dct_reduction_and_resize():
+    # 4000x3000 JPEG decodes at 1/4 (1000x750) and is resized to 640x480
+    assert decoded_bytes(("jpeg", 4000, 3000)) == 1000 * 750 * 3 + 640 * 480 * 3
+    assert decoded_bytes(("png", 320, 240)) == 320 * 240 * 3
+
+
+def test_oversized_uploads_are_rejected_from_headers(monkeypatch):
+    with pytest.raises(UploadTooLarge, match="pixels"):
+        check_upload("huge.png", io.BytesIO(png_header(20000, 20000)))
+
+    monkeypatch.setattr(memory, "MAX_UPLOAD_BYTES", 1000)
+    with pytest.raises(UploadTooLarge, match="bytes"):
+        check_upload("big.jpg", io.BytesIO(jpeg(320, 240)))
+
+    monkeypatch.setattr(memory, "MAX_UPLOAD_BYTES", 1 << 20)
+    data = jpeg(320, 240)
+    with pytest.raises(UploadTooLarge, match="budget"):
+        check_upload("a.jpg", io.BytesIO(data), budget=1000)
+    assert check_upload("a.jpg", io.BytesIO(data)) == len(data) + 320 * 240 * 3
+
+
+def test_batch_endpoint_returns_413_before_decoding():
+    files = [
+        ("files", ("ok.jpg", jpeg(64, 64), "image/jpeg")),
+        ("files", ("huge.png", png_header(20000, 20000), "image/png")),
+    ]
+    with patch("app.main.analyze_image") as mock_analyze, patch("app.main.decode_pipeline") as mock_pipeline:
+        response = client.post("/workouts/batch", files=files)
+        streamed = client.post("/workouts/batch?stream=true", files=files)
+
+    assert response.status_code == 413
+    assert streamed.status_code == 413
+    assert "huge.png" in response.json()["detail"]
+    mock_analyze.assert_not_called()
+    assert not mock_pipeline.mock_calls
+    assert "pose_uploads_rejected_total" in client.get("/metrics").text
+
+
+def test_pipeline_stays_within_budget():
+    class Pool:
+        model_complexity = 1
+        active = 0
+
+        def checkout(self):
+            pose = MagicMock()
+            pose.process.return_value.pose_landmarks = MagicMock(landmark=[LM() for _ in range(33)])
+            cm = MagicMock()
+            cm.__enter__.return_value = pose
+            return cm
+
+    stats = memory.MemoryStats()
+    items = [(f"{i}.jpg", io.BytesIO(jpeg(64, 64, i)), StageTimer(), Pool()) for i in range(6)]
+
+    results = DecodePipeline(workers=2, depth=4, memory=stats).run(items, costs=[40] * 6, budget=100)
+
+    assert len(results) == 6
+    # Two 40-byte items fit the budget, a third would not
+    assert stats.request_peak == 80
+    assert all("read" in timer.stages for _, _, timer, _ in items)
+
+
+@patch("app.main.mp_pose.Pose.process")
+def test_metrics_report_peak_memory(mock_process):
+    mock_process.return_value.pose_landmarks = MagicMock(landmark=[LM() for _ in range(33)])
+    files = [("files", (f"{i}.jpg", jpeg(64, 64, 10 + i), "image/jpeg")) for i in range(3)]
+    assert client.post("/workouts/batch", files=files).status_code == 200
+
+    text = client.get("/metrics").text
+    peak = next(line for line in text.splitlines() if line.startswith("pose_process_peak_rss_bytes "))
+    assert int(peak.split()[1]) > 0
+    request_peak = next(line for line in text.splitlines() if line.startswith("pose_request_memory_peak_bytes "))
+    assert int(request_peak.split()[1]) > 64 * 64 * 3
+
+
+def test_landmarks_body_is_capped(monkeypatch):
+    monkeypatch.setattr("app.main.MAX_UPLOAD_BYTES", 1000)
+    body = np.zeros((10, 33, 4), np.float32).tobytes()
+
+    response = client.post("/workouts/landmarks", content=body, headers={"content-type": "application/octet-stream"})
+
+    assert response.status_code == 413
+
+    # Chunked, without a Content-Length to reject up front
+    chunks = (body[i:i + 512] for i in range(0, len(body), 512))
+    response = client.post("/workouts/landmarks", content=chunks, headers={"content-type": "application/octet-stream"})
+
+    assert response.status_code == 413
+
+
+def test_oversized_job_items_become_error_lines(tmp_path):
+    from app import main
+    from app.jobs import COMPLETED, JobRunner, JobStore
+
+    store = JobStore(str(tmp_path))
+    meta = store.create([("ok.jpg", io.BytesIO(jpeg(64, 64))), ("huge.png", io.BytesIO(png_header(20000, 20000)))])
+    analyzed = []
+
+    def analyze(data, file_name, exercise_type):
+        analyzed.append(file_name)
+        return {"file_name": file_name}
+
+    JobRunner(store, analyze, lambda results: {}, check=main._check_job_item).run_job(meta["job_id"])
+
+    results = store.results(meta["job_id"])
+    assert analyzed == ["ok.jpg"]
+    assert store.get(meta["job_id"])["status"] == COMPLETED
+    assert "pixels" in results[1]["error"]
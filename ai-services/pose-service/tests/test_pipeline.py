@@ -0,0 +1,134 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from unittest.mock import MagicMock
+
+import cv2
+import numpy as np
+
+from app.analysis import analyze_image
+from app.pipeline import DecodePipeline
+from app.timing import StageTimer
+
+
+class LM:
+    def __init__(self, x=0.5, y=0.5):
+        self.x = x
+        self.y = y
+
+
+class RecordingPool:
+    """Pose pool stand-in that checks how far decoding ran ahead of inference."""
+
+    model_complexity = 1
+
+    def __init__(self, decoded):
+        self.decoded = decoded
+        self.inferred = 0
+        self.max_ahead = 0
+
+    @contextmanager
+    def checkout(self):
+        pose = MagicMock()
+
+        def process(img):
+            self.inferred += 1
+            self.max_ahead = max(self.max_ahead, len(self.decoded) - self.inferred)
+            return MagicMock(pose_landmarks=MagicMock(landmark=[LM(0.4, float(img[0, 0, 0]) / 255) for _ in range(33)]))
+
+        pose.process = process
+        yield pose
+
+
+def images(count):
+    items = []
+    for i in range(count):
+        ok, buf = cv2.imencode(".png", np.full((32, 32, 3), 10 * i, np.uint8))
+        items.append((f"img{i}.png", buf.tobytes()))
+    return items
+
+
+def recording_decodes(monkeypatch):
+    import app.pipeline as pipeline
+
+    decoded = []
+    lock = threading.Lock()
+    real = pipeline.decode_upload
+
+    def decode(*args):
+        result = real(*args)
+        with lock:
+            decoded.append(result)
+        return result
+
+    monkeypatch.setattr(pipeline, "decode_upload", decode)
+    return decoded
+
+
+def test_pipeline_matches_sequential_analysis_in_order(monkeypatch):
+    decoded = recording_decodes(monkeypatch)
+    pool = RecordingPool(decoded)
+    uploads = images(12)
+
+    results = DecodePipeline(workers=2, depth=3).run(
+        [(name, data, StageTimer(), pool) for name, data in uploads], "squat"
+    )
+    expected = [analyze_image(data, name, RecordingPool([]), "squat") for name, data in uploads]
+
+    assert results == expected
+    assert [r["file_name"] for r in results] == [name for name, _ in uploads]
+    # Never more than ``depth`` images decoded but not yet inferred
+    assert pool.max_ahead <= 3
+
+
+def test_pipeline_reports_stage_times_and_bad_uploads(monkeypatch):
+    pool = RecordingPool(recording_decodes(monkeypatch))
+    timers = [StageTimer(), StageTimer()]
+
+    results = DecodePipeline(workers=1, depth=2).run(
+        [("bad.jpg", b"not an image", timers[0], pool), ("ok.png", images(1)[0][1], timers[1], pool)]
+    )
+
+    assert results[0]["feedback"] == "Invalid image"
+    assert results[1]["pose_detected"] is True
+    assert {"pipeline_wait", "imdecode", "pose_process"} <= set(timers[1].stages)
+
+
+def test_stream_yields_in_order(monkeypatch):
+    pool = RecordingPool(recording_decodes(monkeypatch))
+    uploads = images(5)
+    timers = []
+
+    async def read():
+        for name, data in uploads:
+            timers.append(StageTimer())
+            yield name, data
+
+    async def execute(fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    async def collect():
+        return [r async for r in DecodePipeline(workers=2, depth=2).stream(read(), pool, execute, timers=timers)]
+
+    results = asyncio.run(collect())
+    assert [r["file_name"] for r in results] == [name for name, _ in uploads]
+    assert all("pose_process" in timer.stages for timer in timers)
+
+
+def test_concurrent_first_runs_share_one_decoder():
+    pipeline = DecodePipeline(workers=1, depth=1)
+    barrier = threading.Barrier(8)
+    executors = []
+
+    def first_run():
+        barrier.wait()
+        executors.append(pipeline._decoder())
+
+    threads = [threading.Thread(target=first_run) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pipeline.shutdown()
+
+    assert len(set(map(id, executors))) == 1
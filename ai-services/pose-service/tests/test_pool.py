@@ -0,0 +1,114 @@
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.pool import PosePool, TierUnavailable
+
+
+@patch("app.pool.mp_pose.Pose.process")
+def test_pool_reuses_instances(mock_process):
+    pool = PosePool(size=1)
+
+    with pool.checkout() as first:
+        pass
+    with pool.checkout() as second:
+        pass
+
+    assert first is second
+    assert pool.stats()["checkouts"] == 2
+    assert pool.stats()["replaced"] == 0
+    pool.close()
+
+
+@patch("app.pool.mp_pose.Pose.process")
+def test_pool_replaces_failed_instance(mock_process):
+    pool = PosePool(size=1, warmup=False)
+    mock_process.side_effect = RuntimeError("graph crashed")
+
+    with pytest.raises(RuntimeError):
+        with pool.checkout() as pose:
+            pose.process(None)
+
+    with pool.checkout() as pose:
+        assert pose.healthy
+
+    stats = pool.stats()
+    assert stats["replaced"] == 1
+    assert stats["idle"] == 1
+    pool.close()
+
+
+@patch("app.pool.mp_pose.Pose.process")
+def test_failed_replacement_keeps_the_slot(mock_process):
+    pool = PosePool(size=1, warmup=False).start()
+    mock_process.side_effect = RuntimeError("graph crashed")
+
+    with patch("app.pool.create_pose", side_effect=TierUnavailable("model download blocked")):
+        with pytest.raises(RuntimeError):
+            with pool.checkout() as pose:
+                pose.process(None)
+        # The slot stays in the pool and reports why it is empty
+        assert pool.stats()["idle"] == 1
+        with pytest.raises(TierUnavailable):
+            with pool.checkout():
+                pass
+
+    mock_process.side_effect = None
+    with pool.checkout() as pose:
+        assert pose.healthy
+
+    stats = pool.stats()
+    assert stats["rebuild_failures"] == 2
+    assert "model download blocked" in stats["last_error"]
+    pool.close()
+
+
+
+@patch("app.pool.mp_pose.Pose.process")
+def test_instances_checked_out_during_close_are_closed_on_return(mock_process):
+    pool = PosePool(size=1, warmup=False).start()
+
+    with pool.checkout() as busy:
+        busy.close = MagicMock()
+        pool.close()
+        busy.close.assert_not_called()
+    busy.close.assert_called_once()
+    assert pool.stats()["idle"] == 0
+
+    # Restarted while an old instance is still out: the pool keeps its size
+    with pool.checkout() as busy:
+        busy.close = MagicMock()
+        pool.close()
+        pool.start()
+    busy.close.assert_called_once()
+    assert pool.stats()["idle"] == 1
+    with pool.checkout() as fresh:
+        assert fresh is not busy
+    pool.close()
+
+
+def test_stats_and_ready_do_not_wait_for_a_warmup():
+    import threading
+    from app.pool import TieredPosePool
+
+    loading = threading.Event()
+    release = threading.Event()
+
+    def slow_pose(*args, **kwargs):
+        loading.set()
+        release.wait(5)
+        return MagicMock()
+
+    pools = TieredPosePool(size=1, warmup=False, default_tier=1)
+    with patch("app.pool.create_pose", side_effect=slow_pose):
+        warmup = threading.Thread(target=pools.start)
+        warmup.start()
+        try:
+            assert loading.wait(5)
+            # Answered at once while the model is still loading
+            assert pools.ready(1) is False
+            assert pools.stats()["tiers"]["full"]["started"] is False
+        finally:
+            release.set()
+            warmup.join(5)
+    assert pools.ready(1) is True
+    pools.close()
@@ -0,0 +1,40 @@
+import cv2
+import numpy as np
+
+from app.preprocess import choose_reduction, decode_for_pose, image_dimensions
+
+
+def encode(ext, width, height):
+    ok, buf = cv2.imencode(ext, np.full((height, width, 3), (10, 20, 30), np.uint8))
+    return buf.tobytes()
+
+
+def test_header_dimensions_without_decoding():
+    assert image_dimensions(encode(".jpg", 400, 300)) == ("jpeg", 400, 300)
+    assert image_dimensions(encode(".png", 64, 32)) == ("png", 64, 32)
+    assert image_dimensions(b"\xff\xd8\xff") is None
+    assert image_dimensions(b"GIF89a") is None
+
+
+def test_reduction_keeps_longest_side_above_target():
+    assert choose_reduction(4032, 3024, 640) == 4
+    assert choose_reduction(1280, 720, 640) == 2
+    assert choose_reduction(800, 600, 640) == 1
+    assert choose_reduction(12000, 9000, 640) == 8
+
+
+def test_large_jpeg_is_decoded_small_and_rgb():
+    img, scale = decode_for_pose(encode(".jpg", 4000, 3000), target=640)
+
+    assert max(img.shape[:2]) == 640
+    assert scale == 640 / 4000
+    # BGR (10, 20, 30) comes back as RGB
+    assert abs(int(img[5, 5, 0]) - 30) <= 2
+
+
+def test_small_image_is_left_at_full_size():
+    img, scale = decode_for_pose(encode(".png", 200, 100), target=640)
+
+    assert img.shape == (100, 200, 3)
+    assert scale == 1.0
+    assert decode_for_pose(b"not an image") == (None, None)
@@ -0,0 +1,109 @@
+from app.analysis import count_reps
+from app.reps import RepCounter, rep_thresholds
+
+
+def test_thresholds_follow_evaluate_angle_bands():
+    assert rep_thresholds("squat") == (160.0, 125.0)
+    assert rep_thresholds("Bicep_Curl") == (150.0, 97.5)
+    assert rep_thresholds("plank") is None
+
+
+def test_counts_full_reps_with_tempo_and_range():
+    counter = RepCounter("squat")
+    angles = [175, 170, 150, 120, 95, 110, 150, 168, 172, 140, 100, 165]
+    reps = [counter.update(angle, t * 0.5) for t, angle in enumerate(angles)]
+    completed = [r for r in reps if r is not None]
+
+    assert counter.count == 2
+    first = completed[0]
+    assert first["start"] == 0.5
+    assert first["bottom"] == 2.0
+    assert first["end"] == 3.5
+    assert first["min_angle"] == 95
+    assert first["range_of_motion"] == 75
+
+
+def test_shallow_dip_is_not_a_rep():
+    counter = RepCounter("pushup")
+    for angle in [170, 150, 140, 165, 170]:
+        counter.update(angle)
+    assert counter.count == 0
+
+
+def test_batch_rep_counts_are_running_totals():
+    angles = [170, 100, 170, 100, 170]
+    results = [
+        {"exercise": "squat", "pose_detected": True, "angle": a, "rep_count": 0}
+        for a in angles
+    ]
+
+    summary = count_reps(results)
+
+    assert [r["rep_count"] for r in results] == [0, 0, 1, 1, 2]
+    assert summary["squat"]["reps"] == 2
+
+
+def standing_frames(knee_angles):
+    """Upright body, arms down, both knees bent to the given angles (hips stay put)."""
+    import numpy as np
+
+    frames = np.full((len(knee_angles), 33, 4), 0.5, dtype=np.float32)
+    frames[..., 3] = 1.0
+    for side, x in ((0, 0.45), (1, 0.55)):
+        frames[:, 11 + side, :2] = (x, 0.2)     # shoulder
+        frames[:, 13 + side, :2] = (x, 0.35)    # elbow
+        frames[:, 15 + side, :2] = (x, 0.5)     # wrist
+        frames[:, 23 + side, :2] = (x, 0.5)     # hip
+        frames[:, 25 + side, :2] = (x, 0.7)     # knee
+        for i, deg in enumerate(knee_angles):
+            rad = np.radians(deg)
+            frames[i, 27 + side, :2] = (x + 0.2 * np.sin(rad), 0.7 - 0.2 * np.cos(rad))
+    return frames
+
+
+def test_auto_mode_counts_reps_across_unclassified_frames():
+    from app.analysis import BatchSummary, score_landmark_stack
+
+    knee_angles = [172, 140, 100, 140, 172] * 3
+    results = score_landmark_stack(standing_frames(knee_angles))
+    # Only the bottom of each squat classifies as one
+    assert results[0]["exercise"] == "unknown" and results[2]["exercise"] == "squat"
+
+    assert count_reps(results)["squat"]["reps"] == 3
+    assert results[-1]["rep_count"] == 3
+
+    summary = BatchSummary(track_reps=True)
+    for result in score_landmark_stack(standing_frames(knee_angles)):
+        summary.add(result)
+    assert summary.reps()["squat"]["reps"] == 3
+
+    typed = score_landmark_stack(standing_frames(knee_angles), "squat")
+    assert count_reps(typed)["squat"]["reps"] == 3
+
+
+def test_update_auto_replays_frames_seen_before_the_first_classification():
+    from app.reps import RepTracker
+
+    tracker = RepTracker()
+    frames = [("unknown", 170), ("squat", 100), ("unknown", 170), ("lunge", 100), ("unknown", 170)]
+    counts = [tracker.update_auto(exercise, {"squat": angle, "lunge": angle}, t)[0]
+              for t, (exercise, angle) in enumerate(frames)]
+
+    # The first rep completes on an "unknown" frame; then the lunge takes over
+    assert counts == [0, 0, 1, 0, 0]
+    assert tracker.exercise == "lunge"
+    assert tracker.summary()["squat"]["reps"] == 1
+
+
+def test_auto_mode_counts_curls():
+    import numpy as np
+    from app.analysis import score_landmark_stack
+
+    frames = standing_frames([175] * 6)
+    for i in (1, 4):
+        # Left forearm raised: the elbow closes to ~70 degrees
+        frames[i, 15, :2] = (0.6, 0.3)
+    results = score_landmark_stack(frames)
+
+    assert [r["exercise"] for r in results[:2]] == ["unknown", "bicep_curl"]
+    assert count_reps(results)["bicep_curl"]["reps"] == 2
@@ -0,0 +1,86 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.analysis import evaluate_angle, measure_landmarks, score_landmark_stack
+from app.geometry import joint_angles
+from app.rules import RULES, RULES_FILE, ExerciseRules
+
+
+def random_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.random((n, 33, 4), dtype=np.float32)
+
+
+@pytest.mark.parametrize("exercise, angle, expected", [
+    ("squat", 89.99, ("Too low – control your depth", 0.6)),
+    ("squat", 90, ("Good squat depth", 1.0)),
+    ("squat", 160, ("Good squat depth", 1.0)),
+    ("squat", 160.01, ("Standing too tall", 0.4)),
+    ("plank", 169.9, ("Hips too low", 0.5)),
+    ("plank", 170, ("Perfect plank posture", 1.0)),
+    ("plank", 180, ("Perfect plank posture", 1.0)),
+    ("plank", 180.5, ("Hips too high", 0.6)),
+    ("Bicep_Curl", 45, ("Good curl range", 1.0)),
+    ("bicep_curl", 44.9, ("Curl too tight", 0.7)),
+    ("bicep_curl", 150.1, ("Arm extended – ready position", 0.5)),
+    ("yoga", 120, ("Unrecognized exercise", 0.0)),
+])
+def test_band_edges_are_inclusive_like_the_original_rules(exercise, angle, expected):
+    assert evaluate_angle(exercise, angle) == expected
+
+
+def test_array_scoring_matches_scalar_scoring():
+    angles = np.concatenate([np.linspace(0, 190, 1901), [45, 90, 150, 160, 170, 180]])
+
+    for exercise in RULES.names:
+        feedback, scores = RULES.evaluate_array(exercise, angles)
+        assert [(f, s) for f, s in zip(feedback, scores.tolist())] == [
+            RULES.evaluate(exercise, a) for a in angles.tolist()
+        ]
+
+    mixed = np.arange(len(angles)) % (len(RULES.names) + 1) - 1
+    feedback, scores = RULES.evaluate_frames(mixed, angles)
+    expected = [
+        RULES.evaluate(RULES.names[i] if i >= 0 else "unknown", a)
+        for i, a in zip(mixed.tolist(), angles.tolist())
+    ]
+    assert list(zip(feedback, scores.tolist())) == expected
+
+
+def test_stack_classification_matches_per_frame():
+    points = random_points(500, seed=4)
+    angles = joint_angles(points)
+    exercises, confidences = RULES.classify_stack(points, angles)
+
+    assert [RULES.classify(p, a) for p, a in zip(points, angles)] == list(zip(exercises, confidences.tolist()))
+    assert len(set(exercises)) > 1
+
+
+def test_landmark_stack_matches_frame_by_frame_scoring():
+    points = random_points(200, seed=5)
+
+    for exercise_type in (None, "pushup", "yoga"):
+        results = score_landmark_stack(points, exercise_type)
+        for frame, result in zip(points, results):
+            exercise, _, angle, _ = measure_landmarks(frame, exercise_type)
+            assert result["exercise"] == exercise
+            if angle is None:
+                assert result["angle"] is None
+                assert result["feedback"] == "Unable to compute angle"
+                assert result["performance_score"] == 0.0
+            else:
+                feedback, score = evaluate_angle(exercise, angle)
+                assert result["angle"] == round(angle, 2)
+                assert result["feedback"] == feedback
+                assert result["performance_score"] == round(score, 2)
+
+
+def test_rule_table_is_validated(tmp_path):
+    with open(RULES_FILE, encoding="utf-8") as f:
+        table = json.load(f)
+
+    table["exercises"]["squat"]["joint"] = ["left_hip", "nose", "left_ankle"]
+    with pytest.raises(ValueError):
+        ExerciseRules(table)
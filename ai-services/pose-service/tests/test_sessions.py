@@ -0,0 +1,241 @@
+import asyncio
+from unittest.mock import patch, MagicMock
+
+import cv2
+import numpy as np
+from starlette.testclient import TestClient
+
+from app.live import LiveSession, SessionRegistry
+from app.main import app, live_sessions
+
+
+client = TestClient(app)
+
+
+class LM:
+    def __init__(self, x=0.5, y=0.5):
+        self.x = x
+        self.y = y
+
+
+def spread_landmarks():
+    """33 landmarks spread over x 0.3-0.7, y 0.2-0.8 of whatever image was passed in."""
+    return [LM(0.3 + 0.4 * (i % 2), 0.2 + 0.6 * (i % 3) / 2) for i in range(33)]
+
+
+def frame(width=200, height=200):
+    ok, buf = cv2.imencode(".png", np.full((height, width, 3), 127, np.uint8))
+    return buf.tobytes()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def use(registry, session_id):
+    session = registry.acquire(session_id)
+    registry.release(session)
+    return session
+
+
+@patch("app.live.mp_pose.Pose.process")
+def test_registry_expires_idle_sessions_and_evicts_lru(mock_process):
+    clock = FakeClock()
+    registry = SessionRegistry(idle_seconds=10, max_sessions=2, clock=clock)
+
+    first = use(registry, "a")
+    assert use(registry, "a") is first
+
+    clock.now = 5
+    use(registry, "b")
+    use(registry, "a")
+    # "b" is now least recently used and makes way for "c"
+    use(registry, "c")
+    assert set(registry._sessions) == {"a", "c"}
+
+    clock.now = 20
+    registry.expire()
+    assert len(registry) == 0
+    assert registry.stats()["expired"] == 3
+    assert use(registry, "a") is not first
+
+
+@patch("app.live.mp_pose.Pose.process")
+def test_sessions_in_use_are_closed_only_after_release(mock_process):
+    clock = FakeClock()
+    registry = SessionRegistry(idle_seconds=10, max_sessions=1, clock=clock)
+
+    busy = registry.acquire("a")
+    busy.close = MagicMock()
+    clock.now = 20
+    registry.expire()
+    assert "a" in registry._sessions
+
+    # Ended and evicted while a frame is still running on it
+    assert registry.close("a") is busy
+    use(registry, "b")
+    busy.close.assert_not_called()
+
+    registry.release(busy)
+    busy.close.assert_called_once()
+
+
+@patch("app.live.LiveSession")
+def test_concurrent_first_use_keeps_one_session(mock_session):
+    registry = SessionRegistry()
+    loaded = []
+
+    def load(exercise_type, model_complexity):
+        session = MagicMock(users=0, retired=False, model_complexity=model_complexity)
+        if not loaded:
+            # A second request creates the session while this one loads its model
+            loaded.append(session)
+            winner = registry.acquire("a")
+            registry.release(winner)
+            loaded.append(winner)
+        return session
+
+    mock_session.side_effect = load
+    session = registry.acquire("a")
+
+    assert session is loaded[1]
+    loaded[0].close.assert_called_once()
+    assert len(registry) == 1 and session.users == 1
+
+
+@patch("app.live.mp_pose.Pose.process")
+def test_session_crops_to_previous_person_and_maps_back(mock_process):
+    mock_process.return_value.pose_landmarks = MagicMock(landmark=spread_landmarks())
+    session = LiveSession("squat")
+
+    first = session.process(frame())
+    assert first["roi"] is False
+    # Box 60..140 x 40..160 px plus a 25% margin
+    x0, y0, x1, y1 = session.roi
+    assert (x0, y0) == (40, 10)
+    assert np.allclose((x1, y1), (160, 190), atol=1)
+
+    second = session.process(frame())
+    assert second["roi"] is True
+    assert mock_process.call_args[0][0].shape == (y1 - y0, x1 - x0, 3)
+    # Crop-relative landmarks land back on full-frame coordinates
+    assert np.isclose(session.last_points[:, 0].min(), (x0 + 0.3 * (x1 - x0)) / 200)
+    assert np.isclose(session.last_points[:, 1].max(), (y0 + 0.8 * (y1 - y0)) / 200)
+
+
+@patch("app.live.mp_pose.Pose.process")
+def test_session_falls_back_to_full_frame_when_person_is_lost(mock_process):
+    mock_process.return_value.pose_landmarks = MagicMock(landmark=spread_landmarks())
+    session = LiveSession("squat")
+    session.process(frame())
+    x0, y0, x1, y1 = session.roi
+
+    mock_process.return_value.pose_landmarks = None
+    result = session.process(frame())
+
+    assert result["pose_detected"] is False
+    assert session.roi is None
+    # Crop first, then the whole frame
+    assert mock_process.call_args_list[-2][0][0].shape == (y1 - y0, x1 - x0, 3)
+    assert mock_process.call_args_list[-1][0][0].shape == (200, 200, 3)
+
+
+@patch("app.live.mp_pose.Pose.process")
+def test_session_drops_the_crop_when_the_frame_size_changes(mock_process):
+    mock_process.return_value.pose_landmarks = MagicMock(landmark=spread_landmarks())
+    session = LiveSession("squat")
+    session.process(frame(320, 180))
+    assert session.roi is not None and session.roi_frame_size == (320, 180)
+
+    # Phone rotated: the old crop would reach past the new frame's width
+    result = session.process(frame(180, 320))
+
+    assert result["roi"] is False
+    assert mock_process.call_args[0][0].shape == (320, 180, 3)
+    assert session.roi_frame_size == (180, 320)
+    x0, y0, x1, y1 = session.roi
+    assert x1 <= 180 and y1 <= 320
+
+
+@patch("app.live.mp_pose.Pose.process")
+def test_crop_is_dropped_when_inference_fails_on_it(mock_process):
+    mock_process.return_value.pose_landmarks = MagicMock(landmark=spread_landmarks())
+    session = LiveSession("squat")
+    session.process(frame())
+
+    mock_process.side_effect = RuntimeError("bad crop")
+    try:
+        session.process(frame())
+    except RuntimeError:
+        pass
+    assert session.roi is None
+
+    mock_process.side_effect = None
+    assert session.process(frame())["pose_detected"] is True
+
+
+@patch("app.live.mp_pose.Pose.process")
+def test_idle_sessions_expire_on_release_and_in_the_sweep(mock_process):
+    clock = FakeClock()
+    registry = SessionRegistry(idle_seconds=10, clock=clock)
+    idle = use(registry, "a")
+    idle.close = MagicMock()
+    busy = registry.acquire("b")
+
+    clock.now = 20
+    registry.release(busy)
+    idle.close.assert_called_once()
+    assert set(registry._sessions) == {"b"}
+
+    clock.now = 40
+
+    async def sweep_once():
+        task = asyncio.ensure_future(registry.sweep(interval=0.01))
+        while len(registry):
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(asyncio.wait_for(sweep_once(), 5))
+    assert len(registry) == 0
+
+
+@patch("app.live.mp_pose.Pose.process")
+def test_session_angles_are_smoothed(mock_process):
+    session = LiveSession("squat")
+
+    assert session._smooth("squat", 100.0) == 100.0
+    assert session._smooth("squat", 140.0) == 120.0
+    # A new exercise starts from its own first angle
+    assert session._smooth("plank", 170.0) == 170.0
+
+
+@patch("app.live.mp_pose.Pose.process")
+def test_frame_endpoint_keeps_session_state(mock_process):
+    mock_process.return_value.pose_landmarks = MagicMock(landmark=spread_landmarks())
+    files = {"file": ("frame.png", frame(), "image/png")}
+
+    try:
+        results = [client.post("/workouts/frame?session_id=sess-1", files=files).json() for _ in range(3)]
+        assert [r["frame"] for r in results] == [1, 2, 3]
+        assert results[0]["session_id"] == "sess-1"
+        assert results[0]["file_name"] == "frame.png"
+        assert [r["roi"] for r in results] == [False, True, True]
+        assert client.get("/health").json()["sessions"]["active"] == 1
+
+        closed = client.delete("/workouts/sessions/sess-1")
+        assert closed.status_code == 200
+        assert closed.json()["frames"] == 3
+        assert client.delete("/workouts/sessions/sess-1").status_code == 404
+    finally:
+        live_sessions.close_all()
+
+
+def test_frame_endpoint_rejects_bad_session_ids():
+    files = {"file": ("frame.png", frame(), "image/png")}
+
+    response = client.post("/workouts/frame?session_id=" + "x" * 65, files=files)
+    assert response.status_code == 400
@@ -0,0 +1,113 @@
+import subprocess
+import sys
+import threading
+
+import pytest
+from starlette.testclient import TestClient
+
+from app import main
+from app.main import app
+from app.startup import IMPORT_SECONDS, LazyModule, Warmup
+
+
+client = TestClient(app)
+
+
+def test_app_import_leaves_heavy_modules_unloaded():
+    code = "import sys, app.main; print('cv2' in sys.modules, 'mediapipe' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+
+    assert out.split() == ["False", "False"]
+
+
+def test_lazy_module_imports_on_first_use_and_forwards_writes():
+    lazy = LazyModule("colorsys")
+    assert not lazy.loaded
+
+    assert lazy.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert lazy.loaded
+
+    lazy.marker = 1
+    import colorsys
+    assert colorsys.marker == 1
+    del lazy.marker
+    assert not hasattr(colorsys, "marker")
+
+
+def test_lazy_import_time_is_recorded(monkeypatch):
+    lazy = LazyModule("wave")
+    monkeypatch.delitem(sys.modules, "wave", raising=False)
+    # Restored (removed) after the test, like sys.modules
+    monkeypatch.setitem(IMPORT_SECONDS, "wave", 0.0)
+    lazy.load()
+
+    assert IMPORT_SECONDS["wave"] > 0
+
+
+def test_warmup_runs_steps_once_and_reports_failures():
+    calls = []
+    warmup = Warmup([("a", lambda: calls.append("a")), ("b", lambda: calls.append("b"))], mode="lazy")
+
+    assert warmup.run() is True
+    assert warmup.run() is True
+    assert calls == ["a", "b"]
+    assert set(warmup.stats()["step_seconds"]) == {"a", "b"}
+
+    def broken():
+        raise OSError("model download blocked")
+
+    failed = Warmup([("pose_pool", broken)], mode="startup")
+    failed.on_startup()
+    assert failed.state == "failed"
+    assert "model download blocked" in failed.error
+
+
+def test_unknown_warmup_mode_is_rejected():
+    with pytest.raises(ValueError):
+        Warmup([], mode="eager")
+
+
+def test_readiness_waits_for_background_warmup(monkeypatch):
+    release = threading.Event()
+    warmup = Warmup([("pose_pool", release.wait)], mode="background")
+    monkeypatch.setattr(main, "warmup", warmup)
+
+    warmup.on_startup()
+    assert client.get("/health/live").json()["status"] == "alive"
+    warming = client.get("/health/ready")
+    assert warming.status_code == 503
+    assert warming.json()["status"] == "running"
+
+    release.set()
+    warmup.join(5)
+    ready = client.get("/health/ready")
+    assert ready.status_code == 200
+    assert ready.json()["pools_warm"] is True
+    assert "pose_ready 1" in client.get("/metrics").text
+
+
+def test_warmup_hook_starts_lazy_warmup(monkeypatch):
+    calls = []
+    warmup = Warmup([("pose_pool", lambda: calls.append(1))], mode="lazy")
+    monkeypatch.setattr(main, "warmup", warmup)
+
+    assert client.get("/health/ready").status_code == 503
+    assert client.post("/health/warmup").status_code in (200, 202)
+    warmup.join(5)
+    assert calls == [1]
+    assert client.get("/health/ready").json()["pools_warm"] is True
+
+
+def test_lazy_mode_is_ready_once_a_request_warmed_the_pools(monkeypatch):
+    warm = []
+    warmup = Warmup([("pose_pool", lambda: None)], mode="lazy", is_warm=lambda: bool(warm))
+    monkeypatch.setattr(main, "warmup", warmup)
+
+    pending = client.get("/health/ready")
+    assert pending.status_code == 503
+    assert pending.json()["status"] == "pending"
+
+    # First request loaded the default pool
+    warm.append(True)
+    assert client.get("/health/ready").status_code == 200
+    assert warmup.state == "ready"
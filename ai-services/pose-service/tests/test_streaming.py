@@ -0,0 +1,104 @@
+import json
+from contextlib import ExitStack
+from unittest.mock import MagicMock, patch
+
+import cv2
+import numpy as np
+from starlette.testclient import TestClient
+
+from app.main import app
+
+
+client = TestClient(app)
+
+
+class LM:
+    def __init__(self, x=0.5, y=0.5):
+        self.x = x
+        self.y = y
+
+
+def squat_landmarks():
+    lms = [LM() for _ in range(33)]
+    lms[23], lms[25], lms[27] = LM(0.4, 0.5), LM(0.45, 0.7), LM(0.4, 0.9)
+    return lms
+
+
+def upload_files(count):
+    # Distinct images so the landmark cache does not short-circuit the mock
+    files = []
+    for i in range(count):
+        ok, buf = cv2.imencode(".jpg", np.full((64, 64, 3), 40 + i, np.uint8))
+        files.append(("files", (f"img{i}.jpg", buf.tobytes(), "image/jpeg")))
+    return files
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+@patch("app.main.mp_pose.Pose.process")
+def test_stream_matches_buffered_batch(mock_process):
+    mock_process.return_value.pose_landmarks = MagicMock(landmark=squat_landmarks())
+    files = upload_files(3) + [("files", ("broken.jpg", b"\xff\xd8\xff", "image/jpeg"))]
+
+    buffered = client.post("/workouts/batch", files=files).json()
+    response = client.post("/workouts/batch?stream=true", files=files)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = ndjson(response)
+    assert len(lines) == 5
+    assert [line["file_name"] for line in lines[:4]] == [r["file_name"] for r in buffered["results"]]
+    assert lines[2]["exercise"] == buffered["results"][2]["exercise"]
+    assert lines[3]["feedback"] == "Invalid image"
+
+    summary = lines[-1]["summary"]
+    assert summary["total_images"] == 4
+    for key in ("processed_images", "average_score", "most_common_exercise", "reps"):
+        assert summary[key] == buffered[key]
+
+
+@patch("app.main.mp_pose.Pose.process")
+def test_accept_header_streams_typed_batch(mock_process):
+    mock_process.return_value.pose_landmarks = MagicMock(landmark=squat_landmarks())
+
+    response = client.post(
+        "/analyze-batch",
+        files=upload_files(2),
+        data={"exercise_type": "squat"},
+        headers={"Accept": "application/x-ndjson"}
+    )
+
+    lines = ndjson(response)
+    assert [sorted(line) for line in lines[:2]] == [sorted([
+        "file_name", "exercise", "pose_detected", "angle", "feedback", "performance_score", "decode_scale",
+        "timings", "model_complexity"
+    ])] * 2
+    assert lines[-1]["summary"]["processed_images"] == 2
+    assert lines[-1]["summary"]["most_common_exercise"] == "squat"
+
+
+def test_item_failures_become_error_lines_and_the_stream_goes_on():
+    from app.pool import PoolExhausted
+
+    def analyze(data, file_name, pool, exercise_type=None, *args, **kwargs):
+        if file_name == "img1.jpg":
+            raise PoolExhausted("No Pose instance free after 30s")
+        return {"file_name": file_name, "exercise": "squat", "pose_detected": False, "angle": None,
+                "feedback": "No person detected", "performance_score": 0.0, "rep_count": 0}
+
+    # Both the plain and the pipelined thread-mode paths
+    for patched in ({"app.main.decode_pipeline": None, "app.main.analyze_image": analyze},
+                    {"app.pipeline.analyze_decoded": analyze}):
+        with ExitStack() as stack:
+            for target, value in patched.items():
+                stack.enter_context(patch(target, value))
+            response = client.post("/workouts/batch?stream=true", files=upload_files(3))
+
+        lines = ndjson(response)
+        assert response.status_code == 200
+        assert [line["file_name"] for line in lines[:3]] == ["img0.jpg", "img1.jpg", "img2.jpg"]
+        assert lines[1]["error"] == "No Pose instance free after 30s"
+        assert lines[-1]["summary"]["total_images"] == 3
+        assert lines[-1]["summary"]["failed_images"] == 1
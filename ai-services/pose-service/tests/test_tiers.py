@@ -0,0 +1,106 @@
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+import pytest
+from starlette.testclient import TestClient
+
+from app import main
+from app.main import app
+from app.pool import TieredPosePool, TierUnavailable
+from app.tiers import AUTO, TierSelector, parse_tier
+
+
+client = TestClient(app)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def jpeg(value):
+    ok, buf = cv2.imencode(".jpg", np.full((48, 48, 3), value, np.uint8))
+    return buf.tobytes()
+
+
+def test_parse_tier():
+    assert parse_tier(None) is None
+    assert parse_tier("2") == 2
+    assert parse_tier("Lite") == 0
+    assert parse_tier("auto") == AUTO
+    with pytest.raises(ValueError):
+        parse_tier("3")
+
+
+def test_selector_degrades_under_load_and_recovers():
+    clock = FakeClock()
+    selector = TierSelector(default_tier=2, adaptive=True, queue_high=8, p95_ms=100, cooldown=5, clock=clock)
+
+    assert selector.select(None, queue_depth=0) == 2
+    assert selector.select(None, queue_depth=9) == 1
+    # Cooldown: still overloaded but no second step yet
+    assert selector.select(None, queue_depth=9) == 1
+    clock.now = 6
+    assert selector.select(None, queue_depth=9) == 0
+    # Explicit tiers are never degraded
+    assert selector.select(2, queue_depth=9) == 2
+
+    clock.now = 12
+    assert selector.select(None, queue_depth=0) == 1
+    clock.now = 18
+    assert selector.select(None, queue_depth=0) == 2
+
+
+def test_selector_degrades_on_recent_p95():
+    clock = FakeClock()
+    selector = TierSelector(default_tier=1, adaptive=False, p95_ms=100, cooldown=0, clock=clock)
+
+    for _ in range(30):
+        selector.record(0.3)
+    # Not adaptive by default, but "auto" opts in per request
+    assert selector.select(None) == 1
+    assert selector.select(AUTO) == 0
+    assert selector.stats()["current_tier"] == 0
+
+
+def test_unavailable_tier_is_remembered():
+    pools = TieredPosePool(size=1, warmup=False)
+    with patch("app.pool.mp_pose.Pose", side_effect=OSError("download blocked")) as pose_cls:
+        with pytest.raises(TierUnavailable):
+            pools.prepare(2)
+        with pytest.raises(TierUnavailable):
+            pools.prepare(2)
+    assert pose_cls.call_count == 1
+    assert "heavy" in pools.stats()["unavailable"]
+
+
+def test_requests_report_the_tier_used():
+    response = client.post("/workouts/frame?model_complexity=full", files={"file": ("a.jpg", jpeg(11), "image/jpeg")})
+    assert response.json()["model_complexity"] == 1
+
+    response = client.post("/workouts/frame?model_complexity=7", files={"file": ("a.jpg", jpeg(12), "image/jpeg")})
+    assert response.status_code == 400
+
+
+def test_adaptive_request_falls_back_when_tier_cannot_load():
+    clock = FakeClock()
+    clock.now = 100
+    selector = TierSelector(default_tier=1, adaptive=True, queue_high=1, cooldown=60, clock=clock)
+    assert selector.select(None, queue_depth=1) == 0
+    real_prepare = main.pose_pools.prepare
+
+    def prepare(tier):
+        if tier == 0:
+            raise TierUnavailable("lite model missing")
+        return real_prepare(tier)
+
+    with patch.object(main, "tier_selector", selector), patch.object(main.pose_pools, "prepare", side_effect=prepare):
+        response = client.post("/workouts/batch", files=[("files", ("b.jpg", jpeg(13), "image/jpeg"))])
+        assert response.json()["results"][0]["model_complexity"] == 1
+
+        response = client.post("/workouts/frame?model_complexity=0", files={"file": ("c.jpg", jpeg(14), "image/jpeg")})
+        assert response.status_code == 503
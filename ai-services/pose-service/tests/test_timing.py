@@ -0,0 +1,51 @@
+import cv2
+import numpy as np
+from starlette.testclient import TestClient
+
+from app.main import app
+from app.timing import StageMetrics, StageTimer
+
+
+client = TestClient(app)
+
+
+def test_lap_timer_accumulates_stages():
+    timer = StageTimer()
+    timer.lap("read")
+    timer.lap("imdecode")
+    timer.lap("read")
+    timer.merge({"pose_process": 0.25})
+
+    assert set(timer.stages) == {"read", "imdecode", "pose_process"}
+    assert timer.as_ms()["pose_process"] == 250.0
+
+
+def test_histogram_quantiles_and_prometheus_text():
+    metrics = StageMetrics()
+    for ms in range(1, 101):
+        metrics.observe("/workouts/frame", "pose_process", ms / 1000)
+
+    q = metrics.quantiles("/workouts/frame", "pose_process")
+    assert abs(q["p50"] - 0.050) < 0.008
+    assert abs(q["p95"] - 0.095) < 0.012
+    assert q["p50"] < q["p95"] <= q["p99"]
+
+    text = metrics.render()
+    assert 'pose_stage_seconds_bucket{endpoint="/workouts/frame",stage="pose_process",le="+Inf"} 100' in text
+    assert 'pose_stage_seconds_count{endpoint="/workouts/frame",stage="pose_process"} 100' in text
+    assert 'quantile="0.99"' in text
+
+
+def test_frame_reports_stage_timings():
+    ok, buf = cv2.imencode(".jpg", np.full((240, 320, 3), 90, np.uint8))
+
+    response = client.post("/workouts/frame?timings=true", files={"file": ("t.jpg", buf.tobytes(), "image/jpeg")})
+
+    header = response.headers["server-timing"]
+    for stage in ("read", "imdecode", "cvtColor", "pose_process", "serialize", "total"):
+        assert f"{stage};dur=" in header
+    assert {"read", "imdecode", "pose_process"} <= set(response.json()["timings"])
+
+    metrics = client.get("/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'endpoint="/workouts/frame",stage="imdecode"' in metrics.text
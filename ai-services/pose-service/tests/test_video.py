@@ -0,0 +1,99 @@
+import cv2
+import numpy as np
+from starlette.testclient import TestClient
+from unittest.mock import patch, MagicMock
+
+from app.main import app
+
+
+client = TestClient(app)
+
+
+def fake_landmarks():
+    class LM:
+        def __init__(self, x=0.5, y=0.5):
+            self.x = x
+            self.y = y
+    return [LM() for _ in range(33)]
+
+
+def make_video(path, frames=60, fps=30):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (160, 120))
+    for i in range(frames):
+        writer.write(np.full((120, 160, 3), i * 3, np.uint8))
+    writer.release()
+    return path.read_bytes()
+
+
+@patch("app.video.mp_pose.Pose.process")
+def test_video_is_sampled_into_time_series(mock_process, tmp_path):
+    mock_process.return_value.pose_landmarks = MagicMock(landmark=fake_landmarks())
+    video = make_video(tmp_path / "set.mp4")
+
+    response = client.post(
+        "/workouts/video",
+        data={"exercise_type": "squat", "sample_fps": "10"},
+        files={"file": ("set.mp4", video, "video/mp4")}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["summary"]["total_frames"] == 60
+    assert data["summary"]["sampled_frames"] == 20
+    assert [f["frame"] for f in data["frames"][:3]] == [0, 3, 6]
+    assert data["frames"][0]["exercise"] == "squat"
+
+
+def test_invalid_video_is_reported():
+    response = client.post(
+        "/workouts/video",
+        files={"file": ("broken.mp4", b"not a video", "video/mp4")}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["feedback"] == "Invalid video format"
+
+
+def test_sample_fps_must_be_positive():
+    for sample_fps in ("0", "-5", "nan", "inf"):
+        response = client.post(
+            "/workouts/video",
+            data={"sample_fps": sample_fps},
+            files={"file": ("set.mp4", b"not a video", "video/mp4")}
+        )
+        assert response.status_code == 400, sample_fps
+
+
+@patch("app.main.MAX_VIDEO_BYTES", 100)
+def test_oversized_video_is_rejected():
+    response = client.post("/workouts/video", files={"file": ("set.mp4", b"x" * 101, "video/mp4")})
+
+    assert response.status_code == 413
+
+
+@patch("app.video.mp_pose.Pose.process")
+def test_long_videos_are_truncated(mock_process, tmp_path):
+    from app.video import analyze_video
+
+    mock_process.return_value.pose_landmarks = None
+    make_video(tmp_path / "set.mp4")
+
+    result = analyze_video(str(tmp_path / "set.mp4"), "set.mp4", sample_fps=10, max_frames=5)
+
+    assert result["summary"]["sampled_frames"] == 5
+    assert result["summary"]["truncated"] is True
+    assert analyze_video(str(tmp_path / "set.mp4"), "set.mp4", sample_fps=10)["summary"]["truncated"] is False
+
+
+def test_untimed_jobs_stay_out_of_retry_after():
+    import asyncio
+    from app.admission import InferenceGate
+
+    gate = InferenceGate(max_in_flight=1)
+
+    async def scenario():
+        async with gate.admit(timed=False):
+            await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+    assert gate.stats()["avg_job_seconds"] == 0.0
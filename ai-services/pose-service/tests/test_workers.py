@@ -0,0 +1,118 @@
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from app.analysis import summarize_batch
+from app.timing import StageTimer
+from app.workers import BatchProcessPool
+
+
+def blank_jpeg():
+    ok, buf = cv2.imencode(".jpg", np.full((120, 160, 3), 127, np.uint8))
+    return buf.tobytes()
+
+
+async def uploads(items):
+    for item in items:
+        yield item
+
+
+async def collect(pool, items, timers=None):
+    return [result async for result in pool.stream(uploads(items), timers=timers)]
+
+
+def test_process_pool_streams_in_upload_order():
+    pool = BatchProcessPool(max_workers=2)
+    items = [
+        ("a.jpg", blank_jpeg()),
+        ("broken.jpg", b"\xff\xd8\xff"),
+        ("c.jpg", blank_jpeg()),
+    ]
+    timers = [StageTimer() for _ in items]
+
+    try:
+        results = asyncio.run(collect(pool, items, timers))
+    finally:
+        pool.shutdown()
+
+    assert [r["file_name"] for r in results] == ["a.jpg", "broken.jpg", "c.jpg"]
+    assert results[1]["feedback"] == "Invalid image"
+    assert results[0]["feedback"] == "No person detected"
+    assert "imdecode" in timers[0].stages
+
+
+def test_failed_item_cancels_the_rest_of_the_stream():
+    pool = BatchProcessPool(max_workers=2)
+    # None is not an upload: analysis raises in the worker
+    items = [("a.jpg", blank_jpeg()), ("bad", None), ("c.jpg", blank_jpeg()), ("d.jpg", blank_jpeg())]
+
+    try:
+        with pytest.raises(TypeError):
+            asyncio.run(collect(pool, items))
+        # The pool is still usable afterwards
+        assert len(asyncio.run(collect(pool, items[:1]))) == 1
+    finally:
+        pool.shutdown()
+
+
+def test_item_errors_are_yielded_in_place():
+    pool = BatchProcessPool(max_workers=2)
+    items = [("a.jpg", blank_jpeg()), ("bad", None), ("c.jpg", blank_jpeg())]
+
+    async def collect_with_errors():
+        return [r async for r in pool.stream(uploads(items), item_errors=(TypeError,))]
+
+    try:
+        results = asyncio.run(collect_with_errors())
+    finally:
+        pool.shutdown()
+
+    assert [r["file_name"] for r in results] == ["a.jpg", "bad", "c.jpg"]
+    assert "error" in results[1] and "error" not in results[2]
+
+
+def test_concurrent_streams_start_one_executor_off_the_loop():
+    pool = BatchProcessPool(max_workers=1)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while not pool.started:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    async def run():
+        return await asyncio.gather(
+            collect(pool, [("a.jpg", blank_jpeg())]),
+            collect(pool, [("b.jpg", blank_jpeg())]),
+            ticker()
+        )
+
+    try:
+        first, second, _ = asyncio.run(run())
+        executor = pool._executor
+        pool.start()
+        assert pool._executor is executor
+    finally:
+        pool.shutdown()
+
+    assert [r["file_name"] for r in first + second] == ["a.jpg", "b.jpg"]
+    # The loop kept running while the workers spawned
+    assert ticks > 1
+
+
+def test_summarize_batch_matches_sequential_summary():
+    results = [
+        {"exercise": "squat", "pose_detected": True, "angle": 120.0, "performance_score": 1.0},
+        {"exercise": "squat", "pose_detected": True, "angle": 170.0, "performance_score": 0.4},
+        {"exercise": "pushup", "pose_detected": True, "angle": None, "performance_score": 0.0},
+        {"exercise": "unknown", "pose_detected": False, "angle": None, "performance_score": 0.0},
+    ]
+
+    summary = summarize_batch(results)
+
+    assert summary["processed_images"] == 2
+    assert summary["average_score"] == 0.7
+    assert summary["most_common_exercise"] == "squat"
@@ -0,0 +1,5 @@
+import sys
+import os
+
+# Add project root to PYTHONPATH so tests import ai_dashboard.*
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
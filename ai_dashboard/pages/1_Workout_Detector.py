@@ -7,8 +7,9 @@ if ROOT_DIR not in sys.path:
     sys.path.insert(0, ROOT_DIR)
 
 
+import requests
 import streamlit as st
-from ai_dashboard.services.pose_api import analyze_pose
+from ai_dashboard.services.pose_api import MAX_UPLOAD_SIDE, PoseServiceError, analyze_poses
 
 st.title("🏋️ Workout Detector")
 st.write("Upload one or multiple images to detect exercise type and receive feedback.")
@@ -26,23 +27,42 @@ uploaded_files = st.file_uploader(
     accept_multiple_files=True
 )
 
+downscale = st.checkbox(
+    f"Downscale images to {MAX_UPLOAD_SIDE}px before upload",
+    value=True,
+    help="The service analyzes images at this size, so larger uploads only take longer."
+)
+
 # Analyze button
 if st.button("Analyze"):
     if not uploaded_files:
         st.warning("Please upload at least one image.")
     else:
-        st.write("Analyzing images...")
-        results = []
-
-        for file in uploaded_files:
-            results.append(analyze_pose(file, exercise_type))
-
-        st.success("Analysis Completed!")
+        progress = st.progress(0.0, text="Analyzing images...")
 
-        for r in results:
-            st.subheader(r["file_name"])
-            st.write(f"**Exercise:** {r['exercise']}")
-            st.write(f"**Angle:** {r['angle']}")
-            st.write(f"**Feedback:** {r['feedback']}")
-            st.write(f"**Score:** {r['performance_score']}")
-            st.write("---")
+        # Results stream back one by one; show each as soon as it arrives
+        failed = 0
+        try:
+            for done, r in enumerate(
+                    analyze_poses(uploaded_files, exercise_type, max_side=MAX_UPLOAD_SIDE if downscale else None),
+                    start=1
+            ):
+                progress.progress(done / len(uploaded_files), text=f"Analyzed {done} of {len(uploaded_files)} images")
+                st.subheader(r["file_name"])
+                if "error" in r:
+                    # This file failed; the rest of the batch goes on
+                    failed += 1
+                    st.error(f"Could not analyze this image: {r['error']}")
+                else:
+                    st.write(f"**Exercise:** {r['exercise']}")
+                    st.write(f"**Angle:** {r['angle']}")
+                    st.write(f"**Feedback:** {r['feedback']}")
+                    st.write(f"**Score:** {r['performance_score']}")
+                st.write("---")
+        except (PoseServiceError, requests.RequestException) as exc:
+            st.error(f"Analysis failed: {exc}")
+        else:
+            if failed:
+                st.warning(f"Analysis completed; {failed} of {len(uploaded_files)} images could not be analyzed.")
+            else:
+                st.success("Analysis Completed!")
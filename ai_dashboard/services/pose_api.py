@@ -1,26 +1,126 @@
+import io
+import json
+import queue
+from contextlib import closing, contextmanager
+
 import requests
 from ai_dashboard.config import POSE_SERVICE_URL
 
-def analyze_pose(uploaded_file, exercise_type):
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow comes with Streamlit; without it images are sent as-is
+    Image = None
+
+# Images per /analyze-batch request; larger selections are sent in chunks
+BATCH_SIZE = 16
+# Longest image side uploaded. The pose service analyzes at 640px
+# (POSE_TARGET_SIZE), so larger photos only cost upload and decode time.
+MAX_UPLOAD_SIDE = 640
+# (connect, read) seconds; the read timeout applies between streamed results
+TIMEOUT = (5, 120)
+
+# Idle keep-alive sessions to the pose service. requests.Session is not
+# thread-safe and Streamlit runs every browser session's script on its own
+# thread, so each call checks out a session of its own.
+_idle_sessions = queue.LifoQueue()
+
+
+class PoseServiceError(RuntimeError):
+    """The pose service rejected or aborted a batch."""
+
+
+@contextmanager
+def _session():
+    """An idle pooled session, or a new one; handed back for reuse when the call is done."""
+    try:
+        session = _idle_sessions.get_nowait()
+    except queue.Empty:
+        session = requests.Session()
+    try:
+        yield session
+    finally:
+        _idle_sessions.put(session)
+
+
+def downscale(data, content_type, max_side=MAX_UPLOAD_SIDE):
     """
-    uploaded_file = Streamlit UploadedFile object
+    Shrink an image so its longest side is at most ``max_side`` and return
+    ``(bytes, content_type)``. Small, unreadable or unprocessed (no Pillow)
+    images come back unchanged.
     """
+    if Image is None or not max_side:
+        return data, content_type
+    try:
+        img = Image.open(io.BytesIO(data))
+        if max(img.size) <= max_side:
+            return data, content_type
+        # Let the JPEG decoder scale down by 2/4/8 while decoding
+        img.draft("RGB", (max_side, max_side))
+        # Re-encoding drops EXIF, so apply the orientation to the pixels
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        img.thumbnail((max_side, max_side))
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=90)
+        return out.getvalue(), "image/jpeg"
+    except Exception:
+        # Let the service report the file as an invalid image
+        return data, content_type
+
+
+def _file_parts(uploaded_files, max_side):
+    parts = []
+    for uploaded_file in uploaded_files:
+        file_bytes = uploaded_file.read()
+        # Streamlit requires resetting file buffer after read()
+        uploaded_file.seek(0)
+        parts.append(("files", (uploaded_file.name, *downscale(file_bytes, uploaded_file.type, max_side))))
+    return parts
 
-    file_bytes = uploaded_file.read()
 
-    files = {
-        "files": (uploaded_file.name, file_bytes, uploaded_file.type)
-    }
+def analyze_poses(uploaded_files, exercise_type, batch_size=BATCH_SIZE, max_side=MAX_UPLOAD_SIDE):
+    """
+    Analyze Streamlit UploadedFile objects with one streamed /analyze-batch
+    request per ``batch_size`` files and yield each result as soon as the
+    service sends it, in upload order. A file the service could not analyze
+    is yielded as ``{"file_name", "error"}``; an error for the whole request
+    raises PoseServiceError. ``max_side=None`` uploads the original images.
+    """
+    uploaded_files = list(uploaded_files)
+    with _session() as session:
+        for start in range(0, len(uploaded_files), batch_size):
+            files = _file_parts(uploaded_files[start:start + batch_size], max_side)
 
-    data = {"exercise_type": exercise_type}
+            with session.post(
+                f"{POSE_SERVICE_URL}/analyze-batch",
+                params={"stream": "true"},
+                files=files,
+                data={"exercise_type": exercise_type},
+                timeout=TIMEOUT,
+                stream=True
+            ) as response:
+                if response.status_code != 200:
+                    raise PoseServiceError(f"Pose service returned {response.status_code}: {response.text}")
 
-    response = requests.post(
-        f"{POSE_SERVICE_URL}/analyze-batch",
-        files=files,
-        data=data
-    )
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    result = json.loads(line)
+                    # Per-file errors name their file; the others abort the request
+                    if "error" in result and "file_name" not in result:
+                        raise PoseServiceError(result["error"])
+                    if "summary" not in result:
+                        yield result
 
-    # Streamlit requires resetting file buffer after read()
-    uploaded_file.seek(0)
 
-    return response.json()[0]
+def analyze_pose(uploaded_file, exercise_type):
+    """
+    uploaded_file = Streamlit UploadedFile object
+    """
+    # Closing the generator closes the streamed response with it
+    with closing(analyze_poses([uploaded_file], exercise_type)) as results:
+        result = next(results, None)
+    if result is None:
+        raise PoseServiceError("Pose service returned no result")
+    if "error" in result:
+        raise PoseServiceError(result["error"])
+    return result
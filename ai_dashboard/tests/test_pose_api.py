@@ -0,0 +1,153 @@
+import io
+import json
+import threading
+from contextlib import contextmanager, nullcontext
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+pytest.importorskip("requests")
+Image = pytest.importorskip("PIL.Image")
+
+from ai_dashboard.services import pose_api
+from ai_dashboard.services.pose_api import PoseServiceError, analyze_pose, analyze_poses, downscale
+
+
+class Upload(io.BytesIO):
+    """Stand-in for a Streamlit UploadedFile."""
+
+    def __init__(self, name, data, type="image/jpeg"):
+        super().__init__(data)
+        self.name = name
+        self.type = type
+
+
+class StreamedResponse:
+    def __init__(self, lines, status_code=200):
+        self.lines = lines
+        self.status_code = status_code
+        self.text = "rejected"
+        self.closed = False
+
+    def iter_lines(self):
+        for line in self.lines:
+            yield line.encode() if line else b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+
+def jpeg(width, height):
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (90, 120, 150)).save(out, format="JPEG")
+    return out.getvalue()
+
+
+def ndjson(files, error=None):
+    lines = [json.dumps({"file_name": name, "exercise": "squat"}) for name in files]
+    if error:
+        lines.append(json.dumps({"error": error}))
+    return lines + ["", json.dumps({"summary": {"total_images": len(files)}})]
+
+
+@contextmanager
+def fake_session(*responses):
+    session = MagicMock()
+    session.post.side_effect = list(responses)
+    with patch.object(pose_api, "_session", lambda: nullcontext(session)):
+        yield session
+
+
+def test_downscale_shrinks_only_large_images():
+    small = jpeg(320, 240)
+
+    data, content_type = downscale(jpeg(1280, 960), "image/png", max_side=640)
+    assert content_type == "image/jpeg"
+    assert Image.open(io.BytesIO(data)).size == (640, 480)
+
+    assert downscale(small, "image/jpeg", max_side=640) == (small, "image/jpeg")
+    assert downscale(b"not an image", "image/jpeg") == (b"not an image", "image/jpeg")
+    assert downscale(jpeg(1280, 960), "image/jpeg", max_side=None)[1] == "image/jpeg"
+
+
+def test_uploads_are_sent_in_chunks_and_results_yielded_in_order():
+    names = [f"{i}.jpg" for i in range(5)]
+    uploads = [Upload(name, jpeg(64, 48)) for name in names]
+    responses = [StreamedResponse(ndjson(names[i:i + 2])) for i in range(0, 5, 2)]
+
+    with fake_session(*responses) as session:
+        results = list(analyze_poses(uploads, "squat", batch_size=2))
+
+    assert [r["file_name"] for r in results] == names
+    sent = [[part[1][0] for part in call.kwargs["files"]] for call in session.post.call_args_list]
+    assert sent == [names[0:2], names[2:4], names[4:]]
+    assert session.post.call_args.kwargs["params"] == {"stream": "true"}
+    assert session.post.call_args.kwargs["stream"] is True
+    assert all(response.closed for response in responses)
+    # Uploads stay readable for Streamlit after sending
+    assert uploads[0].tell() == 0
+
+
+def test_stream_errors_and_rejections_raise():
+    with fake_session(StreamedResponse(ndjson(["a.jpg"], error="worker crashed"))):
+        stream = analyze_poses([Upload("a.jpg", b"x")], "squat")
+        assert next(stream)["file_name"] == "a.jpg"
+        with pytest.raises(PoseServiceError, match="worker crashed"):
+            next(stream)
+
+    with fake_session(StreamedResponse([], status_code=503)):
+        with pytest.raises(PoseServiceError, match="503"):
+            list(analyze_poses([Upload("a.jpg", b"x")], "squat"))
+
+
+def test_item_errors_are_yielded_with_their_file():
+    lines = ndjson(["a.jpg", "c.jpg"])
+    lines.insert(1, json.dumps({"file_name": "b.jpg", "error": "No pose instance became free"}))
+
+    with fake_session(StreamedResponse(lines)):
+        results = list(analyze_poses([Upload(name, b"x") for name in ("a.jpg", "b.jpg", "c.jpg")], "squat"))
+
+    assert [r["file_name"] for r in results] == ["a.jpg", "b.jpg", "c.jpg"]
+    assert results[1]["error"] == "No pose instance became free"
+
+    with fake_session(StreamedResponse(lines[1:])):
+        with pytest.raises(PoseServiceError, match="No pose instance"):
+            analyze_pose(Upload("b.jpg", b"x"), "squat")
+
+
+def test_analyze_pose_closes_the_streamed_response():
+    response = StreamedResponse(ndjson(["a.jpg"]))
+
+    with fake_session(response):
+        result = analyze_pose(Upload("a.jpg", b"x"), "squat")
+
+    assert result["file_name"] == "a.jpg"
+    assert response.closed
+
+
+def test_concurrent_calls_use_separate_sessions():
+    # Both calls must hold their session at once for either to finish
+    barrier = threading.Barrier(2, timeout=5)
+
+    def post(*args, **kwargs):
+        barrier.wait()
+        return StreamedResponse(ndjson(["a.jpg"]))
+
+    def call():
+        list(analyze_poses([Upload("a.jpg", b"x")], "squat"))
+
+    with patch.object(pose_api, "_idle_sessions", pose_api.queue.LifoQueue()), \
+            patch.object(pose_api.requests, "Session") as session_class:
+        session_class.side_effect = lambda: MagicMock(post=MagicMock(side_effect=post))
+        threads = [threading.Thread(target=call) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Two sessions were needed at once, and both went back to the pool
+        assert session_class.call_count == 2
+        assert pose_api._idle_sessions.qsize() == 2